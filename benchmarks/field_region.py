@@ -0,0 +1,90 @@
+"""
+Benchmark of field texture region patching against a full re-encode.
+Stores a synthetic field texture with mipmaps in every format region patching
+supports, then pastes an image into the field rectangle both the way fields
+were replaced before, decoding the whole texture and encoding it again, and
+by patching only the region, reporting how long each one took.
+
+Run from the project root with: python -m benchmarks.field_region
+"""
+
+import argparse
+from time import perf_counter
+
+from tabulate import tabulate
+from UnityPy import load as unity_load
+from UnityPy.enums import TextureFormat
+
+from benchmarks.synthetic import texture_bundle
+from benchmarks.texture_formats import artwork_image
+from unity.bundle_payload import encode_texture
+from unity.texture_region import patch_texture_region
+from util.enums import FieldCoordinates
+from util.image_utils import paste_scaled_image
+
+FORMATS = [
+    TextureFormat.RGBA32,
+    TextureFormat.DXT1,
+    TextureFormat.DXT5,
+    TextureFormat.BC7,
+]
+
+
+def full_encode(texture, img, box, texture_format, mipmaps):
+    """The previous FieldService path: decode, paste and encode the whole texture"""
+
+    return encode_texture(
+        paste_scaled_image(texture.image, img, box), texture_format, mipmaps
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=2048, help="field texture size")
+    parser.add_argument("--mipmaps", type=int, default=10, help="mipmap count")
+    parser.add_argument("--runs", type=int, default=3, help="runs of each path")
+    args = parser.parse_args()
+
+    texture = unity_load(texture_bundle(1, 4)).objects[0].read()
+    field = artwork_image(args.size, False)
+    img = artwork_image(1024, True)
+    scale = args.size / 2048
+    box = tuple(int(value * scale) for value in FieldCoordinates.TOP.value)
+
+    rows = []
+    for texture_format in FORMATS:
+        encode_texture(field, texture_format, args.mipmaps).apply(texture)
+
+        timings = {}
+        for name, replace in (
+            ("full", full_encode),
+            ("region", patch_texture_region),
+        ):
+            start = perf_counter()
+            for _ in range(args.runs):
+                replace(texture, img, box, texture_format, args.mipmaps)
+            timings[name] = (perf_counter() - start) / args.runs
+
+        rows.append(
+            (
+                texture_format.name,
+                f"{timings['full']:.3f}",
+                f"{timings['region']:.3f}",
+                f"{timings['full'] / timings['region']:.1f}x",
+            )
+        )
+
+    print(
+        f"{args.size}x{args.size} field with {args.mipmaps} mipmaps, "
+        f"image pasted in {box}"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=("format", "full re-encode (s)", "region patch (s)", "speedup"),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark of the incremental data.unity3d repack against a full UnityPy save.
+Builds a synthetic multi-block bundle and replaces one texture in it, then
+times writing it back with the whole-file save used before and with the
+block-level repack. Loading and editing the texture are not timed, as both
+paths share them.
+
+Run from the project root with: python -m benchmarks.incremental_repack
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from tabulate import tabulate
+from UnityPy import load as unity_load
+from UnityPy.enums import TextureFormat
+
+from benchmarks.synthetic import noise_image, texture_bundle
+from unity.bundle_layout import read_bundle_layout
+from unity.bundle_repack import repack_bundle
+
+
+def _replace_texture(path: str, size: int):
+    env = unity_load(path)
+    obj = next(obj for obj in env.objects if obj.path_id == 1)
+    data = obj.read()
+    data.set_image(
+        img=noise_image((size, size), -1), target_format=TextureFormat.RGBA32
+    )
+    data.save()
+    return env
+
+
+def full_save(env, path: str) -> None:
+    """The previous replace_unity3d_asset path: save and write the whole bundle"""
+
+    with open(path, "wb") as f:
+        f.write(env.file.save())
+
+
+def incremental_save(env, path: str) -> None:
+    """The block-level repack used by the data.unity3d cache"""
+
+    repack_bundle(env.file, path)
+
+
+def _measure(function, path: str, size: int, runs: int) -> tuple[float, float, float]:
+    with open(path, "rb") as f:
+        original = f.read()
+
+    times = []
+    peak = 0
+    for _ in range(runs):
+        with open(path, "wb") as f:
+            f.write(original)
+        env = _replace_texture(path, size)
+
+        tracemalloc.start()
+        start = perf_counter()
+        function(env, path)
+        times.append(perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    written = os.path.getsize(path)
+    with open(path, "wb") as f:
+        f.write(original)
+
+    return min(times), peak / 2**20, written / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--textures", type=int, default=64, help="number of textures")
+    parser.add_argument(
+        "--size", type=int, default=512, help="texture width and height"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="runs per method")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.unity3d")
+        with open(path, "wb") as f:
+            f.write(texture_bundle(args.textures, args.size))
+        with open(path, "rb") as f:
+            blocks = len(read_bundle_layout(f).blocks)
+
+        print(
+            f"{args.textures} textures of {args.size}x{args.size}, "
+            f"{os.path.getsize(path) / 2**20:.1f} MiB in {blocks} blocks"
+        )
+
+        rows = []
+        for name, function in (
+            ("full save", full_save),
+            ("incremental", incremental_save),
+        ):
+            for label, size in (("same size", args.size), ("larger", args.size * 2)):
+                seconds, memory, written = _measure(function, path, size, args.runs)
+                rows.append(
+                    (name, label, f"{seconds:.3f}", f"{memory:.1f}", f"{written:.1f}")
+                )
+
+        print(
+            tabulate(
+                rows,
+                headers=(
+                    "method",
+                    "replacement",
+                    "best save time (s)",
+                    "peak save memory (MiB)",
+                    "file size (MiB)",
+                ),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of the parallel bundle save against UnityPy's save, per packer.
+Builds a synthetic multi-block bundle and saves it with every packer both
+through UnityPy, compressing one block after the other, and with the blocks
+compressed on a pool of threads, checking that both write the same bytes.
+
+Run from the project root with: python -m benchmarks.parallel_save
+"""
+
+import argparse
+from time import perf_counter
+
+from tabulate import tabulate
+from UnityPy import load as unity_load
+
+from benchmarks.synthetic import texture_bundle
+from unity.bundle_writer import BLOCK_WORKERS, save_bundle
+
+PACKERS = ["none", "lz4", "lzma"]
+
+
+def _best_time(function, runs: int) -> tuple[float, bytes]:
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        data = function()
+        times.append(perf_counter() - start)
+
+    return min(times), data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--textures", type=int, default=32, help="number of textures")
+    parser.add_argument(
+        "--size", type=int, default=512, help="texture width and height"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=BLOCK_WORKERS, help="compression threads"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="runs per method")
+    args = parser.parse_args()
+
+    bundle = unity_load(texture_bundle(args.textures, args.size)).file
+    print(
+        f"{args.textures} textures of {args.size}x{args.size}, "
+        f"saved with {args.workers} compression threads"
+    )
+
+    rows = []
+    for packer in PACKERS:
+        serial, expected = _best_time(lambda: bundle.save(packer=packer), args.runs)
+        parallel, data = _best_time(
+            lambda: save_bundle(bundle, packer, args.workers), args.runs
+        )
+
+        rows.append(
+            (
+                packer,
+                f"{len(data) / 2**20:.1f}",
+                f"{serial:.3f}",
+                f"{parallel:.3f}",
+                f"{serial / parallel:.1f}x",
+                "yes" if data == expected else "NO",
+            )
+        )
+
+    print(
+        tabulate(
+            rows,
+            headers=(
+                "packer",
+                "file size (MiB)",
+                "UnityPy save (s)",
+                "parallel save (s)",
+                "speedup",
+                "identical",
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
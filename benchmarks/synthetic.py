@@ -0,0 +1,148 @@
+"""
+Synthetic Unity bundles for the benchmarks.
+This module builds UnityFS bundles holding Texture2D objects from scratch,
+so that the benchmarks can run without a Master Duel installation.
+"""
+
+import random
+from struct import pack
+
+from PIL import Image
+from UnityPy.files import BundleFile
+from UnityPy.streams import EndianBinaryWriter
+
+ENGINE_VERSION = "2020.3.41f1"
+TEXTURE_CLASS_ID = 28
+
+
+def _aligned_string(value: bytes) -> bytes:
+    data = pack("<i", len(value)) + value
+    return data + b"\x00" * ((4 - len(data) % 4) % 4)
+
+
+def noise_image(size: tuple[int, int], seed: int) -> Image.Image:
+    """returns an RGBA image of random pixels, which compresses about as badly as real art"""
+
+    return Image.frombytes(
+        "RGBA", size, random.Random(seed).randbytes(size[0] * size[1] * 4)
+    )
+
+
+def texture2d_bytes(name: str, img: Image.Image) -> bytes:
+    """
+    Serializes an RGBA32 Texture2D without mipmaps.
+
+    :param name: The texture name.
+    :type name: str
+    :param img: The texture image.
+    :type img: Image.Image
+    :returns: The raw object data.
+    :rtype: bytes
+    """
+
+    width, height = img.size
+    image_data = img.convert("RGBA").transpose(Image.FLIP_TOP_BOTTOM).tobytes()
+
+    data = _aligned_string(name.encode())
+    data += pack("<i??", 0, False, False) + b"\x00\x00"
+    data += pack("<iiiiii", width, height, len(image_data), 0, 4, 1)
+    data += pack("<????", True, False, False, False)
+    data += pack("<iii", 0, 1, 2)
+    data += pack("<iifiii", 1, 1, 0.0, 0, 0, 0)
+    data += pack("<iii", 0, 1, 0)
+    data += pack("<i", len(image_data)) + image_data
+    data += b"\x00" * ((4 - len(data) % 4) % 4)
+    data += pack("<QI", 0, 0) + _aligned_string(b"")
+
+    return data
+
+
+def serialized_file(objects: list[tuple[int, int, bytes]]) -> bytes:
+    """
+    Builds a version 22 serialized file.
+
+    :param objects: The (path_id, class_id, data) of each object.
+    :type objects: list[tuple[int, int, bytes]]
+    :returns: The serialized file.
+    :rtype: bytes
+    """
+
+    class_ids = sorted({class_id for _, class_id, _ in objects})
+    header_size = 48
+
+    meta = ENGINE_VERSION.encode() + b"\x00" + pack("<i?", 19, False)
+    meta += pack("<i", len(class_ids))
+    for class_id in class_ids:
+        meta += pack("<i?h", class_id, False, -1) + b"\x00" * 16
+
+    meta += pack("<i", len(objects))
+    data = b""
+    for path_id, class_id, payload in objects:
+        meta += b"\x00" * ((4 - (header_size + len(meta)) % 4) % 4)
+        meta += pack(
+            "<qqIi", path_id, len(data), len(payload), class_ids.index(class_id)
+        )
+        data += payload + b"\x00" * ((8 - len(payload) % 8) % 8)
+
+    # Scripts, externals, reference types and user information
+    meta += pack("<iii", 0, 0, 0) + b"\x00"
+
+    data_offset = header_size + len(meta)
+    data_offset += (16 - data_offset % 16) % 16
+
+    out = pack(">IIII", 0, 0, 22, 0) + b"\x00" * 4
+    out += pack(">Iqqq", len(meta), data_offset + len(data), data_offset, 0)
+    out += meta
+    out += b"\x00" * (data_offset - len(out))
+
+    return out + data
+
+
+def bundle(files: dict[str, bytes], packer: str | None = "lz4") -> bytes:
+    """
+    Packs the given files into a UnityFS bundle through UnityPy.
+
+    :param files: The content of each file, keyed by name.
+    :type files: dict[str, bytes]
+    :param packer: The UnityPy packer to use.
+    :type packer: str | None, optional
+    :returns: The bundle.
+    :rtype: bytes
+    """
+
+    bundle_file = BundleFile.__new__(BundleFile)
+    bundle_file.signature = "UnityFS"
+    bundle_file.version = 8
+    bundle_file.version_player = "5.x.x"
+    bundle_file.version_engine = ENGINE_VERSION
+    bundle_file._uses_block_alignment = True
+    bundle_file.files = {}
+
+    for name, data in files.items():
+        writer = EndianBinaryWriter(data)
+        writer.flags = 4
+        bundle_file.files[name] = writer
+
+    return bundle_file.save(packer=packer)
+
+
+def texture_bundle(count: int, size: int, packer: str | None = "lz4") -> bytes:
+    """returns a bundle of count noise textures of size x size, named tex0, tex1..."""
+
+    return bundle(
+        {
+            "CAB-synthetic": serialized_file(
+                [
+                    (
+                        index + 1,
+                        TEXTURE_CLASS_ID,
+                        texture2d_bytes(
+                            f"tex{index}", noise_image((size, size), index)
+                        ),
+                    )
+                    for index in range(count)
+                ]
+            )
+        },
+        packer,
+    )
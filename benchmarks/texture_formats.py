@@ -0,0 +1,120 @@
+"""
+Benchmark of the output texture formats against encode time and bundle size.
+Encodes a synthetic artwork with mipmaps to every format replaced textures can
+be stored as, then stores it in a bundle the way the services do and reports
+how long encoding and saving took and how large the bundle ended up.
+
+Run from the project root with: python -m benchmarks.texture_formats
+"""
+
+import argparse
+import os
+import tempfile
+from time import perf_counter
+
+from PIL import Image, ImageDraw, ImageFilter
+from tabulate import tabulate
+from UnityPy import load as unity_load
+
+from benchmarks.synthetic import noise_image, texture_bundle
+from unity.bundle_payload import encode_texture
+from unity.texture_formats import OUTPUT_FORMATS
+
+
+def artwork_image(size: int, alpha: bool) -> Image.Image:
+    """returns gradients and shapes over light noise, closer to card art than pure noise"""
+
+    img = Image.linear_gradient("L").resize((size, size)).convert("RGBA")
+    img = Image.merge(
+        "RGBA",
+        (
+            img.getchannel("R"),
+            img.rotate(90).getchannel("G"),
+            img.getchannel("B"),
+            img.getchannel("A"),
+        ),
+    )
+    draw = ImageDraw.Draw(img)
+    for index in range(12):
+        offset = size * index // 12
+        draw.ellipse(
+            (offset, offset // 2, offset + size // 4, offset // 2 + size // 4),
+            fill=(255 - index * 20, index * 20, 128, 255),
+        )
+    img = Image.blend(img, noise_image((size, size), 0), 0.08)
+
+    if alpha:
+        mask = Image.new("L", (size, size), 0)
+        ImageDraw.Draw(mask).rounded_rectangle(
+            (size // 16, size // 16, size - size // 16, size - size // 16),
+            radius=size // 8,
+            fill=255,
+        )
+        img.putalpha(mask.filter(ImageFilter.GaussianBlur(size // 64)))
+    else:
+        img.putalpha(255)
+
+    return img
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--size", type=int, default=2048, help="texture width and height"
+    )
+    parser.add_argument("--mipmaps", type=int, default=10, help="mipmap count")
+    parser.add_argument("--packer", default="lz4", help="bundle packer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bundle")
+        with open(path, "wb") as f:
+            f.write(texture_bundle(1, 4, args.packer))
+
+        rows = []
+        for alpha in (True, False):
+            img = artwork_image(args.size, alpha)
+
+            for texture_format in OUTPUT_FORMATS:
+                start = perf_counter()
+                encoded = encode_texture(img, texture_format, args.mipmaps)
+                encode_time = perf_counter() - start
+
+                env = unity_load(path)
+                data = env.objects[0].read()
+                encoded.apply(data)
+                data.save()
+
+                start = perf_counter()
+                packed = env.file.save(packer=args.packer)
+                save_time = perf_counter() - start
+
+                rows.append(
+                    (
+                        "alpha" if alpha else "opaque",
+                        texture_format.name,
+                        f"{encode_time:.3f}",
+                        f"{save_time:.3f}",
+                        f"{len(encoded.data) / 2**20:.2f}",
+                        f"{len(packed) / 2**20:.2f}",
+                    )
+                )
+
+    print(f"{args.size}x{args.size} with {args.mipmaps} mipmaps, {args.packer} bundles")
+    print(
+        tabulate(
+            rows,
+            headers=(
+                "image",
+                "format",
+                "encode time (s)",
+                "save time (s)",
+                "texture data (MiB)",
+                "bundle size (MiB)",
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ including configuration, card data, and various UI assets.
 from typing import ClassVar
 
 from PySide6.QtGui import QIcon
-from sqlalchemy import String, Integer, Boolean, LargeBinary, Text
+from sqlalchemy import String, Integer, Boolean, LargeBinary, Text, BigInteger
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database.objects import base, engine
@@ -206,6 +206,210 @@ class FaceModel(UnityAsset, base):
     thumb: QIcon = QIcon()
 
 
+class Unity3DIndexModel(base):
+    """
+    Model for the data.unity3d object index state.
+
+    Stores the fingerprint of the data.unity3d file the object index was built from:
+    - mtime: Modification time of the file, in nanoseconds
+    - size: Size of the file, in bytes
+    """
+
+    __tablename__ = "unity3d_index"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    mtime: Mapped[int] = mapped_column(BigInteger)
+    size: Mapped[int] = mapped_column(BigInteger)
+
+
+class Unity3DObjectModel(base):
+    """
+    Model for the data.unity3d object index.
+
+    Stores the location and metadata of each object inside data.unity3d including:
+    - file and path_id: Serialized file and path ID of the object
+    - type and size: Unity class name and serialized size of the object
+    - name and dimensions: Texture name, width and height (Texture2D only)
+    """
+
+    __tablename__ = "unity3d_object"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    file: Mapped[str] = mapped_column(String(255))
+    path_id: Mapped[int] = mapped_column(BigInteger, index=True)
+    type: Mapped[str] = mapped_column(String(100))
+    size: Mapped[int] = mapped_column(Integer)
+    name: Mapped[str] = mapped_column(String(255), nullable=True, index=True)
+    width: Mapped[int] = mapped_column(Integer, nullable=True)
+    height: Mapped[int] = mapped_column(Integer, nullable=True)
+
+
+class TextureFormatModel(base):
+    """
+    Model for the output texture format of each asset type.
+
+    Stores the encoding settings of each asset type including:
+    - asset: Asset type, matching the service subfolder (cards, sleeves...)
+    - format: Name of the TextureFormat replaced textures are encoded to
+    - auto_dxt1: Whether images without alpha use the format's opaque variant
+    """
+
+    __tablename__ = "texture_format"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    asset: Mapped[str] = mapped_column(String(50), unique=True)
+    format: Mapped[str] = mapped_column(String(50), default="RGBA32")
+    auto_dxt1: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class TextureSizeModel(base):
+    """
+    Model for the size of the replacement images of each asset type.
+
+    Stores the resizing settings of each asset type including:
+    - asset: Asset type, matching the service subfolder (cards, sleeves...)
+    - keep_size: Whether images larger than the original texture keep their size
+    """
+
+    __tablename__ = "texture_size"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    asset: Mapped[str] = mapped_column(String(50), unique=True)
+    keep_size: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class BundleCatalogModel(base):
+    """
+    Model for the catalog of the game's asset bundles.
+
+    Stores where each bundle was found by the last catalog scan including:
+    - bundle and path: Bundle name and its resolved file path
+    - streaming: Whether the bundle is in StreamingAssets instead of the 0000 folder
+    - mtime and size: Modification time (in nanoseconds) and size of the file
+    """
+
+    __tablename__ = "bundle_catalog"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    bundle: Mapped[str] = mapped_column(String(255), unique=True)
+    path: Mapped[str] = mapped_column(String(610))
+    streaming: Mapped[bool] = mapped_column(Boolean, default=False)
+    mtime: Mapped[int] = mapped_column(BigInteger)
+    size: Mapped[int] = mapped_column(BigInteger)
+
+
+class BundleTextureModel(base):
+    """
+    Model for the textures of the cataloged asset bundles.
+
+    Stores the metadata of each Texture2D inside a bundle including:
+    - bundle and path_id: Bundle name and path ID of the texture
+    - name, width and height: Texture name and dimensions
+    - format and mip_count: Texture format name and number of mip levels
+    """
+
+    __tablename__ = "bundle_texture"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    bundle: Mapped[str] = mapped_column(String(255), index=True)
+    path_id: Mapped[int] = mapped_column(BigInteger)
+    name: Mapped[str] = mapped_column(String(255))
+    width: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer)
+    format: Mapped[str] = mapped_column(String(50))
+    mip_count: Mapped[int] = mapped_column(Integer)
+
+
+class NativeSizeModel(base):
+    """
+    Model for the original texture size of the asset bundles.
+
+    Stores the size of the first texture of each bundle as the game ships it:
+    - bundle: Bundle name
+    - width and height: Texture dimensions, recorded before the bundle is first written
+    """
+
+    __tablename__ = "native_size"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    bundle: Mapped[str] = mapped_column(String(255), unique=True)
+    width: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer)
+
+
+class BackupBlobModel(base):
+    """
+    Model for the texture data kept by the backup store.
+
+    Each blob is stored once, named after the hash of its content, including:
+    - digest: Hash of the texture data and the header fields describing it
+    - compression: Codec the blob file is compressed with (lz4 or lzma)
+    - size and stored_size: Size of the texture data and of the compressed file
+    - width, height, format and mip_count: Header of the texture
+    - version and platform: Unity version and build target the texture was read from
+    """
+
+    __tablename__ = "backup_blob"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    digest: Mapped[str] = mapped_column(String(40), unique=True)
+    compression: Mapped[str] = mapped_column(String(10))
+    size: Mapped[int] = mapped_column(BigInteger)
+    stored_size: Mapped[int] = mapped_column(BigInteger)
+    width: Mapped[int] = mapped_column(Integer)
+    height: Mapped[int] = mapped_column(Integer)
+    format: Mapped[str] = mapped_column(String(50))
+    mip_count: Mapped[int] = mapped_column(Integer)
+    version: Mapped[str] = mapped_column(String(50))
+    platform: Mapped[int] = mapped_column(Integer)
+
+
+class BackupConfigModel(base):
+    """
+    Model for the backup settings.
+
+    Stores how the original assets are backed up including:
+    - bundle_copies: Whether bundles are backed up as copies of their original file
+    """
+
+    __tablename__ = "backup_config"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    bundle_copies: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class SnapshotConfigModel(base):
+    """
+    Model for the background backup settings.
+
+    Stores how backups are taken ahead of time including:
+    - mode: Which assets are backed up ahead of time (off, favorites or all)
+    """
+
+    __tablename__ = "snapshot_config"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    mode: Mapped[str] = mapped_column(String(10), default="off")
+
+
+class BackupEntryModel(base):
+    """
+    Model for the index of the backup store.
+
+    Maps each backed up asset to the blob holding its original texture:
+    - subfolder: Asset type, matching the service subfolder (cards, sleeves...)
+    - asset: Bundle or texture the backup was taken from
+    - digest: Digest of the blob holding the texture
+    """
+
+    __tablename__ = "backup_entry"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    subfolder: Mapped[str] = mapped_column(String(50))
+    asset: Mapped[str] = mapped_column(String(255))
+    digest: Mapped[str] = mapped_column(String(40), index=True)
+
+
 class DeckBoxModel(UnityAsset, base):
     """
     Model for deck box assets.
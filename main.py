@@ -12,6 +12,7 @@ from PySide6.QtWidgets import QSplashScreen
 
 from database.objects import session
 from pages.main_window import MainWindow
+from unity.backup_snapshot import BACKUP_SNAPSHOT
 from util.ui_util import get_dark_mode_palette
 
 if __name__ == "__main__":
@@ -38,6 +39,10 @@ if __name__ == "__main__":
         # Start the application event loop
         app.exec()
 
+        # Wait for the backups being taken in the background and record them
+        BACKUP_SNAPSHOT.stop()
+        BACKUP_SNAPSHOT.flush()
+
         # Commit any pending database changes
         session.commit()
     except Exception as error:
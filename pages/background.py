@@ -9,7 +9,11 @@ from pyqttoast import ToastPreset
 
 
 from pages.ui.background import Ui_Background
+from unity.backup_snapshot import BACKUP_SNAPSHOT
+from unity.backup_store import BACKUP_STORE
+from unity.unity3d_transaction import Unity3DTransaction
 from unity.unity_utils import (
+    backup_unity3d_asset,
     fetch_home_bg,
     extract_unity3d_image,
     replace_unity3d_asset,
@@ -61,12 +65,19 @@ class Background(QtWidgets.QWidget, Ui_Background):
         self.restoreButton.clicked.connect(self._restore)
 
     def _restore(self):
+        encoded = BACKUP_STORE.texture("background", FILE["BACKGROUND"])
         backup = join("backups", FILE["BACKGROUND"] + ".png")
-        if isfile(backup):
-            replace_unity3d_asset(
-                FILE["BACKGROUND"],
-                Image.open(backup).resize((1920, 1080), Resampling.LANCZOS),
-            )
+
+        if encoded or isfile(backup):
+            with BACKUP_SNAPSHOT.paused():
+                if encoded:
+                    with Unity3DTransaction() as transaction:
+                        transaction.restore(FILE["BACKGROUND"], encoded)
+                else:
+                    replace_unity3d_asset(
+                        FILE["BACKGROUND"],
+                        Image.open(backup).resize((1920, 1080), Resampling.LANCZOS),
+                    )
             self.current.setPixmap(fetch_home_bg().pixmap(1920, 1080))
             show_toast(
                 self,
@@ -103,15 +114,19 @@ class Background(QtWidgets.QWidget, Ui_Background):
         )
 
     def _replace(self):
-        if APP_CONFIG.create_backup and not isfile(
-            join("backups", FILE["BACKGROUND"] + ".png")
-        ):
-            extract_unity3d_image(FILE["BACKGROUND"], backup=True)
-
-        replace_unity3d_asset(
-            FILE["BACKGROUND"],
-            Image.open(self.image_path).resize((1920, 1080), Resampling.LANCZOS),
-        )
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not (
+                BACKUP_STORE.has("background", FILE["BACKGROUND"])
+                or isfile(join("backups", FILE["BACKGROUND"] + ".png"))
+            ):
+                backup_unity3d_asset(
+                    FILE["BACKGROUND"], "background", FILE["BACKGROUND"]
+                )
+
+            replace_unity3d_asset(
+                FILE["BACKGROUND"],
+                Image.open(self.image_path).resize((1920, 1080), Resampling.LANCZOS),
+            )
         self.current.setPixmap(fetch_home_bg().pixmap(1920, 1080))
 
         show_toast(
@@ -9,10 +9,13 @@ from dialogs.card_edit_dialog import CardEditDialog
 from pages.models.card_list_model import CardListModel
 from pages.ui.card import Ui_Card
 from services.card_service import CardService
+from unity.backup_snapshot import BACKUP_SNAPSHOT
+from unity.backup_store import BACKUP_STORE
+from unity.texture_formats import TEXTURE_FORMATS
 from unity.unity_utils import fetch_bundle_thumb
 from util.constants import IMAGE_FILTER, APP_CONFIG
 from util.python_utils import remove_alt_tags
-from util.ui_util import show_toast
+from util.ui_util import run_with_progress, show_toast
 
 
 class Card(QtWidgets.QWidget, Ui_Card):
@@ -24,6 +27,7 @@ class Card(QtWidgets.QWidget, Ui_Card):
         self.model = CardListModel()
         self.cardsView.setModel(self.model)
         self.selected: Optional[CardModel] = None
+        self.task = None
 
         # Enable drag and drop
         self.setAcceptDrops(True)
@@ -58,6 +62,7 @@ class Card(QtWidgets.QWidget, Ui_Card):
         self.cardsView.clicked.connect(self._on_card_clicked)
         self.selectButton.clicked.connect(self._select_image)
         self.replaceButton.clicked.connect(self._replace)
+        self.replaceSelectedButton.clicked.connect(self._replace_selected)
         self.copyButton.clicked.connect(self._copy)
         self.extractButton.clicked.connect(self._extract_texture)
         self.searchButton.clicked.connect(self._search)
@@ -93,7 +98,10 @@ class Card(QtWidgets.QWidget, Ui_Card):
                 )
 
     def _restore(self):
-        if self.service.restore_asset():
+        with BACKUP_SNAPSHOT.paused():
+            restored = self.service.restore_asset()
+
+        if restored:
             self.model.refresh()
             show_toast(
                 self, "Backup", "Card restored successfully", ToastPreset.SUCCESS_DARK
@@ -124,6 +132,7 @@ class Card(QtWidgets.QWidget, Ui_Card):
         )
 
         self.replaceButton.setEnabled(True)
+        self.replaceSelectedButton.setEnabled(True)
         self.extractButton.setEnabled(True)
         self.restoreButton.setEnabled(True)
         self.copyButton.setEnabled(True)
@@ -166,11 +175,12 @@ class Card(QtWidgets.QWidget, Ui_Card):
         )
 
     def _replace(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            self.service.create_backup(self.service.bundle)
-            self.model.set_backup_state(self.selected.id, True)
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not self.selected.has_backup:
+                self.service.create_backup(self.service.bundle)
+                self.model.set_backup_state(self.selected.id, True)
 
-        self.service.replace_bundle()
+            self.service.replace_bundle()
         self.model.refresh()
         self.current.setPixmap(
             fetch_bundle_thumb(
@@ -182,6 +192,68 @@ class Card(QtWidgets.QWidget, Ui_Card):
             self, "Card", "Card replacement successful", ToastPreset.SUCCESS_DARK
         )
 
+    def _replace_selected(self):
+        if not self.service.image_path:
+            show_toast(
+                self, "Card", "Please select an image first", ToastPreset.WARNING_DARK
+            )
+            return
+
+        cards = [
+            self.model.assets[index.row()] for index in self.cardsView.selectedIndexes()
+        ]
+        create_backup = APP_CONFIG.create_backup
+        backups = {
+            card.bundle for card in cards if create_backup and not card.has_backup
+        }
+        bundle_copies = BACKUP_STORE.bundle_copies
+        ids = {card.bundle: card.id for card in cards}
+        pairs = [(card.bundle, self.service.image_path) for card in cards]
+
+        # The workers never query the database, so what they read is loaded here,
+        # and nothing is recorded in the background until they are done
+        BACKUP_STORE.load()
+        TEXTURE_FORMATS.load()
+        BACKUP_SNAPSHOT.pause()
+
+        def done(failures, error):
+            BACKUP_SNAPSHOT.resume()
+            for bundle in self.service.record_backups():
+                self.model.set_backup_state(ids[bundle], True)
+            self.model.refresh()
+            self.task = None
+
+            if error or failures:
+                show_toast(
+                    self,
+                    "Card",
+                    (
+                        f"Failed to replace the cards: {str(error)}"
+                        if error
+                        else f"{len(failures)} cards could not be replaced"
+                    ),
+                    ToastPreset.WARNING_DARK,
+                )
+            else:
+                show_toast(
+                    self,
+                    "Card",
+                    f"{len(pairs)} cards replaced, "
+                    f"{len(self.service.skipped)} already had the image",
+                    ToastPreset.SUCCESS_DARK,
+                )
+
+        self.service.skipped = []
+        self.task = run_with_progress(
+            self,
+            "Card",
+            f"Replacing {len(pairs)} cards...",
+            lambda progress: self.service.replace_many(
+                pairs, progress=progress, backups=backups, bundle_copies=bundle_copies
+            ),
+            done,
+        )
+
     def _search(self):
         search_filter = self.searchEdit.text()
 
@@ -2,6 +2,8 @@ from datetime import datetime
 import os
 from threading import Thread
 
+from PIL import Image
+from PIL.Image import Resampling
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QFileDialog, QWidget, QProgressDialog
 from PySide6.QtGui import QDragEnterEvent, QDropEvent
@@ -13,6 +15,7 @@ from dialogs.simple_dialogs import show_confirmation_dialog
 from pages.models.asset_list_model import AssetListModel
 from pages.ui.config import Ui_Config
 from services.card_service import CardService
+from services.face_service import FaceService
 from services.unity_service import UnityService
 from services.update_service import (
     update_sleeves,
@@ -25,7 +28,12 @@ from services.update_service import (
     get_github_raw_file,
     update_card_metadata,
 )
-from util.constants import APP_CONFIG, IMAGE_FILTER, BG_TEMPLATE
+from unity.backup_snapshot import BACKUP_SNAPSHOT, SNAPSHOT_MODES
+from unity.backup_store import BACKUP_STORE
+from unity.texture_formats import ASSET_TYPES, OUTPUT_FORMATS, TEXTURE_FORMATS
+from unity.unity3d_transaction import Unity3DTransaction
+from util.constants import APP_CONFIG, IMAGE_FILTER, BG_TEMPLATE, FILE
+from util.image_utils import convert_to_png
 from util.python_utils import get_instances_of_subclasses, is_valid_game_path
 from util.ui_util import show_toast
 
@@ -86,29 +94,80 @@ class Config(QWidget, Ui_Config):
 
     def restore_all_asset_changes(self) -> None:
         count = 0
+        skipped = 0
+        models: list[AssetListModel] = []
+
+        # Every data.unity3d texture (faces and the home background) is restored with a single save
+        with BACKUP_SNAPSHOT.paused(), Unity3DTransaction() as transaction:
+            for service, model in self._get_services_and_models():
+                backups_path = os.path.join("backups", service.subfolder)
+
+                if isinstance(service, FaceService):
+                    service.transaction = transaction
+                service.skipped = []
+
+                # Bundle copies are copied back without loading the bundles
+                stored = BACKUP_STORE.bundles(service.subfolder)
+                stored += [
+                    asset
+                    for asset in BACKUP_STORE.assets(service.subfolder)
+                    if asset not in stored
+                ]
+                for asset in stored:
+                    service.bundle = asset
+                    count += 1 if service.restore_asset() else 0
+
+                # PNG backups of older versions, for the assets not in the backup store
+                if os.path.exists(backups_path):
+                    for filename in os.listdir(backups_path):
+                        file_path = os.path.join(backups_path, filename)
+                        asset = filename.replace(".png", "")
+
+                        if os.path.isfile(file_path) and asset not in stored:
+                            service.bundle = asset
+                            count += 1 if service.restore_asset() else 0
+
+                skipped += len(service.skipped)
+                models.append(model)
+
+            background = BACKUP_STORE.texture("background", FILE["BACKGROUND"])
+            background_backup = os.path.join("backups", FILE["BACKGROUND"] + ".png")
+            if background:
+                transaction.restore(FILE["BACKGROUND"], background)
+                count += 1
+            elif os.path.isfile(background_backup):
+                transaction.replace(
+                    FILE["BACKGROUND"],
+                    convert_to_png(
+                        Image.open(background_backup).resize(
+                            (1920, 1080), Resampling.LANCZOS
+                        )
+                    ),
+                )
+                count += 1
 
-        for service, model in self._get_services_and_models():
-            backups_path = os.path.join("backups", service.subfolder)
-
-            if os.path.exists(backups_path):
-                for filename in os.listdir(backups_path):
-                    file_path = os.path.join(backups_path, filename)
-
-                    if os.path.isfile(file_path):
-                        service.bundle = filename.replace(".png", "")
-                        count += 1 if service.restore_asset() else 0
+        skipped += len(transaction.skipped)
 
+        for model in models:
             model.refresh()
+        self._show_backup_size()
 
         show_toast(
             self,
             "Backups",
-            f"{count} assets have been restored successfully",
+            f"{count} assets have been restored successfully"
+            + (f" ({skipped} files were already up to date)" if skipped else ""),
             ToastPreset.SUCCESS_DARK,
         )
 
     def delete_backups(self) -> None:
-        count = 0
+        # Backups taken in the background would point to the deleted blobs
+        BACKUP_SNAPSHOT.stop()
+        BACKUP_SNAPSHOT.discard()
+
+        report = BACKUP_STORE.report()
+        count = report.entries + report.bundles
+        BACKUP_STORE.clear()
 
         for service, model in self._get_services_and_models():
             backups_path = os.path.join("backups", service.subfolder)
@@ -120,6 +179,11 @@ class Config(QWidget, Ui_Config):
 
             model.reset_backups()
 
+        # Every asset is without a backup again, so the snapshot starts over
+        BACKUP_SNAPSHOT.start()
+
+        self._show_backup_size()
+
         show_toast(
             self,
             "Backups",
@@ -127,6 +191,18 @@ class Config(QWidget, Ui_Config):
             ToastPreset.SUCCESS_DARK,
         )
 
+    def _show_backup_size(self) -> None:
+        report = BACKUP_STORE.report()
+        self.backupSizeLabel.setText(
+            f"{report.entries} backups, {report.stored_size / 2**20:.1f} MiB"
+            f" ({report.size / 2**20:.1f} MiB uncompressed)"
+            + (
+                f", {report.bundles} bundle copies, {report.bundle_size / 2**20:.1f} MiB"
+                if report.bundles
+                else ""
+            )
+        )
+
     def _get_services_and_models(self):
         # This SHOULD return the correct service per model as long as the naming standard is followed
         services: list[UnityService] = get_instances_of_subclasses(UnityService)
@@ -140,6 +216,8 @@ class Config(QWidget, Ui_Config):
         self.bgButton.clicked.connect(self._get_background)
         self.bgResetButton.clicked.connect(self._reset_background)
         self.backupBox.clicked.connect(self._set_use_backups)
+        self.bundleBackupBox.clicked.connect(self._set_bundle_copies)
+        self.snapshotBox.currentIndexChanged.connect(self._set_snapshot_mode)
         self.restoreButton.clicked.connect(self._restore)
         self.clearButton.clicked.connect(self._delete_backups)
         self.applyTextButton.clicked.connect(self._apply_all_text_edits)
@@ -153,6 +231,10 @@ class Config(QWidget, Ui_Config):
             self.lzhamButton,
         ]:
             radio.toggled.connect(lambda checked, r=radio: self._set_packer(r))
+        self.formatAssetBox.currentIndexChanged.connect(self._show_texture_format)
+        self.formatBox.currentIndexChanged.connect(self._set_texture_format)
+        self.autoDxt1Box.toggled.connect(self._set_texture_format)
+        self.keepSizeBox.toggled.connect(self._set_texture_format)
 
     def _set_packer(self, radio):
         # Ignore the event if it was turned off
@@ -161,6 +243,27 @@ class Config(QWidget, Ui_Config):
             if packer != APP_CONFIG.packer:
                 APP_CONFIG.packer = packer
 
+    def _show_texture_format(self):
+        asset = self.formatAssetBox.currentData()
+        texture_format, auto_dxt1 = TEXTURE_FORMATS.get(asset)
+
+        # Showing the stored format must not store it again
+        for widget in [self.formatBox, self.autoDxt1Box, self.keepSizeBox]:
+            widget.blockSignals(True)
+        self.formatBox.setCurrentIndex(self.formatBox.findData(texture_format))
+        self.autoDxt1Box.setChecked(auto_dxt1)
+        self.keepSizeBox.setChecked(TEXTURE_FORMATS.keep_size(asset))
+        for widget in [self.formatBox, self.autoDxt1Box, self.keepSizeBox]:
+            widget.blockSignals(False)
+
+    def _set_texture_format(self):
+        TEXTURE_FORMATS.set(
+            self.formatAssetBox.currentData(),
+            self.formatBox.currentData(),
+            self.autoDxt1Box.isChecked(),
+            self.keepSizeBox.isChecked(),
+        )
+
     def _set_mip_count(self):
         APP_CONFIG.mip_count = self.mipBox.value()
 
@@ -183,6 +286,11 @@ class Config(QWidget, Ui_Config):
         APP_CONFIG.create_backup = create_backup
         session.commit()
 
+        if create_backup:
+            BACKUP_SNAPSHOT.start()
+        else:
+            BACKUP_SNAPSHOT.stop()
+
         show_toast(
             self,
             "Backups",
@@ -190,6 +298,16 @@ class Config(QWidget, Ui_Config):
             ToastPreset.SUCCESS_DARK,
         )
 
+    def _set_bundle_copies(self):
+        # The snapshot is restarted, so it takes backups of the new kind
+        BACKUP_SNAPSHOT.stop()
+        BACKUP_SNAPSHOT.flush()
+        BACKUP_STORE.set_bundle_copies(self.bundleBackupBox.isChecked())
+        BACKUP_SNAPSHOT.start()
+
+    def _set_snapshot_mode(self):
+        BACKUP_SNAPSHOT.set_mode(self.snapshotBox.currentData())
+
     def _get_game_path(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Game Folder")
         if folder and folder != "":
@@ -221,6 +339,13 @@ class Config(QWidget, Ui_Config):
         self.bgLine.setText(APP_CONFIG.background_path)
         self.updateLine.setText(APP_CONFIG.version)
         self.backupBox.setChecked(APP_CONFIG.create_backup or False)
+        self.bundleBackupBox.setChecked(BACKUP_STORE.bundle_copies)
+        self.snapshotBox.blockSignals(True)
+        for mode in SNAPSHOT_MODES:
+            self.snapshotBox.addItem(f"Pre-backup: {mode}", mode)
+        self.snapshotBox.setCurrentIndex(SNAPSHOT_MODES.index(BACKUP_SNAPSHOT.mode))
+        self.snapshotBox.blockSignals(False)
+        self._show_backup_size()
         self.mipBox.setValue(APP_CONFIG.mipmap_count or 10)
         for radio in [
             self.noneButton,
@@ -233,6 +358,13 @@ class Config(QWidget, Ui_Config):
                 radio.setChecked(True)
                 break
 
+        self.formatBox.blockSignals(True)
+        for texture_format in OUTPUT_FORMATS:
+            self.formatBox.addItem(texture_format.name, texture_format)
+        self.formatBox.blockSignals(False)
+        for asset in ASSET_TYPES:
+            self.formatAssetBox.addItem(asset.capitalize(), asset)
+
     def _check_update(self):
         if APP_CONFIG.game_path is not None:
             self._get_data()
@@ -367,7 +499,12 @@ class Config(QWidget, Ui_Config):
         show_toast(
             self,
             "Text Edits",
-            f"Successfully applied {success_count} text edits",
+            f"Successfully applied {success_count} text edits"
+            + (
+                f" ({len(card_service.skipped)} unchanged writes skipped)"
+                if card_service.skipped
+                else ""
+            ),
             ToastPreset.SUCCESS_DARK,
         )
 
@@ -9,6 +9,7 @@ from database.models import FaceModel
 from pages.models.face_list_model import FaceListModel
 from pages.ui.face import Ui_Face
 from services.face_service import FaceService
+from unity.backup_snapshot import BACKUP_SNAPSHOT
 from unity.unity_utils import fetch_unity3d_image
 from util.constants import IMAGE_FILTER, APP_CONFIG
 from util.image_utils import slugify
@@ -62,7 +63,10 @@ class Face(QtWidgets.QWidget, Ui_Face):
         self.restoreButton.clicked.connect(self._restore)
 
     def _restore(self) -> None:
-        if self.service.restore_asset(slugify(self.selected.name)):
+        with BACKUP_SNAPSHOT.paused():
+            restored = self.service.restore_asset(slugify(self.selected.name))
+
+        if restored:
             self.model.refresh()
             show_toast(
                 self,
@@ -108,11 +112,12 @@ class Face(QtWidgets.QWidget, Ui_Face):
         )
 
     def _replace(self) -> None:
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            self.service.extract_texture(self.selected.name, backup=True)
-            self.model.set_backup_state(self.selected.id, True)
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not self.selected.has_backup:
+                self.service.create_backup(self.selected.name)
+                self.model.set_backup_state(self.selected.id, True)
 
-        self.service.replace_bundle()
+            self.service.replace_bundle()
         self.model.refresh()
         self.current.setPixmap(
             fetch_unity3d_image(self.service.bundle, (256, 375)).pixmap(256, 375)
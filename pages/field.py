@@ -6,6 +6,7 @@ from pyqttoast import ToastPreset
 from pages.models.field_list_model import FieldListModel
 from pages.ui.field import Ui_Field
 from services.field_service import FieldService
+from unity.backup_snapshot import BACKUP_SNAPSHOT
 from unity.unity_utils import fetch_field_thumb
 from util.constants import IMAGE_FILTER
 from util.ui_util import show_toast
@@ -73,7 +74,8 @@ class Field(QtWidgets.QWidget, Ui_Field):
         )
 
     def _replace(self):
-        self.service.replace_bundle()
+        with BACKUP_SNAPSHOT.paused():
+            self.service.replace_bundle()
         self.model.refresh()
         self.current.setPixmap(fetch_field_thumb(self.selected).pixmap(768, 267))
 
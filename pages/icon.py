@@ -6,6 +6,7 @@ from pyqttoast import ToastPreset
 from pages.models.icon_list_model import IconListModel
 from pages.ui.icon import Ui_Icon
 from services.icon_service import IconService
+from unity.backup_snapshot import BACKUP_SNAPSHOT
 from unity.unity_utils import fetch_bundle_thumb
 from util.constants import IMAGE_FILTER, APP_CONFIG
 from util.ui_util import show_toast
@@ -37,7 +38,10 @@ class Icon(QtWidgets.QWidget, Ui_Icon):
     def _restore(self):
         icons = self.service.bundle
         self.service.bundle = self.service.bundle.bundle_big
-        if self.service.restore_asset():
+        with BACKUP_SNAPSHOT.paused():
+            restored = self.service.restore_asset()
+
+        if restored:
             self.model.refresh()
             show_toast(
                 self, "Backup", "Card restored successfully", ToastPreset.SUCCESS_DARK
@@ -101,14 +105,15 @@ class Icon(QtWidgets.QWidget, Ui_Icon):
         )
 
     def _replace(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            icons = self.service.bundle
-            self.service.bundle = self.service.bundle.bundle_big
-            self.service.create_backup(self.service.bundle)
-            self.service.bundle = icons
-            self.model.set_backup_state(self.selected.id, True)
-
-        self.service.replace_bundle()
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not self.selected.has_backup:
+                icons = self.service.bundle
+                self.service.bundle = self.service.bundle.bundle_big
+                self.service.create_backup(self.service.bundle)
+                self.service.bundle = icons
+                self.model.set_backup_state(self.selected.id, True)
+
+            self.service.replace_bundle()
         self.model.refresh()
         self.current.setPixmap(
             fetch_bundle_thumb(self.service.bundle.bundle_medium, (256, 256)).pixmap(
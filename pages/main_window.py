@@ -20,6 +20,10 @@ from pages.icon import Icon
 from pages.sleeve import Sleeve
 from pages.ui.main_window import Ui_MainWindow
 from pages.wallpaper import Wallpaper
+from unity.backup_snapshot import BACKUP_SNAPSHOT, SNAPSHOT_FLUSH_INTERVAL
+from unity.bundle_catalog import BUNDLE_CATALOG, known_bundles
+from unity.bundle_journal import recover_bundle_journals
+from unity.bundle_remap import recover_bundle_remap
 from util.python_utils import is_valid_game_path
 from util.constants import APP_CONFIG, BG_TEMPLATE
 from util.ui_util import show_toast
@@ -54,6 +58,12 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self._connect_menu_callbacks()
         self._load_bg()
 
+        # Backups taken and bundles scanned in the background are recorded from
+        # the main thread
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.timeout.connect(self._flush_background)
+        self.flush_timer.start(SNAPSHOT_FLUSH_INTERVAL)
+
         self.show()
 
     def _load_pages(self) -> None:
@@ -72,6 +82,58 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 Wallpaper,
             ]
 
+            # Interrupted bundle writes are recovered before the pages read any bundle
+            self.splash.showMessage(
+                "Recovering bundles...",
+                alignment=QtCore.Qt.AlignBottom | QtCore.Qt.AlignCenter,
+                color=QtCore.Qt.white,
+            )
+            try:
+                if recover_bundle_remap():
+                    show_toast(
+                        self,
+                        "Bundle Remap",
+                        "An interrupted bundle swap was rolled back.",
+                        ToastPreset.WARNING_DARK,
+                    )
+            except Exception as e:
+                show_toast(
+                    self,
+                    "Bundle Remap",
+                    f"Failed to roll back the interrupted bundle swap: {str(e)}",
+                    ToastPreset.WARNING_DARK,
+                )
+
+            try:
+                completed, undone = recover_bundle_journals()
+                if completed or undone:
+                    show_toast(
+                        self,
+                        "Bundle Write",
+                        f"{completed} interrupted bundle writes were completed and "
+                        f"{undone} were rolled back.",
+                        ToastPreset.WARNING_DARK,
+                    )
+            except Exception as e:
+                show_toast(
+                    self,
+                    "Bundle Write",
+                    f"Failed to recover the interrupted bundle writes: {str(e)}",
+                    ToastPreset.WARNING_DARK,
+                )
+
+            # Bundles are cataloged in the background, lookups resolve them from
+            # their folders until the scan is recorded
+            try:
+                BUNDLE_CATALOG.start_scan(known_bundles())
+            except Exception as e:
+                show_toast(
+                    self,
+                    "Bundle Scan",
+                    f"Failed to scan the game bundles: {str(e)}",
+                    ToastPreset.WARNING_DARK,
+                )
+
             # Always load the Config page first
             self.mainStack.addWidget(Config())
 
@@ -101,6 +163,9 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                     layout.addWidget(error_label)
                     error_widget.setLayout(layout)
                     self.mainStack.addWidget(error_widget)
+
+            # Originals are backed up ahead of time once the pages are loaded
+            BACKUP_SNAPSHOT.start()
         else:
             if error_message and APP_CONFIG.game_path:
                 show_toast(
@@ -112,6 +177,25 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.mainStack.addWidget(Config())
             self.toolBar.setEnabled(False)
 
+    def _flush_background(self) -> None:
+        """Records the work finished by the background jobs."""
+        # Committing expires the loaded configuration, which operations running
+        # on worker threads may still be reading
+        if BACKUP_SNAPSHOT.is_paused:
+            return
+
+        BACKUP_SNAPSHOT.flush()
+
+        try:
+            BUNDLE_CATALOG.flush()
+        except Exception as e:
+            show_toast(
+                self,
+                "Bundle Scan",
+                f"Failed to scan the game bundles: {str(e)}",
+                ToastPreset.WARNING_DARK,
+            )
+
     def _connect_menu_callbacks(self) -> None:
         """Connects the menu buttons to their respective pages in the stack."""
         buttons = [
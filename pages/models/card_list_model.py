@@ -7,6 +7,7 @@ from typing_extensions import override
 from database.models import CardModel
 from database.objects import session
 from pages.models.asset_list_model import AssetListModel
+from unity.bundle_catalog import BUNDLE_CATALOG
 from unity.unity_utils import fetch_bundle_thumb
 
 
@@ -37,10 +38,8 @@ class CardListModel(AssetListModel):
                 thread.join()
 
     def _refresh_card(self, card):
-        card.thumb = fetch_bundle_thumb(card.bundle, (128, 128))
-        if not card.thumb:
-            card.thumb = fetch_bundle_thumb(card.bundle, (128, 128), True)
-            card.unity_file = True
+        card.unity_file = BUNDLE_CATALOG.is_streaming(card.bundle)
+        card.thumb = fetch_bundle_thumb(card.bundle, (128, 128), card.unity_file)
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
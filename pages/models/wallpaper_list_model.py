@@ -6,7 +6,7 @@ from PySide6.QtGui import Qt
 from database.models import WallpaperModel
 from database.objects import session
 from pages.models.asset_list_model import AssetListModel
-from unity.unity_utils import fetch_bundle_thumb
+from unity.unity_utils import fetch_bundle_thumb, fetch_texture_info
 from util.python_utils import max_ratio_within_limit
 
 
@@ -31,12 +31,12 @@ class WallpaperListModel(AssetListModel):
             thread.join()
 
     def refresh_thumb(self, asset: WallpaperModel):
-        size = max_ratio_within_limit(
-            fetch_bundle_thumb(asset.bundle_foreground, None)
-            .availableSizes()[0]
-            .toTuple(),
-            200,
-        )
+        info = fetch_texture_info(asset.bundle_foreground)
+        if not info:
+            asset.thumb = None
+            return
+
+        size = max_ratio_within_limit((info.width, info.height), 200)
         asset.thumb = fetch_bundle_thumb(asset.bundle_foreground, (size[1], size[0]))
 
     def data(self, index, role):
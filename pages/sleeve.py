@@ -7,9 +7,12 @@ from dialogs.simple_dialogs import show_color_dialog
 from pages.models.sleeve_list_model import SleeveListModel
 from pages.ui.sleeve import Ui_Sleeve
 from services.sleeve_service import SleeveService
+from unity.backup_snapshot import BACKUP_SNAPSHOT
+from unity.backup_store import BACKUP_STORE
+from unity.texture_formats import TEXTURE_FORMATS
 from unity.unity_utils import fetch_bundle_thumb
 from util.constants import IMAGE_FILTER, APP_CONFIG
-from util.ui_util import show_toast
+from util.ui_util import run_with_progress, show_toast
 
 
 class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
@@ -21,6 +24,7 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         self.model = SleeveListModel()
         self.sleevesView.setModel(self.model)
         self.selected = None
+        self.task = None
 
         # Enable drag and drop
         self.setAcceptDrops(True)
@@ -52,7 +56,10 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
                 break
 
     def _restore(self):
-        if self.service.restore_asset():
+        with BACKUP_SNAPSHOT.paused():
+            restored = self.service.restore_asset()
+
+        if restored:
             self.model.refresh()
             show_toast(
                 self, "Backup", "Sleeve restored successfully", ToastPreset.SUCCESS_DARK
@@ -62,14 +69,57 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
                 self, "Backup", "Sleeve backup not found", ToastPreset.WARNING_DARK
             )
 
+    def _fix_light_power(self):
+        bundles = self.service.get_bundles()
+        packer = APP_CONFIG.packer
+
+        # Nothing is recorded in the background while the sleeves are written
+        BACKUP_SNAPSHOT.pause()
+
+        def done(failures, error):
+            BACKUP_SNAPSHOT.resume()
+            self.task = None
+
+            if error or failures:
+                show_toast(
+                    self,
+                    "Lighting",
+                    (
+                        f"Failed to fix the lighting: {str(error)}"
+                        if error
+                        else f"{len(failures)} sleeves could not be patched"
+                    ),
+                    ToastPreset.WARNING_DARK,
+                )
+            else:
+                show_toast(
+                    self,
+                    "Lighting",
+                    f"Lighting fixed, {len(self.service.skipped)} sleeves were already fixed",
+                    ToastPreset.SUCCESS_DARK,
+                )
+
+        self.service.skipped = []
+        self.task = run_with_progress(
+            self,
+            "Lighting",
+            f"Fixing the lighting of {len(bundles)} sleeves...",
+            lambda progress: self.service.fix_light_power(
+                bundles, packer, progress=progress
+            ),
+            done,
+        )
+
     def _connect_callbacks(self):
         self.sleevesView.clicked.connect(self._on_sleeve_clicked)
         self.selectButton.clicked.connect(self._select_image)
         self.replaceButton.clicked.connect(self._replace_sleeve)
+        self.replaceSelectedButton.clicked.connect(self._replace_selected)
         self.copyButton.clicked.connect(self._copy)
         self.extractButton.clicked.connect(self._extract_texture)
         self.borderButton.clicked.connect(self._select_color)
         self.restoreButton.clicked.connect(self._restore)
+        self.lightButton.clicked.connect(self._fix_light_power)
         self.checkBox.clicked.connect(self._switch_border)
 
     def _on_sleeve_clicked(self, index):
@@ -82,6 +132,7 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         self.bundle.setText(f"Editing {self.selected.bundle}")
 
         self.replaceButton.setEnabled(True)
+        self.replaceSelectedButton.setEnabled(True)
         self.extractButton.setEnabled(True)
         self.restoreButton.setEnabled(True)
         self.copyButton.setEnabled(True)
@@ -115,11 +166,12 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
         )
 
     def _replace_sleeve(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            self.service.create_backup(self.service.bundle)
-            self.model.set_backup_state(self.selected.id, True)
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not self.selected.has_backup:
+                self.service.create_backup(self.service.bundle)
+                self.model.set_backup_state(self.selected.id, True)
 
-        self.service.replace_bundle()
+            self.service.replace_bundle()
         self.model.refresh()
         self.current.setPixmap(
             fetch_bundle_thumb(self.service.bundle, (256, 375)).pixmap(256, 375)
@@ -129,6 +181,71 @@ class Sleeve(QtWidgets.QWidget, Ui_Sleeve):
             self, "Sleeve", "Sleeve replacement successful", ToastPreset.SUCCESS_DARK
         )
 
+    def _replace_selected(self):
+        if not self.service.image_path:
+            show_toast(
+                self, "Sleeve", "Please select an image first", ToastPreset.WARNING_DARK
+            )
+            return
+
+        sleeves = [
+            self.model.assets[index.row()]
+            for index in self.sleevesView.selectedIndexes()
+        ]
+        create_backup = APP_CONFIG.create_backup
+        backups = {
+            sleeve.bundle
+            for sleeve in sleeves
+            if create_backup and not sleeve.has_backup
+        }
+        bundle_copies = BACKUP_STORE.bundle_copies
+        ids = {sleeve.bundle: sleeve.id for sleeve in sleeves}
+        pairs = [(sleeve.bundle, self.service.image_path) for sleeve in sleeves]
+
+        # The workers never query the database, so what they read is loaded here,
+        # and nothing is recorded in the background until they are done
+        BACKUP_STORE.load()
+        TEXTURE_FORMATS.load()
+        BACKUP_SNAPSHOT.pause()
+
+        def done(failures, error):
+            BACKUP_SNAPSHOT.resume()
+            for bundle in self.service.record_backups():
+                self.model.set_backup_state(ids[bundle], True)
+            self.model.refresh()
+            self.task = None
+
+            if error or failures:
+                show_toast(
+                    self,
+                    "Sleeve",
+                    (
+                        f"Failed to replace the sleeves: {str(error)}"
+                        if error
+                        else f"{len(failures)} sleeves could not be replaced"
+                    ),
+                    ToastPreset.WARNING_DARK,
+                )
+            else:
+                show_toast(
+                    self,
+                    "Sleeve",
+                    f"{len(pairs)} sleeves replaced, "
+                    f"{len(self.service.skipped)} already had the image",
+                    ToastPreset.SUCCESS_DARK,
+                )
+
+        self.service.skipped = []
+        self.task = run_with_progress(
+            self,
+            "Sleeve",
+            f"Replacing {len(pairs)} sleeves...",
+            lambda progress: self.service.replace_many(
+                pairs, progress=progress, backups=backups, bundle_copies=bundle_copies
+            ),
+            done,
+        )
+
     def _select_color(self):
         color = show_color_dialog()
 
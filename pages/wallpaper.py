@@ -1,5 +1,5 @@
 from PySide6 import QtWidgets
-from PySide6.QtCore import QSize
+from PySide6.QtCore import QSize, Qt
 from PySide6.QtGui import QPixmap, QImage, QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import QFileDialog
 from pyqttoast import ToastPreset
@@ -7,7 +7,8 @@ from pyqttoast import ToastPreset
 from pages.models.wallpaper_list_model import WallpaperListModel
 from pages.ui.wallpaper import Ui_Wallpaper
 from services.wallpaper_service import WallpaperService
-from unity.unity_utils import fetch_bundle_thumb
+from unity.backup_snapshot import BACKUP_SNAPSHOT
+from unity.unity_utils import fetch_bundle_thumb, fetch_texture_info
 from util.constants import IMAGE_FILTER, APP_CONFIG
 from util.ui_util import show_toast
 from widgets.image_viewer import ImageViewer
@@ -57,7 +58,10 @@ class Wallpaper(QtWidgets.QWidget, Ui_Wallpaper):
                 break
 
     def _restore(self):
-        if self.service.restore_asset():
+        with BACKUP_SNAPSHOT.paused():
+            restored = self.service.restore_asset()
+
+        if restored:
             self.model.refresh()
             show_toast(
                 self,
@@ -80,8 +84,17 @@ class Wallpaper(QtWidgets.QWidget, Ui_Wallpaper):
 
     def _on_wallpaper_clicked(self, index):
         self.selected = self.model.assets[index.row()]
-        self.image = fetch_bundle_thumb(self.selected.bundle_foreground, None)
-        size = self.image.availableSizes()[0]
+        info = fetch_texture_info(self.selected.bundle_foreground)
+        size = QSize(info.width, info.height) if info else QSize()
+        # Only decode the wallpaper at the size it is previewed at
+        self.image = fetch_bundle_thumb(
+            self.selected.bundle_foreground,
+            (
+                size.scaled(600, 900, Qt.KeepAspectRatio).boundedTo(size).toTuple()
+                if info
+                else None
+            ),
+        )
         self.preview.setPixmap(
             self.image.pixmap(self.image.actualSize(QSize(600, 900)))
         )
@@ -134,14 +147,15 @@ class Wallpaper(QtWidgets.QWidget, Ui_Wallpaper):
         )
 
     def _replace_wallpaper(self):
-        if APP_CONFIG.create_backup and not self.selected.has_backup:
-            wallpapers = self.service.bundle
-            self.service.bundle = self.selected.bundle_foreground
-            self.service.create_backup(self.service.bundle)
-            self.model.set_backup_state(self.selected.id, True)
-            self.service.bundle = wallpapers
-
-        self.service.replace_bundle()
+        with BACKUP_SNAPSHOT.paused():
+            if APP_CONFIG.create_backup and not self.selected.has_backup:
+                wallpapers = self.service.bundle
+                self.service.bundle = self.selected.bundle_foreground
+                self.service.create_backup(self.service.bundle)
+                self.model.set_backup_state(self.selected.id, True)
+                self.service.bundle = wallpapers
+
+            self.service.replace_bundle()
         self.model.refresh()
 
         show_toast(
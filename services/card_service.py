@@ -1,17 +1,23 @@
-from UnityPy.enums import TextureFormat
+from concurrent.futures import ThreadPoolExecutor
+
 from sqlalchemy import or_
 from typing_extensions import override
 
 from database.models import CardModel, CardMetadataModel
 from database.objects import session
 from services.unity_service import UnityService
-from unity.unity_utils import prepare_environment
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.bundle_journal import BundleJournal, write_bundle_file
+from unity.bundle_writer import save_bundle
+from unity.bundle_payload import bundle_holds_script
+from unity.encode_cache import encode_user_image
+from unity.native_size import native_bundle_size
+from unity.texture_pipeline import write_bundle_texture
 from UnityPy import load as unity_load
 
 from util.constants import APP_CONFIG, APP_SESSION
 from util.encoding.card_merge import merge_data
 from util.encoding.decrypt_card import decrypt_desc_indx_name
-from util.image_utils import convert_image
 from util.python_utils import replace_entry
 
 
@@ -27,29 +33,14 @@ class CardService(UnityService):
         if not self.bundle or not self.image_path:
             return
 
-        f_path = prepare_environment(self.unity_file, self.bundle)
-        env = unity_load(f_path)
-
-        for obj in env.objects:
-            if obj.type.name == "Texture2D":
-
-                data = obj.read()
-
-                img = convert_image(self.image_path)
-
-                data.m_Width, data.m_Height = img.size
-
-                data.set_image(
-                    img=img,
-                    target_format=TextureFormat.RGBA32,
-                    mipmap_count=APP_CONFIG.mipmap_count,
-                )
-
-                data.save()
-                break
+        encoded = encode_user_image(
+            self.subfolder,
+            self.image_path,
+            native_bundle_size(self.subfolder, self.bundle),
+        )
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        if not write_bundle_texture(self.bundle, encoded):
+            self.skipped.append(self.bundle)
 
     def get_names(self) -> list[str]:
         return [card.name for card in session.query(CardModel).all()]
@@ -69,7 +60,7 @@ class CardService(UnityService):
         )
 
         for entry in metadata:
-            f_path = prepare_environment(False, entry.bundle)
+            f_path = BUNDLE_CATALOG.resolve(entry.bundle)
             env = unity_load(f_path)
             for obj in env.objects:
                 if obj.type.name == "TextAsset":
@@ -81,8 +72,16 @@ class CardService(UnityService):
 
         decrypt_desc_indx_name()
 
-    def replace_card_data(self, file: CardMetadataModel, metadata):
-        f_path = prepare_environment(False, file.bundle)
+    def replace_card_data(
+        self, bundle: str, metadata, journal: BundleJournal | None = None
+    ):
+        f_path = BUNDLE_CATALOG.resolve(bundle)
+
+        # Editing one card's name leaves the description and index data as they were
+        if bundle_holds_script(f_path, metadata):
+            self.skipped.append(bundle)
+            return
+
         env = unity_load(f_path)
         for obj in env.objects:
             if obj.type.name == "TextAsset":
@@ -93,8 +92,43 @@ class CardService(UnityService):
 
                     break
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        write_bundle_file(f_path, save_bundle(env.file, APP_CONFIG.packer), journal)
+
+    def replace_card_files(self, name_data, desc_data, indx_data) -> None:
+        """
+        Writes the CARD_* bundles together, one missing card and the game can break.
+
+        The three bundles are packed in parallel and staged in a journal, then
+        renamed into place at once, so the game never sees only some of them
+        changed, even if the app is closed in the middle of the write.
+
+        :param name_data: The encrypted card names.
+        :param desc_data: The encrypted card descriptions.
+        :param indx_data: The encrypted index of the names and descriptions.
+        :return: None
+        """
+        bundles = {
+            file.name: file.bundle
+            for file in session.query(CardMetadataModel).filter(
+                CardMetadataModel.name.in_(
+                    ["card_name.bytes", "card_desc.bytes", "card_indx.bytes"]
+                )
+            )
+        }
+
+        with BundleJournal() as journal:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                futures = [
+                    pool.submit(self.replace_card_data, bundles[name], data, journal)
+                    for name, data in [
+                        ("card_name.bytes", name_data),
+                        ("card_desc.bytes", desc_data),
+                        ("card_indx.bytes", indx_data),
+                    ]
+                ]
+
+            for future in futures:
+                future.result()
 
     def replace_name(self, name) -> None:
         card = session.query(CardModel).where(CardModel.bundle == self.bundle).first()
@@ -118,21 +152,7 @@ class CardService(UnityService):
 
             session.commit()
 
-            name_data, desc_data, indx_data = merge_data()
-
-            self.replace_card_data(data_file, name_data)
-            self.replace_card_data(
-                session.query(CardMetadataModel)
-                .filter(CardMetadataModel.name == "card_desc.bytes")
-                .first(),
-                desc_data,
-            )
-            self.replace_card_data(
-                session.query(CardMetadataModel)
-                .filter(CardMetadataModel.name == "card_indx.bytes")
-                .first(),
-                indx_data,
-            )
+            self.replace_card_files(*merge_data())
 
     def replace_description(self, description) -> None:
         card = session.query(CardModel).where(CardModel.bundle == self.bundle).first()
@@ -155,18 +175,4 @@ class CardService(UnityService):
 
             session.commit()
 
-            name_data, desc_data, indx_data = merge_data()
-
-            self.replace_card_data(data_file, desc_data)
-            self.replace_card_data(
-                session.query(CardMetadataModel)
-                .filter(CardMetadataModel.name == "card_name.bytes")
-                .first(),
-                name_data,
-            )
-            self.replace_card_data(
-                session.query(CardMetadataModel)
-                .filter(CardMetadataModel.name == "card_indx.bytes")
-                .first(),
-                indx_data,
-            )
+            self.replace_card_files(*merge_data())
@@ -1,64 +1,134 @@
 from os import makedirs
 from os.path import join
+from typing import Any, Callable, Collection, Iterable
 
-from UnityPy.enums import TextureFormat
+from PIL import Image
 from typing_extensions import override
+from UnityPy.enums import TextureFormat
 
-from services.unity_service import UnityService
-from util.constants import APP_CONFIG, FILE
+from services.unity_service import ReplaceFailure, UnityService
+from unity.backup_store import BACKUP_STORE, PackedTexture
+from unity.native_size import fit_native_size, native_unity3d_size
+from unity.texture_formats import TEXTURE_FORMATS
+from unity.unity3d_cache import UNITY3D_CACHE
+from unity.unity3d_index import find_unity3d_object
+from unity.unity3d_transaction import Unity3DTransaction
+from unity.unity_utils import backup_unity3d_asset
 from util.image_utils import convert_image, slugify
 
-from UnityPy import load as unity_load
-
 
 class FaceService(UnityService):
 
     def __init__(self):
         super().__init__("faces")
+        # When set, replacements are queued here instead of being written right away
+        self.transaction: Unity3DTransaction | None = None
 
     @override
     def replace_bundle(self) -> None:
-        env = unity_load(
-            join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"])
+        if self.transaction:
+            self.transaction.replace(
+                self.bundle, *self._encoding(self.bundle, self.image_path)
+            )
+        else:
+            with Unity3DTransaction() as transaction:
+                transaction.replace(
+                    self.bundle, *self._encoding(self.bundle, self.image_path)
+                )
+            self.skipped.extend(transaction.skipped)
+
+    def _encoding(
+        self, asset: int | str, image_path: str
+    ) -> tuple[Image.Image, TextureFormat]:
+        img = fit_native_size(
+            self.subfolder, convert_image(image_path), native_unity3d_size(asset)
         )
+        return img, TEXTURE_FORMATS.output_format(self.subfolder, img)
 
-        for obj in env.objects:
-            if obj.type.name == "Texture2D":
-                data = obj.read()
-                if obj.path_id == self.bundle or self.bundle == data.m_Name:
-                    img = convert_image(self.image_path)
-                    data.m_Width, data.m_Height = img.size
+    @override
+    def replace_many(
+        self,
+        pairs: Iterable[tuple[Any, str]],
+        workers: int | None = None,
+        progress: Callable[[int, int, Any, Exception | None], None] | None = None,
+        backups: Collection[Any] = (),
+        bundle_copies: bool = False,
+    ) -> list[ReplaceFailure]:
+        # Faces all live in data.unity3d, so the batch is a single transaction
+        # instead of one thread per face writing the same file
+        pairs = list(pairs)
+        failures = []
+        current = self.bundle
+
+        with Unity3DTransaction() as transaction:
+            for index, (bundle, image_path) in enumerate(pairs, 1):
+                try:
+                    # The transaction only writes when it ends, so this is the original
+                    if bundle in backups:
+                        self.bundle = bundle
+                        self.pending_backups.append(
+                            (bundle, self.pack_backup(bundle_copies))
+                        )
+                    transaction.replace(bundle, *self._encoding(bundle, image_path))
+                    error = None
+                except Exception as e:
+                    failures.append(ReplaceFailure(bundle, image_path, e))
+                    error = e
+                if progress:
+                    progress(index, len(pairs), bundle, error)
 
-                    data.set_image(img=img, target_format=TextureFormat.RGBA32)
+        self.bundle = current
+        self.skipped.extend(transaction.skipped)
 
-                    data.save()
-                    break
+        return failures
+
+    @override
+    def pack_backup(
+        self, bundle_copies: bool, field=False, miss=False
+    ) -> PackedTexture | None:
+        # data.unity3d is shared by every face, so faces are always backed up as textures
+        with UNITY3D_CACHE.reader() as env:
+            obj = find_unity3d_object(env, self.bundle)
 
-        with open(
-            join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"]), "wb"
-        ) as f:
-            f.write(env.file.save())
+            return BACKUP_STORE.pack(obj.read()) if obj else None
+
+    @override
+    def create_backup(self, name: str, field=False, miss=False) -> None:
+        # Faces are restored through their path ID, so it is the backup's name
+        backup_unity3d_asset(self.bundle, self.subfolder, str(self.bundle))
+
+    @override
+    def restore_asset(self, backup_name=None) -> bool:
+        encoded = BACKUP_STORE.texture(self.subfolder, str(self.bundle))
+        if not encoded:
+            return super().restore_asset(backup_name)
+
+        if self.transaction:
+            self.transaction.restore(int(self.bundle), encoded)
+        else:
+            with Unity3DTransaction() as transaction:
+                transaction.restore(int(self.bundle), encoded)
+            self.skipped.extend(transaction.skipped)
+
+        return True
 
     @override
     def extract_texture(self, name: str, field=False, miss=False, backup=False) -> None:
 
-        for obj in unity_load(
-            join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"])
-        ).objects:
-            if obj.type.name == "Texture2D":
+        with UNITY3D_CACHE.reader() as env:
+            obj = find_unity3d_object(env, self.bundle)
+
+            if obj:
                 data = obj.read()
-                if obj.path_id == self.bundle or self.bundle == data.m_Name:
-                    makedirs(
-                        join("backups" if backup else "images", self.subfolder),
-                        exist_ok=True,
-                    )
-                    dest = join(
-                        "backups" if backup else "images",
-                        self.subfolder,
-                        slugify(name) + ".png",
-                    )
-
-                    img = data.image
-                    img.save(dest)
-
-                    break
+                makedirs(
+                    join("backups" if backup else "images", self.subfolder),
+                    exist_ok=True,
+                )
+                dest = join(
+                    "backups" if backup else "images",
+                    self.subfolder,
+                    slugify(name) + ".png",
+                )
+
+                img = data.image
+                img.save(dest)
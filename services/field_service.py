@@ -1,16 +1,26 @@
-from UnityPy.enums import TextureFormat
+from PIL import Image
 from typing_extensions import override
+from UnityPy.classes import Texture2D
 
 from database.models import FieldModel
 from database.objects import session
 from services.unity_service import UnityService
-from unity.unity_utils import prepare_environment
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.bundle_journal import write_bundle_file
+from unity.bundle_writer import save_bundle
+from unity.bundle_payload import EncodedTexture, encode_texture, texture_digest
+from unity.texture_formats import TEXTURE_FORMATS
+from unity.texture_pipeline import image_pyramid
+from unity.texture_region import patch_texture_region
 from UnityPy import load as unity_load
 
 from util.constants import APP_CONFIG
 from util.enums import FieldCoordinates
 from util.image_utils import convert_image, paste_scaled_image
 
+# Textures of a field bundle holding the field art, seen up close and from afar
+FIELD_TEXTURES: list[str] = ["01_BaseColor_near", "01_BaseColor_far"]
+
 
 class FieldService(UnityService):
 
@@ -23,57 +33,85 @@ class FieldService(UnityService):
         if not self.bundle or not self.image_path:
             return
 
-        f_path = prepare_environment(False, self.bundle)
+        f_path = BUNDLE_CATALOG.resolve(self.bundle)
         env = unity_load(f_path)
-        found = False
         field = (
             session.query(FieldModel).where(FieldModel.bundle == self.bundle).first()
         )
 
+        if not field.bottom:
+            if field.flipped:
+                coordinates = FieldCoordinates.FLIPPED.value
+            else:
+                coordinates = FieldCoordinates.TOP.value
+        else:
+            if field.flipped:
+                coordinates = FieldCoordinates.BOTTOM_FLIPPED.value
+            else:
+                coordinates = FieldCoordinates.BOTTOM.value
+
+        # The near and far textures hold the same layout at different sizes, the
+        # field coordinates being those of the 2048 pixels wide near texture
+        textures = []
         for obj in env.objects:
             if obj.type.name == "Texture2D":
-
                 data = obj.read()
 
-                if "01_BaseColor_near" in data.m_Name:
-                    found = True
-
-                if found:
-                    img = (
-                        convert_image(self.image_path).rotate(180)
-                        if field.flipped
-                        else convert_image(self.image_path)
+                if any(name in data.m_Name for name in FIELD_TEXTURES):
+                    scale = data.m_Width / 2048
+                    textures.append(
+                        (data, tuple(round(value * scale) for value in coordinates))
                     )
 
-                    if not field.bottom:
-                        if field.flipped:
-                            img_field = paste_scaled_image(
-                                data.image, img, FieldCoordinates.FLIPPED.value
-                            )
-                        else:
-                            img_field = paste_scaled_image(
-                                data.image, img, FieldCoordinates.TOP.value
-                            )
-                    else:
-                        if field.flipped:
-                            img_field = paste_scaled_image(
-                                data.image, img, FieldCoordinates.BOTTOM_FLIPPED.value
-                            )
-                        else:
-                            img_field = paste_scaled_image(
-                                data.image, img, FieldCoordinates.BOTTOM.value
-                            )
-
-                    data.m_Width, data.m_Height = img_field.size
-
-                    data.set_image(
-                        img=img_field,
-                        target_format=TextureFormat.RGBA32,
-                        mipmap_count=APP_CONFIG.mipmap_count,
-                    )
+        img = (
+            convert_image(self.image_path).rotate(180)
+            if field.flipped
+            else convert_image(self.image_path)
+        )
+        scaled = image_pyramid(
+            img, [(box[2] - box[0], box[3] - box[1]) for _, box in textures]
+        )
 
-                    data.save()
-                    break
+        changed = 0
+        for data, box in textures:
+            encoded = self._encode_field(
+                data, scaled[(box[2] - box[0], box[3] - box[1])], box
+            )
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+            # The save can still be skipped when every texture already holds its
+            # new data
+            if texture_digest(data) == encoded.digest:
+                continue
+
+            encoded.apply(data)
+            data.save()
+            changed += 1
+
+        if not changed:
+            self.skipped.append(self.bundle)
+            return
+
+        write_bundle_file(f_path, save_bundle(env.file, APP_CONFIG.packer))
+
+    def _encode_field(
+        self, data: Texture2D, img: Image.Image, box: tuple[int, int, int, int]
+    ) -> EncodedTexture:
+        # Textures already stored the way they would be encoded only have the
+        # field rectangle and its mip regions re-encoded
+        if data.m_TextureFormat in (
+            TEXTURE_FORMATS.get(self.subfolder)[0],
+            TEXTURE_FORMATS.output_format(self.subfolder, img),
+        ):
+            encoded = patch_texture_region(
+                data, img, box, data.m_TextureFormat, APP_CONFIG.mipmap_count
+            )
+            if encoded is not None:
+                return encoded
+
+        img_field = paste_scaled_image(data.image, img, box)
+
+        return encode_texture(
+            img_field,
+            TEXTURE_FORMATS.output_format(self.subfolder, img_field),
+            APP_CONFIG.mipmap_count,
+        )
@@ -1,17 +1,16 @@
 from os.path import join, isfile
 
-from UnityPy.enums import TextureFormat
+from PIL import Image
 from typing_extensions import override
 
 from database.models import IconModel
 from database.objects import session
 from services.unity_service import UnityService
-from unity.unity_utils import prepare_environment
-from util.constants import APP_CONFIG
+from unity.backup_store import BACKUP_STORE
+from unity.texture_formats import TEXTURE_FORMATS
+from unity.texture_pipeline import replace_resolutions
 from util.enums import IconSize
-from util.image_utils import resize_image
-
-from UnityPy import load as unity_load
+from util.image_utils import convert_image
 
 
 class IconService(UnityService):
@@ -25,38 +24,26 @@ class IconService(UnityService):
         if not self.bundle or not self.image_path:
             return
 
-        for bundle, size in zip(
-            [
-                self.bundle.bundle_small,
-                self.bundle.bundle_medium,
-                self.bundle.bundle_big,
-            ],
-            [size.value for size in IconSize],
-        ):
-
-            f_path = prepare_environment(False, bundle)
-            env = unity_load(f_path)
-
-            for obj in env.objects:
-                if obj.type.name == "Texture2D":
-
-                    data = obj.read()
-
-                    img = resize_image(self.image_path, (size, size))
-
-                    data.m_Width, data.m_Height = img.size
-
-                    data.set_image(
-                        img=img,
-                        target_format=TextureFormat.RGBA32,
-                        mipmap_count=APP_CONFIG.mipmap_count,
-                    )
-
-                    data.save()
-                    break
-
-            with open(f_path, "wb") as f:
-                f.write(env.file.save(packer=APP_CONFIG.packer))
+        # Decoded once, then every size is resized from the next larger one
+        self._replace_icon(convert_image(self.image_path))
+
+    def _replace_icon(self, img: Image.Image) -> None:
+        skipped = replace_resolutions(
+            img,
+            {
+                bundle: (size.value, size.value)
+                for bundle, size in zip(
+                    [
+                        self.bundle.bundle_small,
+                        self.bundle.bundle_medium,
+                        self.bundle.bundle_big,
+                    ],
+                    IconSize,
+                )
+            },
+            TEXTURE_FORMATS.output_format(self.subfolder, img),
+        )
+        self.skipped.extend(skipped)
 
     @override
     def copy_bundle(self) -> None:
@@ -70,12 +57,43 @@ class IconService(UnityService):
             self.create_bundle_copy()
         self.bundle = current
 
+    @override
+    def create_backup(self, name: str, field=False, miss=False) -> None:
+        if not BACKUP_STORE.bundle_copies:
+            super().create_backup(name, field, miss)
+            return
+
+        # Every size is copied, so none of them has to be resized from the big one
+        icon = (
+            session.query(IconModel).filter(IconModel.bundle_big == self.bundle).first()
+        )
+        for bundle in [icon.bundle_big, icon.bundle_medium, icon.bundle_small]:
+            self._backup_bundle_copy(bundle)
+
     @override
     def restore_asset(self, backup_name=None) -> bool:
         # If Konami ever puts two icons in the same bundle this whole thing breaks
         self.bundle = (
             session.query(IconModel).filter(IconModel.bundle_big == self.bundle).first()
         )
+        if not self.bundle:
+            return False
+
+        # Copies of the smaller sizes are restored with the big one
+        sizes = [
+            self.bundle.bundle_big,
+            self.bundle.bundle_medium,
+            self.bundle.bundle_small,
+        ]
+        if any([self._restore_bundle_copy(bundle) for bundle in sizes]):
+            return True
+
+        # The smaller sizes are not backed up, so they are resized from the big one
+        img = BACKUP_STORE.image(self.subfolder, self.bundle.bundle_big)
+        if img:
+            self._replace_icon(img)
+            return True
+
         backup_path = join("backups", self.subfolder, self.bundle.bundle_big + ".png")
         if isfile(backup_path):
             current_image = self.image_path
@@ -1,12 +1,65 @@
-from UnityPy.enums import TextureFormat
-from typing_extensions import override
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable
 
-from services.unity_service import UnityService
-from unity.unity_utils import prepare_environment
+from typing_extensions import override
+from UnityPy import Environment
+
+from database.models import SleeveModel
+from database.objects import session
+from services.unity_service import ReplaceFailure, UnityService
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.bundle_journal import write_bundle_file
+from unity.bundle_writer import save_bundle
+from unity.bundle_payload import bundle_holds_texture
+from unity.encode_cache import encode_user_image
+from unity.native_size import native_bundle_size
 from UnityPy import load as unity_load
 
 from util.constants import APP_CONFIG
-from util.image_utils import add_sleeve_border, convert_image
+from util.image_utils import add_sleeve_border
+
+
+def patch_light_power(env: Environment) -> bool:
+    """
+    Turns off the light power of the sleeve materials in a bundle.
+
+    Only the typetrees of Material objects are read, and _LightPower is looked up
+    by its key instead of its position in the material floats.
+
+    :param env: The loaded sleeve bundle.
+    :type env: Environment
+    :returns: Whether a material was changed.
+    :rtype: bool
+    """
+
+    changed = False
+
+    for obj in env.objects:
+        if obj.type.name != "Material":
+            continue
+
+        type_tree = obj.read_typetree()
+        floats = type_tree["m_SavedProperties"]["m_Floats"]
+
+        for index, (key, value) in enumerate(floats):
+            if key == "_LightPower" and value != 0.0:
+                floats[index] = ("_LightPower", 0.0)
+                obj.save_typetree(type_tree)
+                changed = True
+                break
+
+    return changed
+
+
+def _fix_bundle_light_power(path: str, packer: str) -> bool:
+    env = unity_load(path)
+
+    if not patch_light_power(env):
+        return False
+
+    write_bundle_file(path, save_bundle(env.file, packer))
+
+    return True
 
 
 class SleeveService(UnityService):
@@ -22,41 +75,90 @@ class SleeveService(UnityService):
         if not self.bundle or not self.image_path:
             return
 
-        f_path = prepare_environment(False, self.bundle)
-        env = unity_load(f_path)
-
-        for obj in env.objects:
-            if obj.type.name == "Texture2D":
-
-                data = obj.read()
+        encoded = encode_user_image(
+            self.subfolder,
+            self.image_path,
+            native_bundle_size(self.subfolder, self.bundle),
+            (
+                (lambda img: add_sleeve_border(img, self.border_color))
+                if self.border
+                else None
+            ),
+            (self.border_color,) if self.border else (),
+        )
+
+        f_path = BUNDLE_CATALOG.resolve(self.bundle)
+        holds_texture = bundle_holds_texture(f_path, encoded)
 
-                img = (
-                    add_sleeve_border(convert_image(self.image_path), self.border_color)
-                    if self.border
-                    else convert_image(self.image_path)
-                )
-
-                data.m_Width, data.m_Height = img.size
-
-                data.set_image(
-                    img=img,
-                    target_format=TextureFormat.RGBA32,
-                    mipmap_count=APP_CONFIG.mipmap_count,
-                )
-
-                data.save()
-                break
+        env = unity_load(f_path)
 
-            type_tree = obj.read_typetree()
-            if (
-                obj.type.name == "Material"
-                and "_LightPower" in type_tree["m_SavedProperties"]["m_Floats"][10][0]
-            ):
-                type_tree["m_SavedProperties"]["m_Floats"][10] = (
-                    "_LightPower",
-                    0.0,
-                )
-                obj.save_typetree(type_tree)
+        if not holds_texture:
+            for obj in env.objects:
+                if obj.type.name == "Texture2D":
+                    data = obj.read()
+                    encoded.apply(data)
+                    data.save()
+                    break
+
+        # A sleeve already holding the image may still need its lighting patched
+        if not patch_light_power(env) and holds_texture:
+            self.skipped.append(self.bundle)
+            return
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        write_bundle_file(f_path, save_bundle(env.file, APP_CONFIG.packer))
+
+    def get_bundles(self) -> list[str]:
+        return [sleeve.bundle for sleeve in session.query(SleeveModel).all()]
+
+    def fix_light_power(
+        self,
+        bundles: Iterable[str],
+        packer: str,
+        workers: int | None = None,
+        progress: Callable[[int, int, str, Exception | None], None] | None = None,
+    ) -> list[ReplaceFailure]:
+        """
+        Turns off the light power of the given sleeves, spread across a thread pool.
+
+        Only the materials are patched, the textures are left as they are. Bundles
+        whose materials were already patched are not written and are added to
+        :attr:`skipped`. Loading and compressing the bundles release the GIL, and
+        the database is never queried, so this can run off the main thread.
+
+        :param bundles: The sleeve bundles to patch, see :meth:`get_bundles`.
+        :type bundles: Iterable[str]
+        :param packer: The packer the bundles are saved with, APP_CONFIG.packer.
+        :type packer: str
+        :param workers: Number of threads, as ThreadPoolExecutor picks if None.
+        :type workers: int | None, optional
+        :param progress: Called after each bundle with the number of bundles done,
+            the total, the bundle and the error it raised, if any.
+        :type progress: Callable[[int, int, str, Exception | None], None] | None, optional
+        :return: The bundles that failed.
+        :rtype: list[ReplaceFailure]
+        """
+
+        bundles = list(bundles)
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    _fix_bundle_light_power, BUNDLE_CATALOG.resolve(bundle), packer
+                ): bundle
+                for bundle in bundles
+            }
+
+            for index, future in enumerate(as_completed(futures), 1):
+                bundle = futures[future]
+                try:
+                    if not future.result():
+                        self.skipped.append(bundle)
+                    error = None
+                except Exception as e:
+                    failures.append(ReplaceFailure(bundle, None, e))
+                    error = e
+                if progress:
+                    progress(index, len(bundles), bundle, error)
+
+        return failures
@@ -1,15 +1,29 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from copy import copy
 from os import makedirs
 from os.path import join, isfile
 from shutil import copyfile
+from typing import Any, Callable, Collection, Iterable, NamedTuple
 from typing_extensions import Optional
 
-from database.models import UnityAsset
+from unity.backup_store import BACKUP_STORE, PackedTexture
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.texture_pipeline import write_bundle_texture
 from unity.unity_utils import prepare_environment
 from util.constants import APP_CONFIG
 from util.image_utils import slugify
 
 from UnityPy import load as unity_load
+from UnityPy.classes import Texture2D
+
+
+class ReplaceFailure(NamedTuple):
+    """A replacement of a batch that failed, with the error it raised"""
+
+    bundle: Any
+    image_path: str | None
+    error: Exception
 
 
 class UnityService(ABC):
@@ -21,16 +35,162 @@ class UnityService(ABC):
         self.bundle = None
         self.subfolder: str = subfolder
         self.image_path: str | None = None
+        # Bundles whose write was skipped because they already held the new data
+        self.skipped: list[str] = []
+        # Backups taken by replace_many, recorded from the main thread by record_backups
+        self.pending_backups: list[tuple[Any, PackedTexture | None]] = []
 
     @abstractmethod
     def replace_bundle(self) -> None:
         pass
 
+    def _replace_pair(
+        self, bundle: Any, image_path: str, backup: bool, bundle_copies: bool
+    ) -> tuple[list[str], PackedTexture | None]:
+        # Runs on a worker thread with its own copy of the service
+        self.bundle = bundle
+        self.image_path = image_path
+        self.skipped = []
+
+        packed = self.pack_backup(bundle_copies) if backup else None
+        self.replace_bundle()
+
+        return self.skipped, packed
+
+    def replace_many(
+        self,
+        pairs: Iterable[tuple[Any, str]],
+        workers: int | None = None,
+        progress: Callable[[int, int, Any, Exception | None], None] | None = None,
+        backups: Collection[Any] = (),
+        bundle_copies: bool = False,
+    ) -> list[ReplaceFailure]:
+        """
+        Replaces the textures of several bundles, spread across a thread pool.
+
+        Each pair is replaced as if it was set to :attr:`bundle` and :attr:`image_path`
+        before calling :meth:`replace_bundle`, using a copy of this service so other
+        settings like sleeve borders apply to the whole batch. A failed pair does not
+        abort the others, and bundles left unchanged are added to :attr:`skipped`.
+
+        Threads share the encode cache, so the same image applied to many bundles
+        is encoded by the first thread while the others wait for its result, and
+        loading, encoding and compressing release the GIL.
+        The bundles in backups are backed up right before they are replaced, and
+        their backups are kept in :attr:`pending_backups` until :meth:`record_backups`
+        records them, as this can run off the main thread.
+
+        :param pairs: The (bundle, image path) pairs to replace.
+        :type pairs: Iterable[tuple[Any, str]]
+        :param workers: Number of threads, as ThreadPoolExecutor picks if None.
+        :type workers: int | None, optional
+        :param progress: Called after each pair with the number of pairs done, the
+            total, the bundle and the error it raised, if any.
+        :type progress: Callable[[int, int, Any, Exception | None], None] | None, optional
+        :param backups: The bundles to back up before they are replaced.
+        :type backups: Collection[Any], optional
+        :param bundle_copies: Whether backups are copies of the bundle files, see
+            BACKUP_STORE.bundle_copies, which has to be read on the main thread.
+        :type bundle_copies: bool, optional
+        :return: The pairs that failed.
+        :rtype: list[ReplaceFailure]
+        """
+        pairs = list(pairs)
+        failures = []
+
+        template = copy(self)
+        template.bundle = template.image_path = None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    copy(template)._replace_pair,
+                    bundle,
+                    image_path,
+                    bundle in backups,
+                    bundle_copies,
+                ): (bundle, image_path)
+                for bundle, image_path in pairs
+            }
+
+            for index, future in enumerate(as_completed(futures), 1):
+                bundle, image_path = futures[future]
+                try:
+                    skipped, packed = future.result()
+                    self.skipped.extend(skipped)
+                    if bundle in backups:
+                        self.pending_backups.append((bundle, packed))
+                    error = None
+                except Exception as e:
+                    failures.append(ReplaceFailure(bundle, image_path, e))
+                    error = e
+                if progress:
+                    progress(index, len(pairs), bundle, error)
+
+        return failures
+
+    def record_backups(self) -> list[Any]:
+        """
+        Records the backups taken by :meth:`replace_many`, named after their bundle.
+
+        Has to be called from the main thread, like every other database write.
+
+        :return: The bundles that were backed up.
+        :rtype: list[Any]
+        """
+        backups, self.pending_backups = self.pending_backups, []
+
+        BACKUP_STORE.record(
+            (self.subfolder, slugify(bundle), packed)
+            for bundle, packed in backups
+            if packed
+        )
+
+        return [bundle for bundle, _ in backups]
+
     def extract_texture(self, name: str, field=False, miss=False) -> None:
         self.extract_asset_texture(name, "images", field, miss)
 
     def create_backup(self, name: str, field=False, miss=False) -> None:
-        self.extract_asset_texture(name, "backups", field, miss)
+        """
+        Backs up the original texture of the bundle into the backup store, or the
+        whole bundle file when the store is set to keep bundle copies.
+
+        :param name: The name the backup is stored under.
+        :param field: If the bundle is a field or not.
+        :param miss: Forces the StreamingAssets bundle, otherwise the bundle is resolved
+            through the bundle catalog.
+        :return: None
+        """
+        packed = self.pack_backup(BACKUP_STORE.bundle_copies, field, miss)
+
+        if packed:
+            BACKUP_STORE.record([(self.subfolder, slugify(name), packed)])
+
+    def pack_backup(
+        self, bundle_copies: bool, field=False, miss=False
+    ) -> PackedTexture | None:
+        """
+        Writes the backup of the bundle's original texture without recording it.
+
+        Only files are written, so it is safe from worker threads. Bundle copies
+        need no recording, texture backups are recorded with BACKUP_STORE.record.
+
+        :param bundle_copies: Whether to copy the whole bundle file instead.
+        :param field: If the bundle is a field or not.
+        :param miss: Forces the StreamingAssets bundle.
+        :return: The packed texture to record, None for bundle copies or bundles
+            without a texture.
+        """
+        if bundle_copies:
+            BACKUP_STORE.put_bundle(
+                self.subfolder, self.bundle, self._bundle_path(miss)
+            )
+            return None
+
+        data = self._find_texture(field, miss)
+
+        return BACKUP_STORE.pack(data) if data else None
 
     def extract_asset_texture(
         self, name: str, folder: str, field=False, miss=False
@@ -40,32 +200,51 @@ class UnityService(ABC):
 
         :param field: If the bundle is a field or not.
         :param name: The name of the texture to extract.
-        :param miss: A boolean value indicating if the extraction failed to find the bundle.
+        :param miss: Forces the StreamingAssets bundle, otherwise the bundle is resolved
+            through the bundle catalog.
         :return: None
         """
-        found = False
+        data = self._find_texture(field, miss)
+
+        if data:
+            makedirs(join(folder, self.subfolder), exist_ok=True)
+            dest = join(folder, self.subfolder, slugify(name) + ".png")
 
-        for obj in unity_load(prepare_environment(miss, self.bundle)).objects:
+            img = data.image
+            img.save(dest)
+
+    def _bundle_path(self, miss=False) -> str:
+        return (
+            prepare_environment(True, self.bundle)
+            if miss
+            else BUNDLE_CATALOG.resolve(self.bundle)
+        )
+
+    def _find_texture(self, field=False, miss=False) -> Texture2D | None:
+        for obj in unity_load(self._bundle_path(miss)).objects:
             if obj.type.name == "Texture2D":
                 data = obj.read()
 
-                if field:
-                    if "01_BaseColor_near" in data.m_Name:
-                        found = True
-                else:
-                    found = True
+                if not field or "01_BaseColor_near" in data.m_Name:
+                    return data
 
-                if found:
-                    makedirs(join(folder, self.subfolder), exist_ok=True)
-                    dest = join(folder, self.subfolder, slugify(name) + ".png")
-
-                    img = data.image
-                    img.save(dest)
-                    break
-        else:
-            return self.extract_texture(name, field, True)
+        return None
 
     def restore_asset(self, backup_name=None) -> bool:
+        # Bundle copies are copied back as they are, backups in the backup store are
+        # written back as the original texture data, and PNG backups from older
+        # versions are replaced like any other image
+        if self._restore_bundle_copy(self.bundle):
+            return True
+
+        encoded = BACKUP_STORE.texture(
+            self.subfolder, slugify(backup_name or self.bundle)
+        )
+        if encoded:
+            if not write_bundle_texture(self.bundle, encoded):
+                self.skipped.append(self.bundle)
+            return True
+
         backup_path = join(
             "backups", self.subfolder, f"{backup_name or self.bundle}.png"
         )
@@ -77,6 +256,20 @@ class UnityService(ABC):
             return True
         return False
 
+    def _backup_bundle_copy(self, bundle: str) -> None:
+        BACKUP_STORE.put_bundle(self.subfolder, bundle, BUNDLE_CATALOG.resolve(bundle))
+
+    def _restore_bundle_copy(self, bundle: str) -> bool:
+        # Returns False when the bundle has no copy to restore
+        if not BACKUP_STORE.has_bundle(self.subfolder, bundle):
+            return False
+
+        if not BACKUP_STORE.restore_bundle(
+            self.subfolder, bundle, BUNDLE_CATALOG.resolve(bundle)
+        ):
+            self.skipped.append(bundle)
+        return True
+
     def copy_bundle(self) -> None:
         self.create_bundle_copy("bundles")
 
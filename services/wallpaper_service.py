@@ -1,16 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from os.path import join, isfile
 
 from PIL import Image
-from UnityPy.enums import TextureFormat
 from typing_extensions import override
+from UnityPy.enums import TextureFormat
 
-from database.models import IconModel
+from database.models import IconModel, WallpaperModel
 from database.objects import session
 from services.unity_service import UnityService
-from unity.unity_utils import prepare_environment
-from util.constants import APP_CONFIG
+from unity.backup_store import BACKUP_STORE
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.bundle_journal import BundleJournal
+from unity.bundle_payload import EncodedTexture, encode_texture
+from unity.texture_formats import TEXTURE_FORMATS
+from unity.texture_pipeline import write_bundle_texture
+
+
+@lru_cache(maxsize=None)
+def blank_texture(
+    size: tuple[int, int], target_format: TextureFormat
+) -> EncodedTexture:
+    """returns a transparent texture of the given size, encoded once per size and format"""
 
-from UnityPy import load as unity_load
+    return encode_texture(Image.new("RGBA", size), target_format)
 
 
 class WallpaperService(UnityService):
@@ -24,59 +37,59 @@ class WallpaperService(UnityService):
         if not self.bundle or not self.image_path:
             return
 
-        self.remove_image(self.bundle.bundle_background)
-
-        f_path = prepare_environment(False, self.bundle.bundle_foreground)
-        env = unity_load(f_path)
-
-        for obj in env.objects:
-            if obj.type.name == "Texture2D":
-
-                data = obj.read()
-
-                img = Image.open(self.image_path)
-
-                wallpaper = data.image
-                img.thumbnail(
-                    (wallpaper.width, wallpaper.height),
-                    Image.Resampling.LANCZOS,
-                )
-                new_img = Image.new("RGBA", wallpaper.size)
-                new_img.paste(img)
-
-                img = new_img
-
-                data.m_Width, data.m_Height = img.size
-
-                data.set_image(
-                    img=img, target_format=TextureFormat.RGBA32, mipmap_count=10
-                )
-
-                data.save()
-                break
-
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
-
-    def remove_image(self, bundle):
-        f_path = prepare_environment(False, bundle)
-        env = unity_load(f_path)
-
-        for obj in env.objects:
-            if obj.type.name == "Texture2D":
-                data = obj.read()
+        # Both bundles are written concurrently, the foreground and background
+        # saves don't depend on each other, then renamed into place together
+        with BundleJournal() as journal:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = [
+                    pool.submit(
+                        self.remove_image, self.bundle.bundle_background, journal
+                    ),
+                    pool.submit(
+                        self._replace_foreground,
+                        self.bundle.bundle_foreground,
+                        journal,
+                    ),
+                ]
+
+            for future in futures:
+                future.result()
+
+    def _replace_foreground(
+        self, bundle: str, journal: BundleJournal | None = None
+    ) -> None:
+        # The wallpaper size comes from the cataloged texture header, so the new
+        # texture is encoded and compared before the bundle is loaded
+        wallpaper = BUNDLE_CATALOG.textures(bundle)[0]
+        img = Image.open(self.image_path)
+        img.thumbnail(
+            (wallpaper.width, wallpaper.height),
+            Image.Resampling.LANCZOS,
+        )
+        new_img = Image.new("RGBA", (wallpaper.width, wallpaper.height))
+        new_img.paste(img)
 
-                new_img = Image.new("RGBA", (data.m_Width, data.m_Height))
+        encoded = encode_texture(
+            new_img, TEXTURE_FORMATS.output_format(self.subfolder, new_img), 10
+        )
 
-                data.set_image(
-                    img=new_img, target_format=TextureFormat.RGBA32, mipmap_count=1
-                )
+        if not write_bundle_texture(bundle, encoded, journal):
+            self.skipped.append(bundle)
 
-                data.save()
-                break
+    def remove_image(self, bundle, journal: BundleJournal | None = None):
+        texture = BUNDLE_CATALOG.textures(bundle)[0]
+        blank = Image.new("RGBA", (texture.width, texture.height))
 
-        with open(f_path, "wb") as f:
-            f.write(env.file.save(packer=APP_CONFIG.packer))
+        # Backgrounds stay blank once removed, so only the first removal writes
+        if not write_bundle_texture(
+            bundle,
+            blank_texture(
+                (texture.width, texture.height),
+                TEXTURE_FORMATS.output_format(self.subfolder, blank),
+            ),
+            journal,
+        ):
+            self.skipped.append(bundle)
 
     @override
     def copy_bundle(self) -> None:
@@ -86,8 +99,49 @@ class WallpaperService(UnityService):
             self.create_bundle_copy()
         self.bundle = current
 
+    @override
+    def create_backup(self, name: str, field=False, miss=False) -> None:
+        if not BACKUP_STORE.bundle_copies:
+            super().create_backup(name, field, miss)
+            return
+
+        # The background is copied too, so it is restored as it was instead of blank
+        wallpaper = (
+            session.query(WallpaperModel)
+            .filter(WallpaperModel.bundle_foreground == self.bundle)
+            .first()
+        )
+        for bundle in [wallpaper.bundle_foreground, wallpaper.bundle_background]:
+            self._backup_bundle_copy(bundle)
+
     @override
     def restore_asset(self, backup_name=None) -> bool:
+        # Backups are named after the foreground bundle, restoring all backups only
+        # knows that name, and background copies are restored with their foreground
+        if isinstance(self.bundle, str):
+            self.bundle = (
+                session.query(WallpaperModel)
+                .filter(WallpaperModel.bundle_foreground == self.bundle)
+                .first()
+            )
+        if not self.bundle:
+            return False
+
+        if self._restore_bundle_copy(self.bundle.bundle_foreground):
+            if not self._restore_bundle_copy(self.bundle.bundle_background):
+                self.remove_image(self.bundle.bundle_background)
+            return True
+
+        encoded = BACKUP_STORE.texture(self.subfolder, self.bundle.bundle_foreground)
+        if encoded:
+            with BundleJournal() as journal:
+                self.remove_image(self.bundle.bundle_background, journal)
+                if not write_bundle_texture(
+                    self.bundle.bundle_foreground, encoded, journal
+                ):
+                    self.skipped.append(self.bundle.bundle_foreground)
+            return True
+
         self.image_path = join(
             "backups", self.subfolder, self.bundle.bundle_foreground + ".png"
         )
@@ -0,0 +1,302 @@
+"""
+Background snapshot of the original assets.
+This module backs up the original textures, or bundle files, of the cataloged
+assets ahead of time on a pool of worker threads, so the first replacement of
+an asset finds its backup already taken instead of creating it first. The job
+pauses while the user replaces or restores assets, and the finished backups
+are recorded in the database in bulk from the main thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from threading import Condition
+from typing import Iterator, NamedTuple
+
+from UnityPy import load as unity_load
+
+from database.models import (
+    CardModel,
+    IconModel,
+    SleeveModel,
+    SnapshotConfigModel,
+    UnityAsset,
+    WallpaperModel,
+)
+from database.objects import session
+from unity.backup_store import BACKUP_STORE, PackedTexture
+from unity.bundle_catalog import BUNDLE_CATALOG
+from util.constants import APP_CONFIG
+from util.image_utils import slugify
+
+# Assets backed up ahead of time, with the bundle columns their services back up,
+# the first one holding the texture and the others only copied with it
+SNAPSHOT_ASSETS: dict[str, tuple[type[UnityAsset], tuple[str, ...]]] = {
+    "cards": (CardModel, ("bundle",)),
+    "sleeves": (SleeveModel, ("bundle",)),
+    "icons": (IconModel, ("bundle_big", "bundle_medium", "bundle_small")),
+    "wallpapers": (WallpaperModel, ("bundle_foreground", "bundle_background")),
+}
+
+# Which assets can be backed up ahead of time
+SNAPSHOT_MODES: list[str] = ["off", "favorites", "all"]
+
+# Default number of worker threads, kept low so the interface stays responsive
+SNAPSHOT_WORKERS: int = 2
+
+# Milliseconds between two recordings of the finished backups
+SNAPSHOT_FLUSH_INTERVAL: int = 2000
+
+
+class _Target(NamedTuple):
+    subfolder: str
+    asset_id: int
+    bundles: tuple[str, ...]
+
+
+def _snapshot(target: _Target, bundle_copies: bool) -> PackedTexture | None:
+    # Assets the user backed up since the job started are left as they are
+    name = slugify(target.bundles[0])
+    if BACKUP_STORE.has(target.subfolder, name) or BACKUP_STORE.has_bundle(
+        target.subfolder, target.bundles[0]
+    ):
+        return None
+
+    if bundle_copies:
+        for bundle in target.bundles:
+            BACKUP_STORE.put_bundle(
+                target.subfolder, bundle, BUNDLE_CATALOG.resolve(bundle)
+            )
+        return None
+
+    for obj in unity_load(BUNDLE_CATALOG.resolve(target.bundles[0])).objects:
+        if obj.type.name == "Texture2D":
+            return BACKUP_STORE.pack(obj.read())
+
+    return None
+
+
+class BackupSnapshot:
+    """
+    Backs up the assets without a backup on worker threads, while the user is idle.
+
+    Workers only write backup files. Their results are kept until :meth:`flush`
+    records them in the backup store and sets ``has_backup`` of their assets,
+    which has to be called from the main thread like every other database write.
+
+    Attributes:
+        workers: The number of worker threads
+        queued: The number of assets queued by the last start
+        done: The number of assets backed up since the last start
+        failed: The number of assets that couldn't be read since the last start
+    """
+
+    def __init__(self, workers: int = SNAPSHOT_WORKERS) -> None:
+        self.workers = workers
+        self.queued = 0
+        self.done = 0
+        self.failed = 0
+        self._pool: ThreadPoolExecutor | None = None
+        self._condition = Condition()
+        self._paused = 0
+        self._active = 0
+        self._stopped = False
+        self._results: list[tuple[_Target, PackedTexture | None]] = []
+
+    @property
+    def mode(self) -> str:
+        """which assets are backed up ahead of time, one of SNAPSHOT_MODES"""
+
+        config = session.query(SnapshotConfigModel).first()
+
+        return (config.mode if config else None) or "off"
+
+    def set_mode(self, mode: str) -> None:
+        """Sets which assets are backed up ahead of time and restarts the job"""
+
+        config = session.query(SnapshotConfigModel).first() or SnapshotConfigModel()
+        config.mode = mode
+        session.add(config)
+        session.commit()
+
+        self.stop()
+        self.flush()
+        self.start()
+
+    @property
+    def running(self) -> bool:
+        """whether backups are still queued or being taken"""
+
+        return self._pool is not None and self.done + self.failed < self.queued
+
+    @property
+    def is_paused(self) -> bool:
+        """whether a user operation is in progress, so nothing should be recorded"""
+
+        return self._paused > 0
+
+    def _targets(self, favorites_only: bool) -> list[_Target]:
+        targets = []
+
+        for subfolder, (model, columns) in SNAPSHOT_ASSETS.items():
+            query = session.query(
+                model.id, *(getattr(model, column) for column in columns)
+            ).filter(model.has_backup.is_(False))
+            if favorites_only:
+                query = query.filter(model.favorite.is_(True))
+
+            targets.extend(
+                _Target(subfolder, asset_id, tuple(bundles))
+                for asset_id, *bundles in query.all()
+                if all(bundles)
+            )
+
+        return targets
+
+    def start(self) -> int:
+        """
+        Queues every asset without a backup, if backups and the snapshot are enabled.
+
+        :returns: The number of assets queued.
+        :rtype: int
+        """
+
+        mode = self.mode
+        if self.running or not APP_CONFIG.create_backup or mode == "off":
+            return 0
+        self.stop()
+
+        targets = self._targets(mode == "favorites")
+        bundle_copies = BACKUP_STORE.bundle_copies
+        BACKUP_STORE.load()
+
+        self._stopped = False
+        self.queued = len(targets)
+        self.done = self.failed = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        for target in targets:
+            self._pool.submit(self._run, target, bundle_copies)
+
+        return self.queued
+
+    def _run(self, target: _Target, bundle_copies: bool) -> None:
+        with self._condition:
+            while self._paused and not self._stopped:
+                self._condition.wait()
+            if self._stopped:
+                return
+            self._active += 1
+
+        try:
+            result = _snapshot(target, bundle_copies)
+            error = False
+        except Exception:
+            result = None
+            error = True
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+        with self._condition:
+            if error:
+                self.failed += 1
+            else:
+                self.done += 1
+                self._results.append((target, result))
+
+    def pause(self) -> None:
+        """Stops starting backups and waits for the ones being taken to finish"""
+
+        with self._condition:
+            self._paused += 1
+            while self._active:
+                self._condition.wait()
+
+    def resume(self) -> None:
+        """Starts taking backups again once every pause has ended"""
+
+        with self._condition:
+            self._paused = max(0, self._paused - 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Pauses the job for the duration of a user operation.
+
+        No backup is being taken inside the block, so the operation never
+        modifies a bundle while a worker reads it.
+        """
+
+        self.pause()
+        try:
+            yield
+        finally:
+            self.resume()
+
+    def stop(self) -> None:
+        """Drops the queued assets and waits for the backups being taken"""
+
+        if not self._pool:
+            return
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    def discard(self) -> None:
+        """Drops the backups taken but not recorded yet, such as after clearing backups"""
+
+        with self._condition:
+            self._results = []
+
+    def flush(self) -> int:
+        """
+        Records the finished backups and sets has_backup of their assets in bulk.
+
+        :returns: The number of assets recorded.
+        :rtype: int
+        """
+
+        with self._condition:
+            results, self._results = self._results, []
+        if not results:
+            return 0
+
+        bundle_copies = BACKUP_STORE.bundle_copies
+        BACKUP_STORE.record(
+            (target.subfolder, slugify(target.bundles[0]), packed)
+            for target, packed in results
+            if packed
+        )
+
+        # Assets skipped because the user backed them up already have has_backup set
+        recorded = [
+            target
+            for target, packed in results
+            if packed
+            or (
+                bundle_copies
+                and BACKUP_STORE.has_bundle(target.subfolder, target.bundles[0])
+            )
+        ]
+        for subfolder, targets in groupby(
+            sorted(recorded, key=lambda target: target.subfolder),
+            key=lambda target: target.subfolder,
+        ):
+            model = SNAPSHOT_ASSETS[subfolder][0]
+            ids = [target.asset_id for target in targets]
+            for start in range(0, len(ids), 500):
+                session.query(model).filter(
+                    model.id.in_(ids[start : start + 500])
+                ).update({"has_backup": True})
+        session.commit()
+
+        return len(recorded)
+
+
+# Global backup snapshot instance
+BACKUP_SNAPSHOT: BackupSnapshot = BackupSnapshot()
@@ -0,0 +1,461 @@
+"""
+Content-addressed store for texture backups.
+This module keeps the original texture data of the replaced assets as
+compressed blobs named after the hash of their content, so backing up a
+texture copies its bytes instead of decoding it and encoding a PNG, identical
+originals are stored once, and restoring writes back the exact original data.
+Bundles can instead be backed up as copies of their original file, restored by
+copying the file back without loading it.
+"""
+
+import lzma
+from filecmp import cmp
+from os import listdir, makedirs, remove, replace
+from os.path import getsize, isdir, isfile, join
+from shutil import copyfile, rmtree
+from threading import Lock, get_ident
+from typing import Iterable, NamedTuple
+
+import lz4.frame
+from PIL import Image
+from UnityPy.classes import Texture2D
+from UnityPy.enums import TextureFormat
+from UnityPy.export import Texture2DConverter
+
+from database.models import BackupBlobModel, BackupConfigModel, BackupEntryModel
+from database.objects import session
+from unity.bundle_payload import EncodedTexture, texture_digest
+
+# Default directories and codec of the backup store
+BACKUP_STORE_DIR: str = join("backups", "store")
+BACKUP_BUNDLES_DIR: str = join("backups", "bundles")
+BACKUP_COMPRESSION: str = "lz4"
+
+# Codecs blobs can be compressed with, lz4 favours speed and lzma size
+_CODECS = {
+    "lz4": (lz4.frame.compress, lz4.frame.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+
+class BackupReport(NamedTuple):
+    """Disk use of the backup store"""
+
+    entries: int
+    blobs: int
+    size: int
+    stored_size: int
+    bundles: int = 0
+    bundle_size: int = 0
+
+
+class PackedTexture(NamedTuple):
+    """The digest, sizes and texture header of a blob"""
+
+    digest: str
+    compression: str
+    size: int
+    stored_size: int
+    width: int
+    height: int
+    format: str
+    mip_count: int
+    version: str
+    platform: int
+
+
+def _packed(row: BackupBlobModel) -> PackedTexture:
+    return PackedTexture(*(getattr(row, field) for field in PackedTexture._fields))
+
+
+class BackupStore:
+    """
+    Texture backups stored once per content, indexed by the backup tables.
+
+    The index is read from the database once and kept in memory, so backups can
+    be looked up from the services' worker threads. Backups are created from the
+    main thread, like every other database write.
+
+    Bundle copies are files named after their bundle in one folder per asset
+    type, so they need no index.
+
+    Attributes:
+        directory: The directory where the blobs are stored
+        bundle_directory: The directory where the bundle copies are stored
+        compression: The codec new blobs are compressed with, lz4 or lzma
+    """
+
+    def __init__(
+        self,
+        directory: str = BACKUP_STORE_DIR,
+        compression: str = BACKUP_COMPRESSION,
+        bundle_directory: str = BACKUP_BUNDLES_DIR,
+    ) -> None:
+        self.directory = directory
+        self.bundle_directory = bundle_directory
+        self.compression = compression
+        self._bundle_copies: bool | None = None
+        self._entries: dict[tuple[str, str], str] | None = None
+        self._blobs: dict[str, PackedTexture] | None = None
+        self._lock = Lock()
+
+    def _index(self) -> tuple[dict[tuple[str, str], str], dict[str, PackedTexture]]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = {
+                    (row.subfolder, row.asset): row.digest
+                    for row in session.query(BackupEntryModel).all()
+                }
+                self._blobs = {
+                    row.digest: _packed(row)
+                    for row in session.query(BackupBlobModel).all()
+                }
+
+            return self._entries, self._blobs
+
+    def load(self) -> None:
+        """Reads the index from the database, so that worker threads never query the session"""
+
+        self._index()
+
+    def _path(self, digest: str) -> str:
+        return join(self.directory, digest[:2], digest)
+
+    def pack(self, texture: Texture2D) -> PackedTexture:
+        """
+        Writes the data of a texture to its blob, unless the store already holds it.
+
+        Only files are written, so textures can be packed from worker threads and
+        recorded in the index from the main thread with :meth:`record`.
+
+        :param texture: The original texture.
+        :type texture: Texture2D
+        :returns: The digest and header of the blob holding the texture.
+        :rtype: PackedTexture
+        """
+
+        blobs = self._index()[1]
+        digest = texture_digest(texture)
+
+        with self._lock:
+            packed = blobs.get(digest)
+        if packed:
+            return packed
+
+        data = bytes(texture.image_data)
+        stored = _CODECS[self.compression][0](data)
+        path = self._path(digest)
+
+        # Named after the thread, as workers may pack the same texture at once
+        makedirs(join(self.directory, digest[:2]), exist_ok=True)
+        with open(f"{path}.{get_ident()}.tmp", "wb") as f:
+            f.write(stored)
+        replace(f"{path}.{get_ident()}.tmp", path)
+
+        return PackedTexture(
+            digest,
+            self.compression,
+            len(data),
+            len(stored),
+            texture.m_Width,
+            texture.m_Height,
+            TextureFormat(texture.m_TextureFormat).name,
+            getattr(texture, "m_MipCount", 2 if getattr(texture, "m_MipMap", 0) else 1),
+            ".".join(str(part) for part in texture.version),
+            int(texture.platform),
+        )
+
+    def record(self, backups: Iterable[tuple[str, str, PackedTexture]]) -> None:
+        """
+        Adds packed textures to the index, replacing the assets' previous backups.
+
+        :param backups: The (subfolder, asset, packed texture) of each backup.
+        :type backups: Iterable[tuple[str, str, PackedTexture]]
+        """
+
+        entries, blobs = self._index()
+        backups = list(backups)
+
+        for packed in {packed.digest: packed for _, _, packed in backups}.values():
+            if packed.digest not in blobs:
+                session.add(BackupBlobModel(**packed._asdict()))
+
+        for subfolder, asset, packed in backups:
+            entry = (
+                (
+                    session.query(BackupEntryModel)
+                    .filter(
+                        BackupEntryModel.subfolder == subfolder,
+                        BackupEntryModel.asset == asset,
+                    )
+                    .first()
+                )
+                if (subfolder, asset) in entries
+                else None
+            ) or BackupEntryModel(subfolder=subfolder, asset=asset)
+            entry.digest = packed.digest
+            session.add(entry)
+        session.commit()
+
+        with self._lock:
+            for subfolder, asset, packed in backups:
+                blobs[packed.digest] = packed
+                entries[(subfolder, asset)] = packed.digest
+
+    def put(self, subfolder: str, asset: str, texture: Texture2D) -> str:
+        """
+        Backs up the data of a texture, replacing the asset's previous backup.
+
+        The texture data is only compressed and written if no other backup
+        already holds the same data.
+
+        :param subfolder: The asset type, the service subfolder.
+        :type subfolder: str
+        :param asset: The bundle or texture the backup is taken from.
+        :type asset: str
+        :param texture: The original texture.
+        :type texture: Texture2D
+        :returns: The digest of the blob holding the texture.
+        :rtype: str
+        """
+
+        packed = self.pack(texture)
+        self.record([(subfolder, asset, packed)])
+
+        return packed.digest
+
+    def has(self, subfolder: str, asset: str) -> bool:
+        """returns whether an asset was backed up"""
+
+        return (subfolder, asset) in self._index()[0]
+
+    def assets(self, subfolder: str) -> list[str]:
+        """returns the backed up assets of an asset type"""
+
+        return [asset for folder, asset in self._index()[0] if folder == subfolder]
+
+    def size(self, subfolder: str, asset: str) -> tuple[int, int] | None:
+        """returns the size of an asset's backed up texture, None if it wasn't backed up"""
+
+        entries, blobs = self._index()
+        digest = entries.get((subfolder, asset))
+
+        return (blobs[digest].width, blobs[digest].height) if digest else None
+
+    def texture(self, subfolder: str, asset: str) -> EncodedTexture | None:
+        """
+        Reads the backed up texture of an asset.
+
+        :param subfolder: The asset type, the service subfolder.
+        :type subfolder: str
+        :param asset: The bundle or texture the backup was taken from.
+        :type asset: str
+        :returns: The original texture data, ready to be applied to the texture,
+            or None if the asset wasn't backed up.
+        :rtype: EncodedTexture | None
+        """
+
+        entries, blobs = self._index()
+        digest = entries.get((subfolder, asset))
+        if not digest:
+            return None
+
+        blob = blobs[digest]
+        with open(self._path(digest), "rb") as f:
+            data = _CODECS[blob.compression][1](f.read())
+
+        return EncodedTexture(
+            data, TextureFormat[blob.format], blob.width, blob.height, blob.mip_count
+        )
+
+    def image(self, subfolder: str, asset: str) -> Image.Image | None:
+        """returns the backed up texture of an asset decoded, None if it wasn't backed up"""
+
+        entries, blobs = self._index()
+        digest = entries.get((subfolder, asset))
+        if not digest:
+            return None
+
+        blob = blobs[digest]
+        encoded = self.texture(subfolder, asset)
+
+        return Texture2DConverter.parse_image_data(
+            encoded.data,
+            encoded.width,
+            encoded.height,
+            encoded.texture_format,
+            tuple(int(part) for part in blob.version.split(".")),
+            blob.platform,
+        )
+
+    @property
+    def bundle_copies(self) -> bool:
+        """whether bundles are backed up as copies of their file instead of their texture"""
+
+        if self._bundle_copies is None:
+            config = session.query(BackupConfigModel).first()
+            self._bundle_copies = bool(config and config.bundle_copies)
+
+        return self._bundle_copies
+
+    def set_bundle_copies(self, enabled: bool) -> None:
+        """Sets whether bundles are backed up as copies of their file"""
+
+        config = session.query(BackupConfigModel).first() or BackupConfigModel()
+        config.bundle_copies = enabled
+        session.add(config)
+        session.commit()
+
+        self._bundle_copies = enabled
+
+    def bundle_path(self, subfolder: str, bundle: str) -> str:
+        """returns the path of a bundle's copy, whether it exists or not"""
+
+        return join(self.bundle_directory, subfolder, bundle)
+
+    def put_bundle(self, subfolder: str, bundle: str, path: str) -> bool:
+        """
+        Backs up a bundle as a copy of its file, unless it already was.
+
+        The copy is only taken once, as later calls would copy a bundle that was
+        already modified.
+
+        :param subfolder: The asset type, the service subfolder.
+        :type subfolder: str
+        :param bundle: The bundle name.
+        :type bundle: str
+        :param path: The path of the bundle file.
+        :type path: str
+        :returns: Whether the bundle was copied.
+        :rtype: bool
+        """
+
+        backup = self.bundle_path(subfolder, bundle)
+        if isfile(backup) or not isfile(path):
+            return False
+
+        makedirs(join(self.bundle_directory, subfolder), exist_ok=True)
+        copyfile(path, backup + ".tmp")
+        replace(backup + ".tmp", backup)
+
+        return True
+
+    def has_bundle(self, subfolder: str, bundle: str) -> bool:
+        """returns whether a bundle was backed up as a copy of its file"""
+
+        return isfile(self.bundle_path(subfolder, bundle))
+
+    def bundles(self, subfolder: str) -> list[str]:
+        """returns the bundles of an asset type backed up as copies of their file"""
+
+        try:
+            return [
+                name
+                for name in listdir(join(self.bundle_directory, subfolder))
+                if not name.endswith(".tmp")
+            ]
+        except OSError:
+            return []
+
+    def restore_bundle(self, subfolder: str, bundle: str, path: str) -> bool:
+        """
+        Puts the backed up copy of a bundle back in place of its file.
+
+        The copy is written next to the bundle and renamed over it, so the bundle
+        is never left half written.
+
+        :param subfolder: The asset type, the service subfolder.
+        :type subfolder: str
+        :param bundle: The bundle name.
+        :type bundle: str
+        :param path: The path of the bundle file.
+        :type path: str
+        :returns: Whether the file was replaced, False if it was already identical.
+        :rtype: bool
+        """
+
+        backup = self.bundle_path(subfolder, bundle)
+        if isfile(path) and cmp(backup, path, shallow=False):
+            return False
+
+        copyfile(backup, path + ".tmp")
+        replace(path + ".tmp", path)
+
+        return True
+
+    def report(self) -> BackupReport:
+        """returns how many assets, blobs and bundle copies the store holds and their sizes"""
+
+        entries, blobs = self._index()
+        subfolders = (
+            listdir(self.bundle_directory) if isdir(self.bundle_directory) else []
+        )
+        bundles = [
+            self.bundle_path(subfolder, bundle)
+            for subfolder in subfolders
+            for bundle in self.bundles(subfolder)
+        ]
+
+        return BackupReport(
+            len(entries),
+            len(blobs),
+            sum(blob.size for blob in blobs.values()),
+            sum(blob.stored_size for blob in blobs.values()),
+            len(bundles),
+            sum(getsize(path) for path in bundles),
+        )
+
+    def remove(self, subfolder: str) -> int:
+        """
+        Deletes the backups of an asset type, and the blobs no other backup uses.
+
+        :param subfolder: The asset type, the service subfolder.
+        :type subfolder: str
+        :returns: The number of backups deleted.
+        :rtype: int
+        """
+
+        entries, blobs = self._index()
+        removed = [key for key in entries if key[0] == subfolder]
+
+        session.query(BackupEntryModel).filter(
+            BackupEntryModel.subfolder == subfolder
+        ).delete()
+
+        with self._lock:
+            for key in removed:
+                del entries[key]
+            unused = set(blobs) - set(entries.values())
+            for digest in unused:
+                del blobs[digest]
+
+        removed.extend((subfolder, bundle) for bundle in self.bundles(subfolder))
+        rmtree(join(self.bundle_directory, subfolder), ignore_errors=True)
+
+        for digest in unused:
+            session.query(BackupBlobModel).filter(
+                BackupBlobModel.digest == digest
+            ).delete()
+            try:
+                remove(self._path(digest))
+            except OSError:
+                pass
+        session.commit()
+
+        return len(removed)
+
+    def clear(self) -> None:
+        """Deletes every backup"""
+
+        session.query(BackupEntryModel).delete()
+        session.query(BackupBlobModel).delete()
+        session.commit()
+        rmtree(self.directory, ignore_errors=True)
+        rmtree(self.bundle_directory, ignore_errors=True)
+
+        with self._lock:
+            self._entries = self._blobs = None
+
+
+# Global backup store instance
+BACKUP_STORE: BackupStore = BackupStore()
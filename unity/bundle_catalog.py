@@ -0,0 +1,590 @@
+"""
+Catalog of the game's asset bundles.
+This module scans the game's AssetBundle folders once, recording where each
+bundle lives along with the metadata of its textures, so that bundles can be
+resolved with a single lookup instead of trying to load them from every
+possible location.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from os import scandir, stat
+from os.path import isfile, join
+from threading import Lock, Thread
+from typing import Callable, Iterable, NamedTuple
+
+from sqlalchemy import insert
+from UnityPy.enums import TextureFormat
+from UnityPy.files import ObjectReader
+
+from database.models import (
+    BundleCatalogModel,
+    BundleTextureModel,
+    CardMetadataModel,
+    CardModel,
+    DeckBoxModel,
+    FieldModel,
+    IconModel,
+    NativeSizeModel,
+    SleeveModel,
+    WallpaperModel,
+)
+from database.objects import session
+from unity.bundle_reader import BundleReader
+from util.constants import APP_CONFIG
+
+# Maximum number of bound parameters used in a single IN clause
+_CHUNK_SIZE = 500
+
+
+class TextureInfo(NamedTuple):
+    """Metadata of a Texture2D, read without its image data"""
+
+    path_id: int
+    name: str
+    width: int
+    height: int
+    format: str
+    mip_count: int
+
+
+def asset_bundle_roots() -> list[tuple[str, bool]]:
+    """returns the AssetBundle folders of the game, with whether they are StreamingAssets"""
+
+    return [
+        (join(APP_CONFIG.game_path, "0000"), False),
+        (
+            join(
+                APP_CONFIG.game_path[:-18],
+                "masterduel_Data",
+                "StreamingAssets",
+                "AssetBundle",
+            ),
+            True,
+        ),
+    ]
+
+
+def known_bundles() -> set[str]:
+    """returns the names of every bundle referenced by the application's asset tables"""
+
+    columns = [
+        CardModel.bundle,
+        CardMetadataModel.bundle,
+        SleeveModel.bundle,
+        FieldModel.bundle,
+        IconModel.bundle_small,
+        IconModel.bundle_medium,
+        IconModel.bundle_big,
+        WallpaperModel.bundle_icon,
+        WallpaperModel.bundle_foreground,
+        WallpaperModel.bundle_background,
+        DeckBoxModel.small,
+        DeckBoxModel.medium,
+        DeckBoxModel.o_medium,
+        DeckBoxModel.r_medium,
+        DeckBoxModel.large,
+        DeckBoxModel.o_large,
+        DeckBoxModel.r_large,
+    ]
+
+    return {
+        bundle
+        for column in columns
+        for (bundle,) in session.query(column).all()
+        if bundle
+    }
+
+
+def read_texture_info(obj: ObjectReader) -> TextureInfo:
+    """
+    Reads the name, dimensions, format and mip count of a Texture2D.
+
+    Only the fields in front of the image data are read, so for bundles opened
+    with :class:`BundleReader` the image data is never decompressed.
+
+    :param obj: The reader of a Texture2D object.
+    :type obj: ObjectReader
+    :returns: The texture metadata.
+    :rtype: TextureInfo
+    """
+
+    version = obj.version
+    obj.reset()
+
+    # Same field order as UnityPy's Texture and Texture2D classes
+    name = obj.read_aligned_string()
+    if (2017, 3) <= version < (2023, 2, 0, 18):
+        obj.read_int()
+        obj.read_boolean()
+    if version >= (2020, 2):
+        obj.read_boolean()
+    obj.align_stream()
+
+    width = obj.read_int()
+    height = obj.read_int()
+    obj.read_int()
+    if version >= (2020, 1):
+        obj.read_int()
+    texture_format = TextureFormat(obj.read_int())
+    if version < (5, 2):
+        mip_count = 2 if obj.read_boolean() else 1
+    else:
+        mip_count = obj.read_int()
+
+    return TextureInfo(obj.path_id, name, width, height, texture_format.name, mip_count)
+
+
+def read_bundle_textures(path: str) -> list[TextureInfo]:
+    """
+    Reads the metadata of every Texture2D in a bundle.
+
+    :param path: The path of the bundle.
+    :type path: str
+    :returns: The metadata of the textures, empty if the bundle can't be read.
+    :rtype: list[TextureInfo]
+    """
+
+    try:
+        with BundleReader(path) as bundle:
+            return [
+                read_texture_info(obj)
+                for obj in bundle.environment.objects
+                if obj.type.name == "Texture2D"
+            ]
+    except Exception:
+        # Encrypted or otherwise unreadable bundles are cataloged without textures
+        return []
+
+
+def _list_bundles() -> dict[str, tuple[str, bool, int, int]]:
+    found = {}
+
+    for root, streaming in asset_bundle_roots():
+        try:
+            folders = [entry for entry in scandir(root) if entry.is_dir()]
+        except OSError:
+            continue
+
+        for folder in folders:
+            for entry in scandir(folder.path):
+                # Bundles in the 0000 folder take precedence, as the game does
+                if entry.is_file() and entry.name not in found:
+                    stat = entry.stat()
+                    found[entry.name] = (
+                        entry.path,
+                        streaming,
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                    )
+
+    return found
+
+
+def _chunks(items: list) -> Iterable[list]:
+    for start in range(0, len(items), _CHUNK_SIZE):
+        yield items[start : start + _CHUNK_SIZE]
+
+
+class CatalogEntry(NamedTuple):
+    """A cataloged bundle file, with the metadata of its textures"""
+
+    path: str
+    streaming: bool
+    mtime: int
+    size: int
+    textures: tuple[TextureInfo, ...]
+
+
+class _ScanResult(NamedTuple):
+    found: dict[str, tuple[str, bool, int, int]]
+    changed: list[str]
+    removed: list[str]
+    textures: dict[str, list[TextureInfo]]
+
+
+def _read_scan(
+    cataloged: dict[str, tuple[str, int, int]],
+    wanted: set[str] | None,
+    workers: int,
+    progress: Callable[[int, int], None] | None,
+) -> _ScanResult:
+    # Only reads files, so that it can run on a worker thread
+    found = _list_bundles()
+    if wanted is not None:
+        found = {name: entry for name, entry in found.items() if name in wanted}
+
+    changed = [
+        name
+        for name, (path, _, mtime, size) in found.items()
+        if cataloged.get(name) != (path, mtime, size)
+    ]
+    removed = [
+        name
+        for name in cataloged
+        if name not in found and (wanted is None or name in wanted)
+    ]
+
+    textures = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, (name, infos) in enumerate(
+            zip(
+                changed,
+                pool.map(lambda name: read_bundle_textures(found[name][0]), changed),
+            ),
+            1,
+        ):
+            textures[name] = infos
+            if progress:
+                progress(done, len(changed))
+
+    return _ScanResult(found, changed, removed, textures)
+
+
+class BundleCatalog:
+    """
+    Resolves bundle names to their files through the cataloged locations.
+
+    The locations and texture metadata are kept in memory after the first
+    lookup, so resolving is safe from the list models' worker threads.
+
+    Attributes:
+        scanned: Number of bundles whose textures were read by the last scan
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CatalogEntry] | None = None
+        self._native_sizes: dict[str, tuple[int, int]] | None = None
+        self._pending_sizes: dict[str, tuple[int, int]] = {}
+        self._lock = Lock()
+        self._scan: Thread | None = None
+        self._result: _ScanResult | BaseException | None = None
+        self.scanned = 0
+
+    @staticmethod
+    def _load_entries() -> dict[str, CatalogEntry]:
+        textures: dict[str, list[TextureInfo]] = {}
+        for row in session.query(BundleTextureModel).all():
+            textures.setdefault(row.bundle, []).append(
+                TextureInfo(
+                    row.path_id,
+                    row.name,
+                    row.width,
+                    row.height,
+                    row.format,
+                    row.mip_count,
+                )
+            )
+
+        return {
+            bundle: CatalogEntry(
+                path, streaming, mtime, size, tuple(textures.get(bundle, ()))
+            )
+            for bundle, path, streaming, mtime, size in session.query(
+                BundleCatalogModel.bundle,
+                BundleCatalogModel.path,
+                BundleCatalogModel.streaming,
+                BundleCatalogModel.mtime,
+                BundleCatalogModel.size,
+            ).all()
+        }
+
+    def _get_entries(self) -> dict[str, CatalogEntry]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load_entries()
+
+            return self._entries
+
+    def _get_native_sizes(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            if self._native_sizes is None:
+                self._native_sizes = {
+                    bundle: (width, height)
+                    for bundle, width, height in session.query(
+                        NativeSizeModel.bundle,
+                        NativeSizeModel.width,
+                        NativeSizeModel.height,
+                    ).all()
+                }
+
+            return self._native_sizes
+
+    @staticmethod
+    def _cataloged() -> dict[str, tuple[str, int, int]]:
+        return {
+            bundle: (path, mtime, size)
+            for bundle, path, mtime, size in session.query(
+                BundleCatalogModel.bundle,
+                BundleCatalogModel.path,
+                BundleCatalogModel.mtime,
+                BundleCatalogModel.size,
+            ).all()
+        }
+
+    def scan(
+        self,
+        bundles: Iterable[str] | None = None,
+        workers: int = 8,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> int:
+        """
+        Updates the catalog from the game's AssetBundle folders.
+
+        Only bundles that are new or whose path, modification time or size
+        changed since the last scan have their textures read again.
+
+        :param bundles: The bundles to catalog, every bundle found if None.
+        :type bundles: Iterable[str] | None, optional
+        :param workers: Number of threads reading bundles.
+        :type workers: int, optional
+        :param progress: Called with the number of bundles read and to read.
+        :type progress: Callable[[int, int], None] | None, optional
+        :returns: The number of bundles read.
+        :rtype: int
+        """
+
+        return self._record(
+            _read_scan(
+                self._cataloged(),
+                set(bundles) if bundles is not None else None,
+                workers,
+                progress,
+            )
+        )
+
+    def start_scan(
+        self, bundles: Iterable[str] | None = None, workers: int = 8
+    ) -> None:
+        """
+        Updates the catalog like :meth:`scan`, reading the bundles on a background thread.
+
+        Lookups keep using the current catalog until :meth:`flush` records the
+        finished scan, which has to be called from the main thread like every
+        other database write.
+
+        :param bundles: The bundles to catalog, every bundle found if None.
+        :type bundles: Iterable[str] | None, optional
+        :param workers: Number of threads reading bundles.
+        :type workers: int, optional
+        """
+
+        if self._scan and self._scan.is_alive():
+            return
+
+        # Loaded here, so that lookups made during the scan never query the session
+        self._get_entries()
+        self._get_native_sizes()
+        cataloged = self._cataloged()
+        wanted = set(bundles) if bundles is not None else None
+
+        def run() -> None:
+            try:
+                result = _read_scan(cataloged, wanted, workers, None)
+            except Exception as e:
+                result = e
+            with self._lock:
+                self._result = result
+
+        self._scan = Thread(target=run, daemon=True)
+        self._scan.start()
+
+    def flush(self) -> int:
+        """
+        Records the scan started by :meth:`start_scan` once it has finished,
+        along with the native sizes found since the last flush.
+
+        :returns: The number of bundles read, 0 if no scan has finished.
+        :rtype: int
+        :raises Exception: The error the background scan failed with.
+        """
+
+        self._record_native_sizes({})
+
+        with self._lock:
+            result, self._result = self._result, None
+
+        if isinstance(result, BaseException):
+            raise result
+
+        return self._record(result) if result else 0
+
+    def _record(self, result: _ScanResult) -> int:
+        found, changed, removed, textures = result
+        rows = {row.bundle: row for row in session.query(BundleCatalogModel).all()}
+
+        for chunk in _chunks(changed + removed):
+            session.query(BundleTextureModel).filter(
+                BundleTextureModel.bundle.in_(chunk)
+            ).delete(synchronize_session=False)
+        for chunk in _chunks(removed):
+            session.query(BundleCatalogModel).filter(
+                BundleCatalogModel.bundle.in_(chunk)
+            ).delete(synchronize_session=False)
+
+        for name in changed:
+            path, streaming, mtime, size = found[name]
+            row = rows.get(name) or BundleCatalogModel(bundle=name)
+            row.path, row.streaming, row.mtime, row.size = path, streaming, mtime, size
+            session.add(row)
+
+        texture_rows = [
+            {"bundle": name, **info._asdict()}
+            for name in changed
+            for info in textures[name]
+        ]
+        if texture_rows:
+            session.execute(insert(BundleTextureModel), texture_rows)
+        session.commit()
+
+        # Bundles cataloged for the first time still hold their original textures
+        self._record_native_sizes(
+            {
+                name: (textures[name][0].width, textures[name][0].height)
+                for name in changed
+                if textures[name]
+            }
+        )
+
+        # The catalog is reloaded here and swapped in whole, so that worker
+        # threads never find it unloaded and query the session
+        entries = self._load_entries()
+        with self._lock:
+            self._entries = entries
+        self.scanned = len(changed)
+
+        return len(changed)
+
+    def _record_native_sizes(self, sizes: dict[str, tuple[int, int]]) -> None:
+        native_sizes = self._get_native_sizes()
+
+        # Sizes are never overwritten, the first one recorded is the original
+        with self._lock:
+            sizes = {
+                bundle: size
+                for bundle, size in sizes.items()
+                if bundle not in native_sizes
+            }
+            native_sizes.update(sizes)
+            sizes.update(self._pending_sizes)
+            self._pending_sizes = {}
+
+        if sizes:
+            session.execute(
+                insert(NativeSizeModel),
+                [
+                    {"bundle": bundle, "width": width, "height": height}
+                    for bundle, (width, height) in sizes.items()
+                ],
+            )
+            session.commit()
+
+    def native_size(self, bundle: str) -> tuple[int, int] | None:
+        """
+        Returns the size of the first texture of a bundle, as the game ships it.
+
+        The size is recorded the first time the bundle is cataloged or looked up,
+        before it can be replaced, and never changes afterwards. Sizes found
+        outside of a scan are kept in memory until :meth:`flush` records them.
+
+        :param bundle: The bundle name.
+        :type bundle: str
+        :returns: The (width, height) of the texture, None if it can't be read.
+        :rtype: tuple[int, int] | None
+        """
+
+        native_sizes = self._get_native_sizes()
+        size = native_sizes.get(bundle)
+        if size:
+            return size
+
+        texture = next(iter(self.textures(bundle)), None)
+        if not texture:
+            return None
+
+        with self._lock:
+            if bundle not in native_sizes:
+                native_sizes[bundle] = (texture.width, texture.height)
+                self._pending_sizes[bundle] = native_sizes[bundle]
+
+            return native_sizes[bundle]
+
+    def resolve(self, bundle: str) -> str:
+        """
+        Returns the file path of a bundle.
+
+        Bundles missing from the catalog, or whose cataloged file is gone, are
+        looked up in the 0000 folder and then in StreamingAssets. The 0000 path
+        is returned if the bundle is in neither.
+
+        :param bundle: The bundle name.
+        :type bundle: str
+        :returns: The path of the bundle file.
+        :rtype: str
+        """
+
+        entry = self._get_entries().get(bundle)
+
+        if entry and isfile(entry.path):
+            return entry.path
+
+        candidates = [
+            join(root, bundle[:2], bundle) for root, _ in asset_bundle_roots()
+        ]
+
+        return next((path for path in candidates if isfile(path)), candidates[0])
+
+    def is_streaming(self, bundle: str) -> bool:
+        """returns whether the bundle resolves to the StreamingAssets folder"""
+
+        return self.resolve(bundle) != join(
+            asset_bundle_roots()[0][0], bundle[:2], bundle
+        )
+
+    def textures(self, bundle: str) -> list[TextureInfo]:
+        """
+        Returns the metadata of every Texture2D in a bundle.
+
+        The cataloged metadata is used as long as the file has the modification
+        time and size it was cataloged with. Otherwise, such as after the bundle
+        was replaced, the texture headers are read from the file again and kept
+        in memory until the next scan records them.
+
+        :param bundle: The bundle name.
+        :type bundle: str
+        :returns: The metadata of the textures, empty if the bundle can't be read.
+        :rtype: list[TextureInfo]
+        """
+
+        entries = self._get_entries()
+        path = self.resolve(bundle)
+
+        try:
+            file_stat = stat(path)
+        except OSError:
+            return []
+
+        entry = entries.get(bundle)
+        if entry and (entry.path, entry.mtime, entry.size) == (
+            path,
+            file_stat.st_mtime_ns,
+            file_stat.st_size,
+        ):
+            return list(entry.textures)
+
+        textures = read_bundle_textures(path)
+        streaming = entry.streaming if entry else self.is_streaming(bundle)
+        with self._lock:
+            if self._entries is not None:
+                self._entries[bundle] = CatalogEntry(
+                    path,
+                    streaming,
+                    file_stat.st_mtime_ns,
+                    file_stat.st_size,
+                    tuple(textures),
+                )
+
+        return textures
+
+
+# Global bundle catalog instance
+BUNDLE_CATALOG: BundleCatalog = BundleCatalog()
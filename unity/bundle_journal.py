@@ -0,0 +1,193 @@
+"""
+Journaled writes of bundles that change together.
+This module writes the new content of several bundles, such as the three
+CARD_* text bundles or the sizes of a player icon, to staged files next to
+them, then renames every staged file over its bundle once all of them are on
+disk. Each write is recorded in a journal so that an interrupted write is
+completed or undone on the next start, and the game never sees only part of
+the bundles changed.
+"""
+
+import json
+from glob import glob
+from os import fsync, remove, replace
+from os.path import exists, join
+from threading import Lock
+from uuid import uuid4
+
+from util.constants import APP_CONFIG
+
+# Suffix of the files holding the new content of the bundles until they are renamed
+STAGED_SUFFIX = ".staged"
+
+
+def bundle_journal_paths() -> list[str]:
+    """returns the paths of the journals of the bundle writes in progress"""
+
+    return glob(join(APP_CONFIG.game_path, "bundle_write.*.journal"))
+
+
+def _write_journal(path: str, state: str, bundles: list[str]) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"state": state, "bundles": bundles}, f)
+        f.flush()
+        fsync(f.fileno())
+
+    replace(path + ".tmp", path)
+
+
+def _write_synced(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        fsync(f.fileno())
+
+
+class BundleJournal:
+    """
+    Stages the new content of bundles and renames it into place all at once.
+
+    Used as a context manager, the staged bundles are committed when the block
+    exits without errors and discarded otherwise. Bundles can be staged from
+    several threads at once, so they can be packed and written in parallel.
+
+    Attributes:
+        path: The path of the journal file
+        bundles: The paths of the bundle files staged so far
+    """
+
+    def __init__(self) -> None:
+        # Named uniquely, as the threads of a batch replacement and the concurrent
+        # wallpaper and card writes may write several groups of bundles at once
+        self.path = join(APP_CONFIG.game_path, f"bundle_write.{uuid4().hex}.journal")
+        self.bundles: list[str] = []
+        self._lock = Lock()
+
+    def __enter__(self) -> "BundleJournal":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def stage(self, path: str, data: bytes) -> None:
+        """
+        Writes the new content of a bundle next to it and syncs it to disk.
+
+        The bundle is recorded in the journal before its staged file is written,
+        so a staged file is never left behind unrecorded.
+
+        :param path: The path of the bundle file.
+        :type path: str
+        :param data: The new content of the bundle.
+        :type data: bytes
+        """
+
+        with self._lock:
+            if path not in self.bundles:
+                self.bundles.append(path)
+                _write_journal(self.path, "staging", self.bundles)
+
+        _write_synced(path + STAGED_SUFFIX, data)
+
+    def commit(self) -> int:
+        """
+        Renames every staged file over its bundle.
+
+        :returns: The number of bundles written.
+        :rtype: int
+        """
+
+        if not self.bundles:
+            return 0
+
+        # From here on the write is completed on the next start if interrupted
+        _write_journal(self.path, "committing", self.bundles)
+        for path in self.bundles:
+            replace(path + STAGED_SUFFIX, path)
+
+        remove(self.path)
+
+        return len(self.bundles)
+
+    def rollback(self) -> None:
+        """Deletes the staged files, leaving every bundle as it was"""
+
+        for path in self.bundles:
+            if exists(path + STAGED_SUFFIX):
+                remove(path + STAGED_SUFFIX)
+
+        if exists(self.path):
+            remove(self.path)
+
+
+def write_bundle_file(
+    path: str, data: bytes, journal: BundleJournal | None = None
+) -> None:
+    """
+    Writes the new content of a bundle without ever leaving it half written.
+
+    The content is staged in the journal when one is given, otherwise it is
+    written to a staged file and renamed over the bundle right away.
+
+    :param path: The path of the bundle file.
+    :type path: str
+    :param data: The new content of the bundle.
+    :type data: bytes
+    :param journal: The journal of the bundles written together with this one.
+    :type journal: BundleJournal | None, optional
+    """
+
+    if journal:
+        journal.stage(path, data)
+        return
+
+    _write_synced(path + STAGED_SUFFIX, data)
+    replace(path + STAGED_SUFFIX, path)
+
+
+def recover_bundle_journals() -> tuple[int, int]:
+    """
+    Completes or undoes the bundle writes that were interrupted.
+
+    Writes interrupted while renaming have every staged file already synced, so
+    the remaining ones are renamed over their bundles. Writes interrupted while
+    staging have their staged files deleted.
+
+    :returns: The number of writes completed and of writes undone.
+    :rtype: tuple[int, int]
+    """
+
+    completed = undone = 0
+
+    for path in bundle_journal_paths():
+        try:
+            with open(path, encoding="utf-8") as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        for bundle in journal["bundles"]:
+            if not exists(bundle + STAGED_SUFFIX):
+                continue
+
+            if journal["state"] == "committing":
+                replace(bundle + STAGED_SUFFIX, bundle)
+            else:
+                remove(bundle + STAGED_SUFFIX)
+
+        if journal["state"] == "committing":
+            completed += 1
+        else:
+            undone += 1
+
+        remove(path)
+
+    # Journals are replaced atomically, so a leftover .tmp was never in use
+    for path in glob(join(APP_CONFIG.game_path, "bundle_write.*.journal.tmp")):
+        remove(path)
+
+    return completed, undone
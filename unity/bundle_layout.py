@@ -0,0 +1,381 @@
+"""
+Low level layout of UnityFS bundle files.
+This module reads and writes the header, block table and directory of a
+UnityFS bundle without going through UnityPy, so that callers can work on
+single storage blocks instead of the whole decompressed file.
+"""
+
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from struct import Struct
+from typing import BinaryIO, NamedTuple
+
+from UnityPy.helpers import CompressionHelper
+
+# Uncompressed size of the blocks we create, the same as UnityPy's LZ4 chunks
+BLOCK_SIZE = 0x20000
+
+_VERSION = re.compile(r"(\d+)\.(\d+)\.(\d+)")
+_HEADER = Struct(">qIII")
+_BLOCK = Struct(">IIH")
+_NODE = Struct(">qqI")
+
+# Packer names accepted by UnityPy's BundleFile.save and their (data_flag, block_info_flag)
+PACKER_FLAGS: dict[str | None, tuple[int, int]] = {
+    None: (64, 64),
+    "none": (64, 64),
+    "lz4": (194, 2),
+    "lzma": (65, 1),
+}
+
+
+class BundleBlock(NamedTuple):
+    """A storage block of a bundle, with its position in the file and in the data stream"""
+
+    uncompressed_size: int
+    compressed_size: int
+    flags: int
+    offset: int
+    start: int
+
+    @property
+    def end(self) -> int:
+        return self.start + self.uncompressed_size
+
+
+class BundleNode(NamedTuple):
+    """A file stored inside a bundle, positioned in the uncompressed data stream"""
+
+    offset: int
+    size: int
+    flags: int
+    path: str
+
+
+class BundleLayout(NamedTuple):
+    """The header fields, storage blocks and directory of a UnityFS bundle"""
+
+    signature: str
+    version: int
+    version_player: str
+    version_engine: str
+    data_flags: int
+    uses_block_alignment: bool
+    blocks: list[BundleBlock]
+    nodes: list[BundleNode]
+
+
+def _read_string(f: BinaryIO) -> str:
+    data = bytearray()
+    while (char := f.read(1)) not in (b"\x00", b""):
+        data += char
+    return data.decode("utf8", "surrogateescape")
+
+
+def _read_cstring(data: bytes, pos: int) -> tuple[str, int]:
+    end = data.index(b"\x00", pos)
+    return data[pos:end].decode("utf8", "surrogateescape"), end + 1
+
+
+def _uses_new_flags(version_engine: str) -> bool:
+    # Same version split as UnityPy, older engines used 0x200 for encryption
+    match = _VERSION.match(version_engine or "")
+    version = tuple(map(int, match.groups())) if match else (0, 0, 0)
+
+    return not (
+        version < (2020,)
+        or (version[0] == 2020 and version < (2020, 3, 34))
+        or (version[0] == 2021 and version < (2021, 3, 2))
+        or (version[0] == 2022 and version < (2022, 1, 1))
+    )
+
+
+def decompress_block(data: bytes, block: BundleBlock) -> bytes:
+    """returns the uncompressed content of the given block data"""
+
+    compression = block.flags & 0x3F
+
+    if compression == 1:
+        return CompressionHelper.decompress_lzma(data)
+    if compression in (2, 3):
+        return CompressionHelper.decompress_lz4(data, block.uncompressed_size)
+    if compression == 4:
+        raise NotImplementedError("LZHAM blocks are not supported")
+
+    return bytes(data)
+
+
+def compress_block(data: bytes, block_info_flag: int) -> tuple[int, int, int, bytes]:
+    """
+    Compresses one storage block the same way UnityPy does.
+
+    :param data: The uncompressed block content.
+    :type data: bytes
+    :param block_info_flag: The block flag of the packer in use.
+    :type block_info_flag: int
+    :returns: The uncompressed size, compressed size, flags and data of the block.
+    :rtype: tuple[int, int, int, bytes]
+    """
+
+    compression = block_info_flag & 0x3F
+
+    if compression == 1:
+        compressed = CompressionHelper.compress_lzma(data)
+    elif compression in (2, 3):
+        compressed = CompressionHelper.compress_lz4(data)
+    elif compression == 4:
+        raise NotImplementedError("LZHAM blocks are not supported")
+    else:
+        return len(data), len(data), block_info_flag, bytes(data)
+
+    # Blocks that grow when compressed are stored as they are, like UnityPy does
+    if len(compressed) > len(data):
+        return len(data), len(data), block_info_flag ^ compression, bytes(data)
+
+    return len(data), len(compressed), block_info_flag, compressed
+
+
+def _compress_info(data: bytes, compression: int) -> bytes:
+    # Unlike blocks, the block table has no flag to store it uncompressed when it
+    # grows, so it is always compressed, as UnityPy does
+    if compression == 1:
+        return CompressionHelper.compress_lzma(data)
+    if compression in (2, 3):
+        return CompressionHelper.compress_lz4(data)
+    if compression == 4:
+        raise NotImplementedError("LZHAM blocks are not supported")
+
+    return data
+
+
+class BlockReader:
+    """
+    Reads ranges of the uncompressed data stream of a bundle.
+
+    Only the storage blocks overlapping a requested range are read, uncompressed
+    blocks are read partially and the last decompressed blocks are kept in memory.
+
+    Attributes:
+        decompressed_bytes: Uncompressed size of the blocks decompressed so far
+    """
+
+    def __init__(
+        self, source: BinaryIO, blocks: list[BundleBlock], cached_blocks: int = 8
+    ) -> None:
+        self.source = source
+        self.blocks = blocks
+        self.decompressed_bytes = 0
+        self._starts = [block.start for block in blocks]
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+        self._cached_blocks = cached_blocks
+
+    def _block(self, index: int) -> bytes:
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        block = self.blocks[index]
+        self.source.seek(block.offset)
+        data = decompress_block(self.source.read(block.compressed_size), block)
+        self.decompressed_bytes += block.uncompressed_size
+
+        self._cache[index] = data
+        if len(self._cache) > self._cached_blocks:
+            self._cache.popitem(last=False)
+
+        return data
+
+    def read(self, start: int, size: int) -> bytes:
+        """returns size bytes of the data stream from the given position"""
+
+        end = start + size
+        data = bytearray()
+        index = max(bisect_right(self._starts, start) - 1, 0)
+
+        while index < len(self.blocks) and self.blocks[index].start < end:
+            block = self.blocks[index]
+            low = max(start - block.start, 0)
+            high = min(end, block.end) - block.start
+
+            if block.flags & 0x3F:
+                data += self._block(index)[low:high]
+            else:
+                self.source.seek(block.offset + low)
+                data += self.source.read(high - low)
+
+            index += 1
+
+        return bytes(data)
+
+
+def read_bundle_layout(f: BinaryIO) -> BundleLayout:
+    """
+    Reads the layout of a UnityFS bundle, decompressing only its block table.
+
+    :param f: The bundle file, opened in binary mode.
+    :type f: BinaryIO
+    :returns: The layout of the bundle.
+    :rtype: BundleLayout
+    :raises NotImplementedError: If the bundle is not an unencrypted UnityFS file.
+    """
+
+    f.seek(0)
+    signature = _read_string(f)
+
+    if signature != "UnityFS":
+        raise NotImplementedError(f"Unsupported bundle signature: {signature}")
+
+    version = int.from_bytes(f.read(4), "big")
+    version_player = _read_string(f)
+    version_engine = _read_string(f)
+    _, info_compressed, info_uncompressed, data_flags = _HEADER.unpack(
+        f.read(_HEADER.size)
+    )
+    new_flags = _uses_new_flags(version_engine)
+
+    if data_flags & (0x400 if new_flags else 0x200):
+        raise NotImplementedError("Encrypted bundles are not supported")
+
+    uses_block_alignment = False
+    if version >= 7:
+        f.seek((f.tell() + 15) // 16 * 16)
+        uses_block_alignment = True
+    elif new_flags or _VERSION.match(version_engine or ""):
+        position = f.tell()
+        padding = f.read((16 - position % 16) % 16)
+        if any(padding):
+            f.seek(position)
+        else:
+            uses_block_alignment = True
+
+    start = f.tell()
+    if data_flags & 0x80:
+        f.seek(0, 2)
+        f.seek(f.tell() - info_compressed)
+        info = f.read(info_compressed)
+        data_start = start
+    else:
+        info = f.read(info_compressed)
+        data_start = f.tell()
+
+    if new_flags and data_flags & 0x200:
+        data_start = (data_start + 15) // 16 * 16
+
+    info = decompress_block(
+        info, BundleBlock(info_uncompressed, info_compressed, data_flags, 0, 0)
+    )
+
+    pos = 16
+    (block_count,) = Struct(">i").unpack_from(info, pos)
+    pos += 4
+
+    blocks = []
+    offset, stream_start = data_start, 0
+    for _ in range(block_count):
+        uncompressed_size, compressed_size, flags = _BLOCK.unpack_from(info, pos)
+        pos += _BLOCK.size
+        blocks.append(
+            BundleBlock(uncompressed_size, compressed_size, flags, offset, stream_start)
+        )
+        offset += compressed_size
+        stream_start += uncompressed_size
+
+    (node_count,) = Struct(">i").unpack_from(info, pos)
+    pos += 4
+
+    nodes = []
+    for _ in range(node_count):
+        node_offset, node_size, node_flags = _NODE.unpack_from(info, pos)
+        path, pos = _read_cstring(info, pos + _NODE.size)
+        nodes.append(BundleNode(node_offset, node_size, node_flags, path))
+
+    return BundleLayout(
+        signature,
+        version,
+        version_player,
+        version_engine,
+        data_flags,
+        uses_block_alignment,
+        blocks,
+        nodes,
+    )
+
+
+def write_bundle(
+    out: BinaryIO,
+    layout: BundleLayout,
+    blocks: list[tuple[int, int, int, bytes | int]],
+    nodes: list[BundleNode],
+    source: BinaryIO | None,
+    packer_flags: tuple[int, int],
+) -> None:
+    """
+    Writes a UnityFS bundle from already compressed storage blocks.
+
+    Blocks whose data is an int are copied byte-for-byte from that offset of
+    the source file, everything else is written as given.
+
+    :param out: The file to write the bundle to.
+    :type out: BinaryIO
+    :param layout: The layout of the original bundle, for its header fields.
+    :type layout: BundleLayout
+    :param blocks: The uncompressed size, compressed size, flags and data (or source offset) of each block.
+    :type blocks: list[tuple[int, int, int, bytes | int]]
+    :param nodes: The directory of the new bundle.
+    :type nodes: list[BundleNode]
+    :param source: The original bundle file, for copied blocks.
+    :type source: BinaryIO | None
+    :param packer_flags: The (data_flag, block_info_flag) to write the bundle with.
+    :type packer_flags: tuple[int, int]
+    """
+
+    data_flag = packer_flags[0]
+
+    info = bytearray(b"\x00" * 16)
+    info += Struct(">i").pack(len(blocks))
+    for uncompressed_size, compressed_size, flags, _ in blocks:
+        info += _BLOCK.pack(uncompressed_size, compressed_size, flags)
+    info += Struct(">i").pack(len(nodes))
+    for node in nodes:
+        info += _NODE.pack(node.offset, node.size, node.flags)
+        info += node.path.encode("utf8", "surrogateescape") + b"\x00"
+
+    info_uncompressed = len(info)
+    info = _compress_info(bytes(info), data_flag & 0x3F)
+
+    def align():
+        out.write(b"\x00" * ((16 - out.tell() % 16) % 16))
+
+    def write_blocks():
+        if data_flag & 0x200:
+            align()
+        for _, compressed_size, _, data in blocks:
+            if isinstance(data, int):
+                source.seek(data)
+                out.write(source.read(compressed_size))
+            else:
+                out.write(data)
+
+    out.write(layout.signature.encode() + b"\x00")
+    out.write(layout.version.to_bytes(4, "big"))
+    out.write(layout.version_player.encode() + b"\x00")
+    out.write(layout.version_engine.encode() + b"\x00")
+
+    header_pos = out.tell()
+    out.write(_HEADER.pack(0, len(info), info_uncompressed, data_flag))
+
+    if layout.uses_block_alignment:
+        align()
+
+    if data_flag & 0x80:
+        write_blocks()
+        out.write(info)
+    else:
+        out.write(info)
+        write_blocks()
+
+    end = out.tell()
+    out.seek(header_pos)
+    out.write(end.to_bytes(8, "big", signed=True))
+    out.seek(end)
@@ -0,0 +1,192 @@
+"""
+Change detection for bundle writes.
+This module encodes textures ahead of loading their bundle and compares the
+hash of the new payload with the one the bundle already holds, so that
+re-applying the same image or text can skip the load and save of the bundle.
+"""
+
+from hashlib import sha1
+from typing import NamedTuple
+
+import etcpak
+from PIL import Image
+from UnityPy.classes import Texture2D
+from UnityPy.enums import TextureFormat
+from UnityPy.export import Texture2DConverter
+
+from unity.bundle_reader import BundleReader
+
+# etcpak encoders of the block formats, whose levels are padded to whole 4x4 blocks
+_BLOCK_ENCODERS = {
+    TextureFormat.DXT1: etcpak.compress_bc1,
+    TextureFormat.DXT5: etcpak.compress_bc3,
+    TextureFormat.BC7: etcpak.compress_bc7,
+    TextureFormat.ETC_RGB4: etcpak.compress_etc1_rgb,
+    TextureFormat.ETC2_RGB: etcpak.compress_etc2_rgb,
+    TextureFormat.ETC2_RGBA8: etcpak.compress_etc2_rgba,
+}
+
+
+class EncodedTexture(NamedTuple):
+    """Texture data encoded the same way as UnityPy's Texture2D.set_image"""
+
+    data: bytes
+    texture_format: TextureFormat
+    width: int
+    height: int
+    mip_count: int
+
+    @property
+    def digest(self) -> str:
+        """returns the hash of the texture data and the header fields describing it"""
+
+        return _digest(
+            self.width, self.height, self.texture_format, self.mip_count, self.data
+        )
+
+    def apply(self, texture: Texture2D) -> None:
+        """Stores the encoded data in a texture, like set_image does"""
+
+        texture.m_Width, texture.m_Height = self.width, self.height
+
+        if texture.version[:2] < (5, 2):
+            texture.m_MipMap = self.mip_count > 1
+        else:
+            texture.m_MipCount = self.mip_count
+
+        texture._image_data = self.data
+        texture.reset_streamdata()
+        texture.m_CompleteImageSize = len(self.data)
+        texture.m_TextureFormat = self.texture_format
+
+
+def _digest(
+    width: int, height: int, texture_format: TextureFormat, mip_count: int, data
+) -> str:
+    digest = sha1(f"{width}|{height}|{int(texture_format)}|{mip_count}|".encode())
+    digest.update(data)
+
+    return digest.hexdigest()
+
+
+def _encode_level(img: Image.Image, target_format: TextureFormat):
+    # Unity stores rows bottom up, and block formats are encoded from images
+    # padded to whole 4x4 blocks after flipping, so the padding stays past the end
+    img = img.convert("RGBA").transpose(Image.FLIP_TOP_BOTTOM)
+
+    if target_format not in _BLOCK_ENCODERS:
+        return Texture2DConverter.image_to_texture2d(img, target_format, flip=False)
+
+    width, height = -(-img.width // 4) * 4, -(-img.height // 4) * 4
+    if (width, height) != img.size:
+        padded = Image.new("RGBA", (width, height))
+        padded.paste(img)
+        img = padded
+
+    return _BLOCK_ENCODERS[target_format](img.tobytes(), width, height), target_format
+
+
+def encode_texture(
+    img: Image.Image,
+    target_format: TextureFormat = TextureFormat.RGBA32,
+    mipmap_count: int = 1,
+) -> EncodedTexture:
+    """
+    Encodes an image into texture data, with the same mipmaps as set_image.
+
+    Block-compressed formats are encoded through etcpak directly, padding the
+    levels whose size is not a multiple of 4.
+
+    :param img: The image to encode.
+    :type img: Image.Image
+    :param target_format: The texture format to encode to.
+    :type target_format: TextureFormat, optional
+    :param mipmap_count: The maximum number of mip levels.
+    :type mipmap_count: int, optional
+    :returns: The encoded texture.
+    :rtype: EncodedTexture
+    """
+
+    data, texture_format = _encode_level(img, target_format)
+    width, height = img.size
+    mip_count = mipmap_count
+
+    if mipmap_count > 1:
+        re_img = img
+        for level in range(mipmap_count - 1):
+            width //= 2
+            height //= 2
+            if width < 4 or height < 4:
+                mip_count = level + 1
+                break
+            re_img = re_img.resize((width, height), Image.BICUBIC)
+            data += _encode_level(re_img, target_format)[0]
+
+    return EncodedTexture(data, texture_format, img.width, img.height, mip_count)
+
+
+def texture_digest(texture: Texture2D) -> str:
+    """returns the hash of the data a texture holds, comparable to EncodedTexture.digest"""
+
+    return _digest(
+        texture.m_Width,
+        texture.m_Height,
+        texture.m_TextureFormat,
+        getattr(texture, "m_MipCount", 2 if getattr(texture, "m_MipMap", 0) else 1),
+        texture.image_data,
+    )
+
+
+def bundle_holds_texture(path: str, encoded: EncodedTexture, name: str = "") -> bool:
+    """
+    Checks whether a bundle's texture already holds the given data.
+
+    The texture data is read through :class:`BundleReader`, so only the blocks
+    holding the texture are decompressed and nothing is decoded.
+
+    :param path: The path of the bundle.
+    :type path: str
+    :param encoded: The new texture data.
+    :type encoded: EncodedTexture
+    :param name: Part of the texture name, the first texture is compared if empty.
+    :type name: str, optional
+    :returns: Whether the texture holds the same data, False if it can't be read.
+    :rtype: bool
+    """
+
+    try:
+        with BundleReader(path) as bundle:
+            for obj in bundle.environment.objects:
+                if obj.type.name == "Texture2D":
+                    texture = obj.read()
+                    if name in texture.m_Name:
+                        return texture_digest(texture) == encoded.digest
+    except Exception:
+        pass
+
+    return False
+
+
+def bundle_holds_script(path: str, script: bytes) -> bool:
+    """
+    Checks whether a bundle's TextAsset already holds the given script.
+
+    :param path: The path of the bundle.
+    :type path: str
+    :param script: The new script.
+    :type script: bytes
+    :returns: Whether the script is the same, False if it can't be read.
+    :rtype: bool
+    """
+
+    try:
+        with BundleReader(path) as bundle:
+            for obj in bundle.environment.objects:
+                if obj.type.name == "TextAsset":
+                    data = obj.read()
+                    if hasattr(data, "m_Script"):
+                        return bytes(data.m_Script) == bytes(script)
+    except Exception:
+        pass
+
+    return False
@@ -0,0 +1,132 @@
+"""
+Random-access reading of UnityFS bundles.
+This module exposes a bundle as a UnityPy environment whose files are read
+straight from disk, decompressing only the storage blocks that hold the
+metadata and objects actually accessed, instead of the whole bundle.
+"""
+
+import io
+
+from UnityPy import Environment
+from UnityPy.enums import FileType
+from UnityPy.files import File
+from UnityPy.helpers import ImportHelper
+from UnityPy.streams import EndianBinaryReader
+
+from unity.bundle_layout import BlockReader, BundleNode, read_bundle_layout
+
+# Bundle files that are always raw resource data, so their header is never read
+_RESOURCE_EXTENSIONS = (".resS", ".resource")
+
+
+class _NodeStream(io.RawIOBase):
+    """Seekable stream over one file of a bundle, read through the block reader"""
+
+    def __init__(self, blocks: BlockReader, node: BundleNode) -> None:
+        super().__init__()
+        self._blocks = blocks
+        self._offset = node.offset
+        self._size = node.size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+
+        self._position = max(offset, 0)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        end = self._size if size is None or size < 0 else self._position + size
+        end = min(end, self._size)
+
+        if end <= self._position:
+            return b""
+
+        data = self._blocks.read(self._offset + self._position, end - self._position)
+        self._position = end
+
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class BundleReader(File):
+    """
+    Read-only UnityFS bundle that decompresses storage blocks on demand.
+
+    The bundle is available through :attr:`environment`, which works like the
+    environment returned by UnityPy's load for reading objects. The file is
+    kept open until :meth:`close` is called, or the context manager exits.
+
+    Attributes:
+        environment: The UnityPy environment holding this bundle as its file
+        blocks: The block reader shared by all files of the bundle
+    """
+
+    def __init__(self, path: str, cached_blocks: int = 8) -> None:
+        super().__init__(parent=Environment(), name=path)
+        self._source = open(path, "rb")
+
+        try:
+            layout = read_bundle_layout(self._source)
+        except Exception:
+            self._source.close()
+            raise
+
+        self.signature = layout.signature
+        self.version_engine = layout.version_engine
+        self.blocks = BlockReader(self._source, layout.blocks, cached_blocks)
+
+        self.environment.files[self.name] = self
+        self.environment.file = self
+
+        for node in layout.nodes:
+            reader = EndianBinaryReader(_NodeStream(self.blocks, node))
+            file = ImportHelper.parse_file(
+                reader,
+                self,
+                node.path,
+                (
+                    FileType.ResourceFile
+                    if node.path.endswith(_RESOURCE_EXTENSIONS)
+                    else None
+                ),
+            )
+            self.environment.register_cab(node.path, file)
+            file.flags = node.flags
+            self.files[node.path] = file
+
+    def __enter__(self) -> "BundleReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def decompressed_bytes(self) -> int:
+        """returns the uncompressed size of the blocks decompressed so far"""
+
+        return self.blocks.decompressed_bytes
+
+    def close(self) -> None:
+        """Closes the bundle file, objects can't be read afterwards"""
+
+        self._source.close()
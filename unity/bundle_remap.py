@@ -0,0 +1,125 @@
+"""
+Rename-based remapping of asset bundles.
+This module moves the content of bundles between their files through renames
+on the same filesystem instead of copying them, recording each remap in a
+journal so that an interrupted remap can be rolled back.
+"""
+
+import json
+from os import fsync, remove, rename, replace, stat, utime
+from os.path import exists, join
+
+from unity.bundle_catalog import BUNDLE_CATALOG
+from util.constants import APP_CONFIG
+
+# Suffix of the files holding the bundles while they are moved
+REMAP_SUFFIX = ".remap"
+
+
+def remap_journal_path() -> str:
+    """returns the path of the journal of the bundle remap in progress"""
+
+    return join(APP_CONFIG.game_path, "bundle_remap.journal")
+
+
+def _write_journal(state: str, moves: list[tuple[str, str, str]]) -> None:
+    path = remap_journal_path()
+
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"state": state, "moves": moves}, f)
+        f.flush()
+        fsync(f.fileno())
+
+    replace(path + ".tmp", path)
+
+
+def remap_bundles(mapping: dict[str, str]) -> None:
+    """
+    Moves the content of each bundle to the file of another bundle.
+
+    The mapping has to be a permutation, every bundle whose content is moved
+    receives the content of another bundle. Each bundle is first renamed to a
+    staging file next to its destination, then every staging file is renamed
+    to its destination, so no bundle data is ever copied.
+
+    :param mapping: The bundle whose content is moved, mapped to the bundle
+        whose file receives it.
+    :type mapping: dict[str, str]
+    :raises ValueError: If the mapping is not a permutation, or the bundles are
+        not on the same filesystem.
+    :raises RuntimeError: If an interrupted remap has not been recovered yet.
+    """
+
+    mapping = {source: target for source, target in mapping.items() if source != target}
+
+    if set(mapping) != set(mapping.values()):
+        raise ValueError("Every remapped bundle has to receive another bundle")
+    if not mapping:
+        return
+    if exists(remap_journal_path()):
+        raise RuntimeError("An interrupted bundle remap has to be recovered first")
+
+    paths = {bundle: BUNDLE_CATALOG.resolve(bundle) for bundle in mapping}
+    if len({stat(path).st_dev for path in paths.values()}) != 1:
+        raise ValueError("Remapped bundles have to be on the same filesystem")
+
+    moves = [
+        (paths[source], paths[target] + REMAP_SUFFIX, paths[target])
+        for source, target in mapping.items()
+    ]
+
+    _write_journal("staging", moves)
+    for source, staging, _ in moves:
+        rename(source, staging)
+
+    _write_journal("committing", moves)
+    for _, staging, destination in moves:
+        rename(staging, destination)
+        # Renames keep the modification time, which the thumbnail cache and the
+        # bundle catalog rely on to notice the new content
+        utime(destination)
+
+    remove(remap_journal_path())
+
+
+def swap_bundles(bundles: list) -> None:
+    """Swaps the content of two given bundles"""
+
+    remap_bundles({bundles[0]: bundles[1], bundles[1]: bundles[0]})
+
+
+def recover_bundle_remap() -> bool:
+    """
+    Rolls back a bundle remap that was interrupted.
+
+    Bundles already renamed to their destination are moved back to their
+    staging file, then every staging file is renamed back to its source.
+
+    :returns: Whether an interrupted remap was rolled back.
+    :rtype: bool
+    """
+
+    path = remap_journal_path()
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    moves = journal["moves"]
+
+    if journal["state"] == "committing":
+        # Every source was vacated while staging, so existing destinations
+        # already hold their new content
+        for _, staging, destination in moves:
+            if not exists(staging) and exists(destination):
+                rename(destination, staging)
+
+    for source, staging, _ in moves:
+        if exists(staging) and not exists(source):
+            rename(staging, source)
+
+    remove(path)
+
+    return True
@@ -0,0 +1,282 @@
+"""
+Incremental repacking of UnityFS bundles.
+This module writes the objects edited in a loaded bundle back to its file
+while keeping every storage block that did not change byte-for-byte, instead
+of decompressing and recompressing the whole bundle like UnityPy's save does.
+"""
+
+import os
+from concurrent.futures import Future
+from dataclasses import dataclass
+from struct import pack
+from typing import BinaryIO
+from weakref import WeakKeyDictionary
+
+from UnityPy.files import BundleFile, SerializedFile
+from UnityPy.streams import EndianBinaryReader
+
+from unity.bundle_layout import (
+    BLOCK_SIZE,
+    BundleBlock,
+    BlockReader,
+    BundleNode,
+    read_bundle_layout,
+    write_bundle,
+)
+from unity.bundle_writer import BlockCompressor, packer_flags
+
+# Where edited objects were written by previous repacks, as (start, size) inside
+# their serialized file, since their readers no longer point at the file on disk
+_LOCATIONS: WeakKeyDictionary[SerializedFile, dict[int, tuple[int, int]]] = (
+    WeakKeyDictionary()
+)
+
+
+@dataclass
+class RepackStats:
+    """
+    Summary of an incremental repack.
+
+    Attributes:
+        reused_blocks: Number of storage blocks copied without decompressing them
+        written_blocks: Number of storage blocks compressed again
+        decompressed_bytes: Uncompressed size of the original blocks that had to be decompressed
+        size: Size of the written bundle
+    """
+
+    reused_blocks: int = 0
+    written_blocks: int = 0
+    decompressed_bytes: int = 0
+    size: int = 0
+
+
+def _plan_serialized_file(
+    file: SerializedFile, size: int
+) -> tuple[list[tuple[int, bytes]], bytes, dict[int, tuple[int, int]]]:
+    """
+    Works out the byte patches that store the edited objects of a serialized file.
+
+    Objects that still fit in their current slot are overwritten in place and
+    larger ones are appended to the end of the file, so that the metadata keeps
+    its size and only the offsets and sizes in the object table change.
+
+    :returns: The (position, bytes) patches, the bytes appended to the file
+        and the new (start, size) of every edited object.
+    """
+
+    header = file.header
+
+    if header.version < 9:
+        raise NotImplementedError(
+            "Serialized files with trailing metadata are not supported"
+        )
+
+    endian = file.reader.endian
+    base = file.reader.BaseOffset
+    locations = _LOCATIONS.get(file, {})
+
+    patches = []
+    tail = bytearray()
+    moved = {}
+
+    for path_id, obj in file.objects.items():
+        if not obj.data:
+            continue
+
+        data = bytes(obj.data)
+        start, old_size = locations.get(path_id, (obj.byte_start, obj.byte_size))
+
+        if len(data) <= old_size:
+            patches.append((start, data))
+        else:
+            tail += b"\x00" * ((16 - (size + len(tail)) % 16) % 16)
+            start = size + len(tail)
+            tail += data
+
+        position, width = obj.byte_start_offset
+        patches.append(
+            (
+                position - base,
+                pack(endian + ("q" if width == 8 else "I"), start - header.data_offset),
+            )
+        )
+        patches.append((obj.byte_size_offset[0] - base, pack(endian + "I", len(data))))
+        moved[path_id] = (start, len(data))
+
+    if tail:
+        # The file size in the header is always big endian
+        if header.version >= 22:
+            patches.append((24, pack(">q", size + len(tail))))
+        else:
+            patches.append((4, pack(">I", size + len(tail))))
+
+    return sorted(patches), bytes(tail), moved
+
+
+class _StreamBuilder:
+    """Builds the storage blocks of the new data stream out of old blocks and new bytes"""
+
+    def __init__(
+        self, source: BinaryIO, blocks: list[BundleBlock], compressor: BlockCompressor
+    ):
+        self.old_blocks = blocks
+        self.reader = BlockReader(source, blocks, cached_blocks=2)
+        self.compressor = compressor
+        # New blocks are compressed in the background and resolved by finish
+        self.blocks: list[tuple[int, int, int, bytes | int] | Future] = []
+        self.pending = bytearray()
+        self.stats = RepackStats()
+
+    def _old_range(self, start: int, end: int) -> bytes:
+        return self.reader.read(start, end - start) if end > start else b""
+
+    def _flush(self) -> None:
+        for pos in range(0, len(self.pending), BLOCK_SIZE):
+            self.blocks.append(
+                self.compressor.submit(bytes(self.pending[pos : pos + BLOCK_SIZE]))
+            )
+            self.stats.written_blocks += 1
+        self.pending.clear()
+
+    def add_bytes(self, data: bytes) -> None:
+        self.pending += data
+
+    def add_copy(self, start: int, end: int) -> None:
+        """Adds a range of the old data stream, reusing the blocks that it fully covers"""
+
+        covered = [
+            block
+            for block in self.old_blocks
+            if block.start >= start and block.end <= end and block.uncompressed_size
+        ]
+
+        if not covered:
+            self.add_bytes(self._old_range(start, end))
+            return
+
+        self.add_bytes(self._old_range(start, covered[0].start))
+        self._flush()
+
+        for block in covered:
+            self.blocks.append(
+                (
+                    block.uncompressed_size,
+                    block.compressed_size,
+                    block.flags,
+                    block.offset,
+                )
+            )
+            self.stats.reused_blocks += 1
+
+        self.add_bytes(self._old_range(covered[-1].end, end))
+
+    def finish(self) -> list[tuple[int, int, int, bytes | int]]:
+        self._flush()
+        return [
+            block.result() if isinstance(block, Future) else block
+            for block in self.blocks
+        ]
+
+
+def repack_bundle(bundle: BundleFile, path: str, packer=None) -> RepackStats:
+    """
+    Writes the edited objects of a loaded bundle back to its file, block by block.
+
+    Only the storage blocks that hold edited bytes are decompressed and
+    compressed again, all others are copied from the current file as they are.
+    New blocks use the given packer, reused ones keep their original compression.
+    The loaded bundle stays usable afterwards and serves the new object data.
+
+    :param bundle: The bundle loaded from the file at path, with edited objects.
+    :type bundle: BundleFile
+    :param path: The path of the bundle file.
+    :type path: str
+    :param packer: The UnityPy packer to compress new blocks with.
+    :type packer: str | tuple | None, optional
+    :returns: Statistics of the repack.
+    :rtype: RepackStats
+    :raises NotImplementedError: If the bundle can't be repacked incrementally,
+        in which case nothing was written.
+    """
+
+    flags = packer_flags(bundle, packer)
+    plans = {}
+
+    with open(path, "rb") as source:
+        layout = read_bundle_layout(source)
+
+        if [node.path for node in layout.nodes] != list(bundle.files):
+            raise NotImplementedError("The bundle does not match its file")
+
+        for node in layout.nodes:
+            file = bundle.files[node.path]
+
+            if isinstance(file, SerializedFile):
+                if any(obj.data for obj in file.objects.values()):
+                    plans[node.path] = _plan_serialized_file(file, node.size)
+            elif not isinstance(file, EndianBinaryReader):
+                raise NotImplementedError(f"Unsupported changed file: {node.path}")
+
+        with BlockCompressor(flags[1]) as compressor:
+            builder = _StreamBuilder(source, layout.blocks, compressor)
+            nodes = []
+            offset = 0
+
+            for node in layout.nodes:
+                if node.path not in plans:
+                    builder.add_copy(node.offset, node.offset + node.size)
+                    nodes.append(node._replace(offset=offset))
+                    offset += node.size
+                    continue
+
+                patches, tail, _ = plans[node.path]
+                position = 0
+                for start, data in patches:
+                    if start > position:
+                        builder.add_copy(node.offset + position, node.offset + start)
+                    builder.add_bytes(data)
+                    position = start + len(data)
+                if node.size > position:
+                    builder.add_copy(node.offset + position, node.offset + node.size)
+                builder.add_bytes(tail)
+
+                nodes.append(
+                    BundleNode(offset, node.size + len(tail), node.flags, node.path)
+                )
+                offset += node.size + len(tail)
+
+            blocks = builder.finish()
+        builder.stats.decompressed_bytes = builder.reader.decompressed_bytes
+
+        with open(path + ".tmp", "wb") as out:
+            write_bundle(out, layout, blocks, nodes, source, flags)
+            builder.stats.size = out.tell()
+            out.flush()
+            os.fsync(out.fileno())
+
+    os.replace(path + ".tmp", path)
+
+    for node_path, (_, tail, moved) in plans.items():
+        _rebase_serialized_file(bundle.files[node_path], tail, moved)
+    bundle.is_changed = False
+
+    return builder.stats
+
+
+def _rebase_serialized_file(
+    file: SerializedFile, tail: bytes, moved: dict[int, tuple[int, int]]
+) -> None:
+    """Points the edited objects at their new data, as the file was not parsed again"""
+
+    locations = _LOCATIONS.setdefault(file, {})
+
+    for path_id, location in moved.items():
+        obj = file.objects[path_id]
+        obj.reader = EndianBinaryReader(bytes(obj.data), endian=file.reader.endian)
+        obj.byte_start = 0
+        obj.byte_size = location[1]
+        obj.data = b""
+        locations[path_id] = location
+
+    file.header.file_size += len(tail)
+    file.is_changed = False
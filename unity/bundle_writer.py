@@ -0,0 +1,172 @@
+"""
+Parallel saving of UnityFS bundles.
+This module writes a loaded bundle the same way UnityPy's save does, byte for
+byte, but compresses its storage blocks on a pool of threads instead of one
+after the other. Blocks are submitted as soon as the files of the bundle fill
+them, and the block table is assembled once all of them are compressed.
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from UnityPy.files import BundleFile
+from UnityPy.streams import EndianBinaryReader, EndianBinaryWriter
+
+from unity.bundle_layout import (
+    BLOCK_SIZE,
+    PACKER_FLAGS,
+    BundleLayout,
+    BundleNode,
+    compress_block,
+    write_bundle,
+)
+
+# Default number of threads compressing blocks, LZ4 and LZMA release the GIL
+BLOCK_WORKERS: int = os.cpu_count() or 1
+
+
+def packer_flags(bundle: BundleFile, packer) -> tuple[int, int]:
+    """
+    Resolves a UnityPy packer to the flags a bundle is written with.
+
+    :param bundle: The bundle, for the "original" packer.
+    :type bundle: BundleFile
+    :param packer: The UnityPy packer name, or its (data_flag, block_info_flag).
+    :type packer: str | tuple | None
+    :returns: The (data_flag, block_info_flag) of the packer.
+    :rtype: tuple[int, int]
+    :raises NotImplementedError: If the packer is unknown.
+    """
+
+    if isinstance(packer, tuple):
+        return packer
+    if packer == "original":
+        return int(bundle.dataflags), bundle._block_info_flags
+    if packer in PACKER_FLAGS:
+        return PACKER_FLAGS[packer]
+
+    raise NotImplementedError(f"Unsupported packer: {packer}")
+
+
+class BlockCompressor:
+    """
+    Compresses storage blocks on a pool of threads, keeping their order.
+
+    Used as a context manager, the pool is shut down when the block exits.
+    The threads are only started by the first blocks submitted, so bundles of
+    a single block cost no more than compressing it directly.
+
+    Attributes:
+        block_info_flag: The block flag of the packer in use
+        workers: The number of threads compressing blocks
+    """
+
+    def __init__(self, block_info_flag: int, workers: int = BLOCK_WORKERS) -> None:
+        self.block_info_flag = block_info_flag
+        self.workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+
+    def __enter__(self) -> "BlockCompressor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        return False
+
+    def submit(self, data: bytes) -> Future:
+        """
+        Queues one block for compression.
+
+        :param data: The uncompressed block content.
+        :type data: bytes
+        :returns: The future of the block, as returned by :func:`compress_block`.
+        :rtype: Future
+        """
+
+        if self.workers <= 1:
+            future = Future()
+            future.set_result(compress_block(data, self.block_info_flag))
+            return future
+
+        if not self._pool:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        return self._pool.submit(compress_block, data, self.block_info_flag)
+
+
+def save_bundle(bundle, packer=None, workers: int = BLOCK_WORKERS) -> bytes:
+    """
+    Saves a loaded bundle like UnityPy's save, compressing its blocks in parallel.
+
+    The output is identical to ``bundle.save(packer=packer)``. LZ4 streams are
+    split into blocks of BLOCK_SIZE compressed concurrently, while UnityPy
+    stores uncompressed and LZMA streams as a single block, which is kept so
+    that the game reads the bundle exactly as before. Files other than UnityFS
+    bundles are saved through UnityPy.
+
+    :param bundle: The bundle to save, usually the file of an environment.
+    :type bundle: BundleFile
+    :param packer: The UnityPy packer to save the bundle with.
+    :type packer: str | tuple | None, optional
+    :param workers: The number of threads compressing blocks.
+    :type workers: int, optional
+    :returns: The bundle file content.
+    :rtype: bytes
+    """
+
+    if not isinstance(bundle, BundleFile) or bundle.signature != "UnityFS":
+        return bundle.save(packer=packer)
+
+    flags = packer_flags(bundle, packer)
+    if not flags[0] & 0x40:
+        raise NotImplementedError(
+            "UnityPy always writes DirectoryInfo, so data_flag must include 0x40"
+        )
+
+    compression = flags[1] & 0x3F
+    chunk_size = BLOCK_SIZE if compression in (2, 3) else None
+
+    nodes = []
+    futures = []
+    pending = bytearray()
+
+    with BlockCompressor(flags[1], workers) as compressor:
+        offset = 0
+        for name, file in bundle.files.items():
+            data = (
+                file.bytes
+                if isinstance(file, (EndianBinaryReader, EndianBinaryWriter))
+                else file.save()
+            )
+            nodes.append(BundleNode(offset, len(data), file.flags, name))
+            offset += len(data)
+
+            pending += data
+            while chunk_size and len(pending) >= chunk_size:
+                futures.append(compressor.submit(bytes(pending[:chunk_size])))
+                del pending[:chunk_size]
+
+        # UnityPy writes an empty block for an empty uncompressed stream only
+        if pending or not compression:
+            futures.append(compressor.submit(bytes(pending)))
+
+        blocks = [future.result() for future in futures]
+
+    layout = BundleLayout(
+        bundle.signature,
+        bundle.version,
+        bundle.version_player,
+        bundle.version_engine,
+        flags[0],
+        bundle._uses_block_alignment,
+        [],
+        nodes,
+    )
+
+    out = BytesIO()
+    write_bundle(out, layout, blocks, nodes, None, flags)
+
+    return out.getvalue()
@@ -0,0 +1,256 @@
+"""
+In-memory cache for decoded user images and encoded textures.
+This module keeps the images decoded from the user's files and the textures
+encoded from them, so that applying the same art to many assets decodes,
+transforms and encodes it once and later bundles only receive the bytes.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from hashlib import sha1
+from os import stat
+from threading import Lock
+from typing import Callable, Hashable, TypeVar
+
+from PIL import Image
+
+from unity.bundle_payload import EncodedTexture, encode_texture
+from unity.native_size import fit_native_size
+from unity.texture_formats import TEXTURE_FORMATS
+from util.constants import APP_CONFIG
+from util.image_utils import convert_image
+
+# Default memory budget of the encode cache
+ENCODE_CACHE_SIZE: int = 256 * 1024 * 1024
+
+_T = TypeVar("_T")
+
+
+class EncodeCache:
+    """
+    Decoded images and encoded textures with a shared memory budget and LRU eviction.
+
+    Decoded images are keyed by their file's path, modification time and size.
+    Encoded textures are keyed by the hash of the source file's content along
+    with everything that changes the encoded bytes, such as the transforms, the
+    texture format and the mip count, so the same art stored under another path
+    hits the same entry.
+
+    Cached images are shared between callers and must not be modified in place.
+    Threads missing the same key at the same time wait for the first one to
+    build the entry instead of building it again.
+
+    Attributes:
+        max_size: The maximum total size of the cached images and textures, in bytes
+        hits: Number of textures served from the cache
+        misses: Number of textures that had to be encoded
+    """
+
+    def __init__(self, max_size: int = ENCODE_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._digests: dict[tuple[str, int, int], str] = {}
+        self._building: dict[Hashable, Future] = {}
+        self._size = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def _fingerprint(path: str) -> tuple[str, int, int]:
+        file_stat = stat(path)
+        return path, file_stat.st_mtime_ns, file_stat.st_size
+
+    def _get_or_build(
+        self, key: Hashable, build: Callable[[], _T], size: Callable[[_T], int]
+    ) -> tuple[_T, bool]:
+        # Returns the entry and whether it was built by this call
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0], False
+
+            future = self._building.get(key)
+            building = future is None
+            if building:
+                future = self._building[key] = Future()
+
+        if not building:
+            return future.result(), False
+
+        try:
+            value = build()
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+
+        self._put(key, value, size(value))
+        with self._lock:
+            del self._building[key]
+        future.set_result(value)
+
+        return value, True
+
+    def _put(self, key: Hashable, value: object, size: int) -> None:
+        # Entries past the whole budget would only evict everything else
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+            self._entries[key] = (value, size)
+            self._size += size
+
+            while self._size > self.max_size:
+                self._size -= self._entries.popitem(last=False)[1][1]
+
+    def digest(self, path: str) -> str:
+        """returns the hash of a file's content, hashed again only once it changes"""
+
+        fingerprint = self._fingerprint(path)
+
+        with self._lock:
+            digest = self._digests.get(fingerprint)
+        if digest:
+            return digest
+
+        with open(path, "rb") as f:
+            digest = sha1(f.read()).hexdigest()
+
+        with self._lock:
+            self._digests[fingerprint] = digest
+
+        return digest
+
+    def image(self, path: str) -> Image.Image:
+        """
+        Returns the image of a file converted to RGBA, decoding it on a miss.
+
+        :param path: The path of the image file.
+        :type path: str
+        :returns: The decoded image, which must not be modified in place.
+        :rtype: Image.Image
+        """
+
+        img, _ = self._get_or_build(
+            ("image", *self._fingerprint(path)),
+            lambda: convert_image(path),
+            lambda img: img.width * img.height * len(img.getbands()),
+        )
+
+        return img
+
+    def texture(
+        self, path: str, params: tuple, encode: Callable[[], EncodedTexture]
+    ) -> EncodedTexture:
+        """
+        Returns an encoded texture from the cache, encoding it on a miss.
+
+        :param path: The path of the source image file.
+        :type path: str
+        :param params: Everything besides the source that changes the encoded
+            bytes, such as the transforms, the texture format and the mip count.
+        :type params: tuple
+        :param encode: Encodes the texture from the source image.
+        :type encode: Callable[[], EncodedTexture]
+        :returns: The encoded texture.
+        :rtype: EncodedTexture
+        """
+
+        encoded, encoded_here = self._get_or_build(
+            ("texture", self.digest(path), params),
+            encode,
+            lambda encoded: len(encoded.data),
+        )
+
+        with self._lock:
+            if encoded_here:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return encoded
+
+    def clear(self) -> None:
+        """Drops every cached image and texture"""
+
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """returns the hit and miss counts and the memory used by the cache"""
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size": self._size,
+            }
+
+
+# Global encode cache instance
+ENCODE_CACHE: EncodeCache = EncodeCache()
+
+
+def encode_user_image(
+    asset: str,
+    path: str,
+    size: tuple[int, int] | None,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+    transform_params: tuple = (),
+) -> EncodedTexture:
+    """
+    Encodes a user image the way an asset type stores it, through the encode cache.
+
+    The image is transformed, fitted to the native size and encoded to the
+    configured format and mip count, unless the same file was already encoded
+    with the same parameters.
+
+    :param asset: The asset type, the service subfolder.
+    :type asset: str
+    :param path: The path of the user image.
+    :type path: str
+    :param size: The native (width, height) of the replaced texture.
+    :type size: tuple[int, int] | None
+    :param transform: Applied to the decoded image before it is fitted, such as
+        adding a sleeve border. It must return a new image.
+    :type transform: Callable[[Image.Image], Image.Image] | None, optional
+    :param transform_params: Everything that changes the result of the transform.
+    :type transform_params: tuple, optional
+    :returns: The encoded texture.
+    :rtype: EncodedTexture
+    """
+
+    texture_format, auto_dxt1 = TEXTURE_FORMATS.get(asset)
+    keep_size = TEXTURE_FORMATS.keep_size(asset)
+    mipmap_count = APP_CONFIG.mipmap_count
+
+    def encode() -> EncodedTexture:
+        img = ENCODE_CACHE.image(path)
+        if transform:
+            img = transform(img)
+        img = fit_native_size(asset, img, size)
+
+        return encode_texture(
+            img, TEXTURE_FORMATS.output_format(asset, img), mipmap_count
+        )
+
+    return ENCODE_CACHE.texture(
+        path,
+        (
+            transform_params,
+            None if keep_size else size,
+            texture_format,
+            auto_dxt1,
+            mipmap_count,
+        ),
+        encode,
+    )
@@ -0,0 +1,146 @@
+"""
+Mipmap-aware decoding of Texture2D objects.
+This module decodes a single mip level of a texture instead of its base
+level, so that previews can be generated from the smallest level that is
+still large enough, without decoding the full resolution image.
+"""
+
+from typing import NamedTuple
+
+from PIL import Image
+from UnityPy.classes import Texture2D
+from UnityPy.enums import BuildTarget, TextureFormat
+from UnityPy.export.Texture2DConverter import parse_image_data
+from UnityPy.helpers.ResourceReader import get_resource_data
+
+# (block width, block height, bytes per block) of the formats with a known layout
+_FORMAT_BLOCKS: dict[TextureFormat, tuple[int, int, int]] = {
+    TextureFormat.Alpha8: (1, 1, 1),
+    TextureFormat.R8: (1, 1, 1),
+    TextureFormat.ARGB4444: (1, 1, 2),
+    TextureFormat.RGBA4444: (1, 1, 2),
+    TextureFormat.RGB565: (1, 1, 2),
+    TextureFormat.R16: (1, 1, 2),
+    TextureFormat.RGB24: (1, 1, 3),
+    TextureFormat.BGR24: (1, 1, 3),
+    TextureFormat.RGBA32: (1, 1, 4),
+    TextureFormat.ARGB32: (1, 1, 4),
+    TextureFormat.BGRA32: (1, 1, 4),
+    TextureFormat.DXT1: (4, 4, 8),
+    TextureFormat.BC4: (4, 4, 8),
+    TextureFormat.ETC_RGB4: (4, 4, 8),
+    TextureFormat.ETC2_RGB: (4, 4, 8),
+    TextureFormat.ETC2_RGBA1: (4, 4, 8),
+    TextureFormat.DXT3: (4, 4, 16),
+    TextureFormat.DXT5: (4, 4, 16),
+    TextureFormat.BC5: (4, 4, 16),
+    TextureFormat.BC6H: (4, 4, 16),
+    TextureFormat.BC7: (4, 4, 16),
+    TextureFormat.ETC2_RGBA8: (4, 4, 16),
+    TextureFormat.ASTC_RGB_4x4: (4, 4, 16),
+    TextureFormat.ASTC_RGBA_4x4: (4, 4, 16),
+    TextureFormat.ASTC_RGB_6x6: (6, 6, 16),
+    TextureFormat.ASTC_RGBA_6x6: (6, 6, 16),
+    TextureFormat.ASTC_RGB_8x8: (8, 8, 16),
+    TextureFormat.ASTC_RGBA_8x8: (8, 8, 16),
+}
+
+
+class MipLevel(NamedTuple):
+    """Dimensions and position of a mip level inside the texture data"""
+
+    width: int
+    height: int
+    offset: int
+    size: int
+
+
+def mip_level_size(texture_format: TextureFormat, width: int, height: int) -> int:
+    """returns the size in bytes of a single mip level of the given format and dimensions"""
+
+    block_width, block_height, block_size = _FORMAT_BLOCKS[texture_format]
+
+    return -(-width // block_width) * -(-height // block_height) * block_size
+
+
+def mip_levels(texture: Texture2D) -> list[MipLevel] | None:
+    """
+    Lists the mip levels stored in a texture.
+
+    :param texture: The texture to inspect.
+    :type texture: Texture2D
+    :returns: The mip levels from the base level down, or None if the layout of
+        the texture data is unknown or the data does not hold every level.
+    :rtype: list[MipLevel] | None
+    """
+
+    if (
+        texture.m_TextureFormat not in _FORMAT_BLOCKS
+        or getattr(texture, "m_MipsStripped", 0)
+        or getattr(texture, "m_ImageCount", 1) != 1
+        or texture.platform in (BuildTarget.Switch, BuildTarget.XBOX360)
+    ):
+        return None
+
+    levels = []
+    width, height, offset = texture.m_Width, texture.m_Height, 0
+
+    for _ in range(max(getattr(texture, "m_MipCount", 1), 1)):
+        size = mip_level_size(texture.m_TextureFormat, width, height)
+        levels.append(MipLevel(width, height, offset, size))
+        offset += size
+        width, height = max(width // 2, 1), max(height // 2, 1)
+
+    if offset > texture.m_CompleteImageSize:
+        return None
+
+    return levels
+
+
+def texture_thumbnail(texture: Texture2D, size: tuple[int, int] | None) -> Image.Image:
+    """
+    Decodes the smallest mip level of a texture that is at least the given size.
+
+    Textures without usable mip levels are decoded at full resolution. The
+    returned image is not resized, so it can be larger than the requested size.
+
+    :param texture: The texture to decode.
+    :type texture: Texture2D
+    :param size: The minimum (width, height) wanted, None for the base level.
+    :type size: tuple[int, int] | None
+    :returns: The decoded mip level.
+    :rtype: Image.Image
+    """
+
+    levels = mip_levels(texture) if size else None
+
+    if not levels:
+        return texture.image
+
+    level = levels[0]
+    for candidate in levels[1:]:
+        if candidate.width < size[0] or candidate.height < size[1]:
+            break
+        level = candidate
+
+    if level is levels[0]:
+        return texture.image
+
+    stream = texture.m_StreamData
+    if not texture._image_data and stream is not None and stream.path:
+        # Streamed textures only need the bytes of the chosen level
+        data = get_resource_data(
+            stream.path, texture.assets_file, stream.offset + level.offset, level.size
+        )
+    else:
+        data = texture.image_data[level.offset : level.offset + level.size]
+
+    return parse_image_data(
+        data,
+        level.width,
+        level.height,
+        texture.m_TextureFormat,
+        texture.version,
+        texture.platform,
+        getattr(texture, "m_PlatformBlob", None),
+    )
@@ -0,0 +1,113 @@
+"""
+Native resolution of the replaced textures.
+This module finds the size of the texture a user image replaces, as the game
+ships it, and downscales larger images to that size before they are encoded,
+so that oversized art doesn't end up as textures far larger than the game
+ever displays.
+"""
+
+from os.path import join
+
+from PIL import Image
+
+from unity.backup_store import BACKUP_STORE
+from unity.bundle_catalog import BUNDLE_CATALOG, read_bundle_textures, read_texture_info
+from unity.texture_formats import TEXTURE_FORMATS
+from unity.unity3d_cache import UNITY3D_CACHE
+from unity.unity3d_index import find_unity3d_object
+from util.image_utils import slugify
+
+
+def backup_size(subfolder: str, name: str) -> tuple[int, int] | None:
+    """returns the size of a texture's backup, None if it wasn't backed up"""
+
+    size = BACKUP_STORE.size(subfolder, slugify(name))
+    if size:
+        return size
+
+    if BACKUP_STORE.has_bundle(subfolder, name):
+        texture = next(
+            iter(read_bundle_textures(BACKUP_STORE.bundle_path(subfolder, name))), None
+        )
+        return (texture.width, texture.height) if texture else None
+
+    # PNG backups of older versions
+    try:
+        with Image.open(join("backups", subfolder, slugify(name) + ".png")) as img:
+            return img.size
+    except OSError:
+        return None
+
+
+def native_bundle_size(subfolder: str, bundle: str) -> tuple[int, int] | None:
+    """
+    Finds the original size of the first texture of a bundle.
+
+    The backup of the texture is the original one, so its size is used when
+    there is one. Otherwise the size the catalog recorded before the bundle was
+    first written is used, see :meth:`BundleCatalog.native_size`.
+
+    :param subfolder: The asset type, the service subfolder holding the backups.
+    :type subfolder: str
+    :param bundle: The bundle holding the texture.
+    :type bundle: str
+    :returns: The (width, height) of the texture, None if it can't be read.
+    :rtype: tuple[int, int] | None
+    """
+
+    size = backup_size(subfolder, bundle)
+    if size:
+        return size
+
+    return BUNDLE_CATALOG.native_size(bundle)
+
+
+def native_unity3d_size(asset: int | str) -> tuple[int, int] | None:
+    """
+    Reads the size of a texture in data.unity3d from its header.
+
+    :param asset: The path ID (int) or texture name (str) of the texture.
+    :type asset: int | str
+    :returns: The (width, height) of the texture, None if it isn't found.
+    :rtype: tuple[int, int] | None
+    """
+
+    with UNITY3D_CACHE.reader() as env:
+        obj = find_unity3d_object(env, asset)
+        if not obj:
+            return None
+
+        texture = read_texture_info(obj)
+
+    return texture.width, texture.height
+
+
+def fit_native_size(
+    asset: str, img: Image.Image, size: tuple[int, int] | None
+) -> Image.Image:
+    """
+    Downscales an image larger than the texture it replaces to its native size.
+
+    Each side is capped separately, as the game stretches the texture over the
+    same surface whatever its size, so only the sides past the native size lose
+    detail the game would not display anyway. Smaller images are kept as they
+    are, and so are all images of the asset types set to keep their size.
+
+    :param asset: The asset type, the service subfolder.
+    :type asset: str
+    :param img: The image to encode.
+    :type img: Image.Image
+    :param size: The native (width, height), None if it is unknown.
+    :type size: tuple[int, int] | None
+    :returns: The image, downscaled if it was larger than the native size.
+    :rtype: Image.Image
+    """
+
+    if not size or TEXTURE_FORMATS.keep_size(asset):
+        return img
+
+    fitted = (min(img.width, size[0]), min(img.height, size[1]))
+    if fitted == img.size:
+        return img
+
+    return img.resize(fitted, Image.Resampling.LANCZOS)
@@ -0,0 +1,149 @@
+"""
+Output texture formats of the replaced assets.
+This module keeps the texture format each asset type is encoded to when it is
+replaced, so that large textures can be stored block-compressed instead of as
+raw RGBA32, optionally falling back to an opaque format for images without
+alpha, and whether images larger than the original texture are downscaled to
+its size.
+"""
+
+from threading import Lock
+
+from PIL import Image
+from UnityPy.enums import TextureFormat
+
+from database.models import TextureFormatModel, TextureSizeModel
+from database.objects import session
+
+# Asset types with a configurable format, named after their service subfolder
+ASSET_TYPES: list[str] = ["cards", "sleeves", "fields", "icons", "wallpapers", "faces"]
+
+# Formats replaced textures can be encoded to, all supported by etcpak
+OUTPUT_FORMATS: list[TextureFormat] = [
+    TextureFormat.RGBA32,
+    TextureFormat.BC7,
+    TextureFormat.DXT5,
+    TextureFormat.DXT1,
+    TextureFormat.ETC2_RGBA8,
+    TextureFormat.ETC2_RGB,
+]
+
+# Opaque format used instead of each alpha format for images without alpha
+OPAQUE_FORMATS: dict[TextureFormat, TextureFormat] = {
+    TextureFormat.BC7: TextureFormat.DXT1,
+    TextureFormat.DXT5: TextureFormat.DXT1,
+    TextureFormat.ETC2_RGBA8: TextureFormat.ETC2_RGB,
+}
+
+
+def has_alpha(img: Image.Image) -> bool:
+    """returns whether any pixel of the image is not fully opaque"""
+
+    if "A" not in img.getbands():
+        return False
+
+    return img.getchannel("A").getextrema()[0] < 255
+
+
+class TextureFormats:
+    """
+    Output texture format of each asset type, backed by the texture_format and
+    texture_size tables.
+
+    The formats are read from the database once and kept in memory, so they can
+    be looked up from the services' worker threads.
+    """
+
+    def __init__(self) -> None:
+        self._formats: dict[str, tuple[TextureFormat, bool, bool]] | None = None
+        self._lock = Lock()
+
+    def _get_formats(self) -> dict[str, tuple[TextureFormat, bool, bool]]:
+        with self._lock:
+            if self._formats is None:
+                keep_sizes = {
+                    row.asset: bool(row.keep_size)
+                    for row in session.query(TextureSizeModel).all()
+                }
+                formats = {
+                    row.asset: (TextureFormat[row.format], bool(row.auto_dxt1))
+                    for row in session.query(TextureFormatModel).all()
+                }
+                self._formats = {
+                    asset: (
+                        *formats.get(asset, (TextureFormat.RGBA32, False)),
+                        keep_sizes.get(asset, False),
+                    )
+                    for asset in formats.keys() | keep_sizes.keys()
+                }
+
+            return self._formats
+
+    def load(self) -> None:
+        """Reads the formats from the database, so that worker threads never query the session"""
+
+        self._get_formats()
+
+    def get(self, asset: str) -> tuple[TextureFormat, bool]:
+        """returns the format of an asset type and whether opaque images use DXT1"""
+
+        return self._get_formats().get(asset, (TextureFormat.RGBA32, False, False))[:2]
+
+    def keep_size(self, asset: str) -> bool:
+        """returns whether images of an asset type keep their size when larger than the texture"""
+
+        return self._get_formats().get(asset, (TextureFormat.RGBA32, False, False))[2]
+
+    def set(
+        self,
+        asset: str,
+        texture_format: TextureFormat,
+        auto_dxt1: bool,
+        keep_size: bool = False,
+    ) -> None:
+        """Stores the format of an asset type"""
+
+        row = (
+            session.query(TextureFormatModel)
+            .filter(TextureFormatModel.asset == asset)
+            .first()
+        ) or TextureFormatModel(asset=asset)
+        row.format = texture_format.name
+        row.auto_dxt1 = auto_dxt1
+        session.add(row)
+
+        size_row = (
+            session.query(TextureSizeModel)
+            .filter(TextureSizeModel.asset == asset)
+            .first()
+        ) or TextureSizeModel(asset=asset)
+        size_row.keep_size = keep_size
+        session.add(size_row)
+        session.commit()
+
+        with self._lock:
+            self._formats = None
+
+    def output_format(self, asset: str, img: Image.Image) -> TextureFormat:
+        """
+        Returns the format a replacement image of an asset type is encoded to.
+
+        :param asset: The asset type, the service subfolder.
+        :type asset: str
+        :param img: The image to encode.
+        :type img: Image.Image
+        :returns: The configured format, or its opaque variant if automatic DXT1
+            is enabled and the image has no alpha.
+        :rtype: TextureFormat
+        """
+
+        texture_format, auto_dxt1 = self.get(asset)
+
+        if auto_dxt1 and texture_format in OPAQUE_FORMATS and not has_alpha(img):
+            return OPAQUE_FORMATS[texture_format]
+
+        return texture_format
+
+
+# Global texture format settings instance
+TEXTURE_FORMATS: TextureFormats = TextureFormats()
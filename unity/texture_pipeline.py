@@ -0,0 +1,192 @@
+"""
+Multi-resolution texture replacement.
+This module replaces the texture of several bundles that hold the same art at
+different resolutions, such as the three player icon sizes, decoding the
+source image once and writing the bundles concurrently.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from UnityPy import load as unity_load
+from UnityPy.enums import TextureFormat
+
+from unity.bundle_catalog import BUNDLE_CATALOG
+from unity.bundle_journal import BundleJournal, write_bundle_file
+from unity.bundle_writer import save_bundle
+from unity.bundle_payload import EncodedTexture, bundle_holds_texture, encode_texture
+from util.constants import APP_CONFIG
+
+
+def image_pyramid(
+    img: Image.Image, sizes: list[tuple[int, int]]
+) -> dict[tuple[int, int], Image.Image]:
+    """
+    Resizes an image to several sizes, each one from the next larger size.
+
+    Resizing from the previous level instead of the source keeps every Lanczos
+    pass small, as the source is only resampled once for the largest size.
+
+    :param img: The source image.
+    :type img: Image.Image
+    :param sizes: The (width, height) of each level.
+    :type sizes: list[tuple[int, int]]
+    :returns: The resized images, keyed by size.
+    :rtype: dict[tuple[int, int], Image.Image]
+    """
+
+    levels = {}
+    previous = img.convert("RGBA")
+
+    for size in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+        previous = (
+            previous
+            if previous.size == size
+            else previous.resize(size, Image.Resampling.LANCZOS)
+        )
+        levels[size] = previous
+
+    return levels
+
+
+def write_bundle_texture(
+    bundle: str, encoded: EncodedTexture, journal: BundleJournal | None = None
+) -> bool:
+    """
+    Stores encoded texture data in the first texture of a bundle and saves it.
+
+    The bundle is left untouched if its texture already holds the same data.
+
+    :param bundle: The bundle to modify.
+    :type bundle: str
+    :param encoded: The new texture data.
+    :type encoded: EncodedTexture
+    :param journal: The journal of the bundles written together with this one.
+    :type journal: BundleJournal | None, optional
+    :returns: Whether the bundle was written, False if it was unchanged.
+    :rtype: bool
+    """
+
+    f_path = BUNDLE_CATALOG.resolve(bundle)
+
+    if bundle_holds_texture(f_path, encoded):
+        return False
+
+    env = unity_load(f_path)
+
+    for obj in env.objects:
+        if obj.type.name == "Texture2D":
+            data = obj.read()
+            encoded.apply(data)
+            data.save()
+            break
+
+    write_bundle_file(f_path, save_bundle(env.file, APP_CONFIG.packer), journal)
+
+    return True
+
+
+def replace_bundle_texture(
+    bundle: str,
+    img: Image.Image,
+    mipmap_count: int | None = None,
+    target_format: TextureFormat = TextureFormat.RGBA32,
+    journal: BundleJournal | None = None,
+) -> bool:
+    """
+    Replaces the first texture of a bundle and saves it.
+
+    The texture is encoded before the bundle is loaded, and the bundle is left
+    untouched if its texture already holds the same data.
+
+    :param bundle: The bundle to modify.
+    :type bundle: str
+    :param img: The new texture.
+    :type img: Image.Image
+    :param mipmap_count: Number of mipmaps to generate, the configured count if None.
+    :type mipmap_count: int | None, optional
+    :param target_format: The texture format to encode to.
+    :type target_format: TextureFormat, optional
+    :param journal: The journal of the bundles written together with this one.
+    :type journal: BundleJournal | None, optional
+    :returns: Whether the bundle was written, False if it was unchanged.
+    :rtype: bool
+    """
+
+    return write_bundle_texture(
+        bundle,
+        encode_texture(
+            img,
+            target_format,
+            APP_CONFIG.mipmap_count if mipmap_count is None else mipmap_count,
+        ),
+        journal,
+    )
+
+
+def replace_bundle_textures(
+    textures: dict[str, Image.Image],
+    mipmap_count: int | None = None,
+    target_format: TextureFormat = TextureFormat.RGBA32,
+) -> list[str]:
+    """
+    Replaces the first texture of several bundles, writing them concurrently.
+
+    The bundles are staged in a journal and renamed into place together, so if
+    one of them fails none is written, and the first error is raised once all
+    of them are done.
+
+    :param textures: The new texture of each bundle.
+    :type textures: dict[str, Image.Image]
+    :param mipmap_count: Number of mipmaps to generate, the configured count if None.
+    :type mipmap_count: int | None, optional
+    :param target_format: The texture format to encode to.
+    :type target_format: TextureFormat, optional
+    :returns: The bundles skipped because they already held their texture.
+    :rtype: list[str]
+    """
+
+    with BundleJournal() as journal:
+        with ThreadPoolExecutor(max_workers=len(textures) or 1) as pool:
+            futures = {
+                bundle: pool.submit(
+                    replace_bundle_texture,
+                    bundle,
+                    img,
+                    mipmap_count,
+                    target_format,
+                    journal,
+                )
+                for bundle, img in textures.items()
+            }
+
+        written = {bundle: future.result() for bundle, future in futures.items()}
+
+    return [bundle for bundle, was_written in written.items() if not was_written]
+
+
+def replace_resolutions(
+    source: str | Image.Image,
+    bundles: dict[str, tuple[int, int]],
+    target_format: TextureFormat = TextureFormat.RGBA32,
+) -> list[str]:
+    """
+    Replaces the texture of bundles holding the same art at different sizes.
+
+    :param source: The path of the new image, or the image itself.
+    :type source: str | Image.Image
+    :param bundles: The size of the texture of each bundle.
+    :type bundles: dict[str, tuple[int, int]]
+    :param target_format: The texture format to encode to.
+    :type target_format: TextureFormat, optional
+    :returns: The bundles skipped because they already held their texture.
+    :rtype: list[str]
+    """
+
+    img = Image.open(source) if isinstance(source, str) else source
+    pyramid = image_pyramid(img, list(bundles.values()))
+
+    return replace_bundle_textures(
+        {bundle: pyramid[size] for bundle, size in bundles.items()},
+        target_format=target_format,
+    )
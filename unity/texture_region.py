@@ -0,0 +1,264 @@
+"""
+In-place region patching of textures.
+This module pastes an image into a rectangle of a texture by re-encoding only
+the pixel rows or 4x4 blocks inside the rectangle, and only the parts of the
+mip levels computed from them, instead of decoding and re-encoding the whole
+texture with all its mipmaps.
+"""
+
+from typing import Callable, NamedTuple
+
+import etcpak
+import texture2ddecoder
+from PIL import Image
+from UnityPy.classes import Texture2D
+from UnityPy.enums import TextureFormat
+
+from unity.bundle_payload import EncodedTexture
+
+# Source pixels on each side of a 2x bicubic downscale that reach an output pixel
+_MIP_SUPPORT = 4
+
+
+class _Layout(NamedTuple):
+    """How a texture format stores its pixels, in blocks of block x block pixels"""
+
+    block: int
+    block_bytes: int
+    encode: Callable[[bytes, int, int], bytes]
+    decode: Callable[[bytes, int, int], bytes]
+    raw_mode: str
+
+
+# Formats that can be patched in place, encoded the same way as encode_texture
+_LAYOUTS: dict[TextureFormat, _Layout] = {
+    TextureFormat.RGBA32: _Layout(
+        1, 4, lambda data, width, height: data, lambda data, width, height: data, "RGBA"
+    ),
+    TextureFormat.DXT1: _Layout(
+        4, 8, etcpak.compress_bc1, texture2ddecoder.decode_bc1, "BGRA"
+    ),
+    TextureFormat.DXT5: _Layout(
+        4, 16, etcpak.compress_bc3, texture2ddecoder.decode_bc3, "BGRA"
+    ),
+    TextureFormat.BC7: _Layout(
+        4, 16, etcpak.compress_bc7, texture2ddecoder.decode_bc7, "BGRA"
+    ),
+    TextureFormat.ETC_RGB4: _Layout(
+        4, 8, etcpak.compress_etc1_rgb, texture2ddecoder.decode_etc1, "BGRA"
+    ),
+    TextureFormat.ETC2_RGB: _Layout(
+        4, 8, etcpak.compress_etc2_rgb, texture2ddecoder.decode_etc2, "BGRA"
+    ),
+    TextureFormat.ETC2_RGBA8: _Layout(
+        4, 16, etcpak.compress_etc2_rgba, texture2ddecoder.decode_etc2a8, "BGRA"
+    ),
+}
+
+
+class _Level(NamedTuple):
+    offset: int
+    width: int
+    height: int
+
+
+def _levels(width: int, height: int, mip_count: int) -> list[_Level]:
+    levels = []
+    offset = 0
+
+    for _ in range(mip_count):
+        levels.append(_Level(offset, width, height))
+        offset += width * height
+        width //= 2
+        height //= 2
+
+    return levels
+
+
+def mip_levels(width: int, height: int, mipmap_count: int) -> int:
+    """returns the number of mip levels encode_texture stores for the given size"""
+
+    levels = 1
+    for _ in range(mipmap_count - 1):
+        width //= 2
+        height //= 2
+        if width < 4 or height < 4:
+            break
+        levels += 1
+
+    return levels
+
+
+def _align(
+    box: tuple[int, int, int, int], block: int, level: _Level
+) -> tuple[int, int, int, int]:
+    left, upper, right, lower = box
+
+    return (
+        max(0, left // block * block),
+        max(0, upper // block * block),
+        min(level.width, -(-right // block) * block),
+        min(level.height, -(-lower // block) * block),
+    )
+
+
+def _block_rows(layout: _Layout, level: _Level, box: tuple[int, int, int, int]):
+    # Yields the offset and length of the bytes of each block row inside the box
+    left, upper, right, lower = box
+    row_bytes = level.width // layout.block * layout.block_bytes
+    start = left // layout.block * layout.block_bytes
+    length = (right - left) // layout.block * layout.block_bytes
+    base = level.offset // (layout.block * layout.block) * layout.block_bytes
+
+    for row in range(upper // layout.block, lower // layout.block):
+        yield base + row * row_bytes + start, length
+
+
+def _read_region(
+    data: bytearray, layout: _Layout, level: _Level, box: tuple[int, int, int, int]
+) -> Image.Image:
+    size = (box[2] - box[0], box[3] - box[1])
+    blocks = b"".join(
+        data[offset : offset + length]
+        for offset, length in _block_rows(layout, level, box)
+    )
+
+    return Image.frombytes(
+        "RGBA", size, layout.decode(blocks, *size), "raw", layout.raw_mode
+    )
+
+
+def _write_region(
+    data: bytearray,
+    layout: _Layout,
+    level: _Level,
+    box: tuple[int, int, int, int],
+    img: Image.Image,
+) -> None:
+    blocks = layout.encode(img.tobytes(), *img.size)
+    position = 0
+
+    for offset, length in _block_rows(layout, level, box):
+        data[offset : offset + length] = blocks[position : position + length]
+        position += length
+
+
+def patch_texture_region(
+    texture: Texture2D,
+    img: Image.Image,
+    box: tuple[int, int, int, int],
+    target_format: TextureFormat,
+    mipmap_count: int,
+) -> EncodedTexture | None:
+    """
+    Pastes an image into a rectangle of a texture, re-encoding only that region.
+
+    The image is scaled to the rectangle and blended through its alpha, like
+    :func:`paste_scaled_image`. Only the blocks covering the rectangle are
+    decoded and encoded again, then each mip level is recomputed from the
+    previous one only where the rewritten pixels reach it through the bicubic
+    filter the mipmaps are generated with.
+
+    Patching needs the texture to already be stored as it would be encoded, in
+    the same format and with the same mip count, with every level made of whole
+    blocks. Otherwise None is returned and the texture has to be re-encoded.
+
+    :param texture: The texture to patch, which is not modified.
+    :type texture: Texture2D
+    :param img: The image to paste.
+    :type img: Image.Image
+    :param box: The (left, upper, right, lower) rectangle to paste it in.
+    :type box: tuple[int, int, int, int]
+    :param target_format: The format the texture would be encoded to.
+    :type target_format: TextureFormat
+    :param mipmap_count: The maximum number of mip levels it would be encoded with.
+    :type mipmap_count: int
+    :returns: The patched texture data, or None if the texture can't be patched.
+    :rtype: EncodedTexture | None
+    """
+
+    layout = _LAYOUTS.get(target_format)
+    width, height = texture.m_Width, texture.m_Height
+    mip_count = getattr(
+        texture, "m_MipCount", 2 if getattr(texture, "m_MipMap", 0) else 1
+    )
+
+    if (
+        layout is None
+        or texture.m_TextureFormat != target_format
+        or mip_count != mip_levels(width, height, mipmap_count)
+    ):
+        return None
+
+    levels = _levels(width, height, mip_count)
+    if any(
+        level.width % layout.block or level.height % layout.block for level in levels
+    ):
+        return None
+
+    data = bytearray(texture.image_data)
+    if len(data) != sum(
+        level.width * level.height * layout.block_bytes // layout.block**2
+        for level in levels
+    ):
+        return None
+
+    # Unity stores rows bottom up, so the rectangle is flipped to match the data
+    left, upper, right, lower = box
+    pasted = (left, height - lower, right, height - upper)
+    patch = (
+        img.convert("RGBA")
+        .resize((right - left, lower - upper), Image.Resampling.LANCZOS)
+        .transpose(Image.FLIP_TOP_BOTTOM)
+    )
+
+    region_box = _align(pasted, layout.block, levels[0])
+    region = _read_region(data, layout, levels[0], region_box)
+    region.paste(patch, (pasted[0] - region_box[0], pasted[1] - region_box[1]), patch)
+    _write_region(data, layout, levels[0], region_box, region)
+
+    for previous, level in zip(levels, levels[1:]):
+        target_box = _align(
+            (
+                (region_box[0] - _MIP_SUPPORT) // 2,
+                (region_box[1] - _MIP_SUPPORT) // 2,
+                (region_box[2] + _MIP_SUPPORT) // 2 + 1,
+                (region_box[3] + _MIP_SUPPORT) // 2 + 1,
+            ),
+            layout.block,
+            level,
+        )
+
+        # The previous level is read with enough pixels around the region for the
+        # bicubic filter, and its rewritten region is taken from before encoding
+        # so lossy formats aren't resampled from their own artifacts
+        source_box = _align(
+            tuple(
+                value * 2 + margin
+                for value, margin in zip(
+                    target_box,
+                    (-_MIP_SUPPORT, -_MIP_SUPPORT, _MIP_SUPPORT, _MIP_SUPPORT),
+                )
+            ),
+            layout.block,
+            previous,
+        )
+        source = _read_region(data, layout, previous, source_box)
+        source.paste(
+            region, (region_box[0] - source_box[0], region_box[1] - source_box[1])
+        )
+
+        region = source.resize(
+            (target_box[2] - target_box[0], target_box[3] - target_box[1]),
+            Image.BICUBIC,
+            box=(
+                target_box[0] * 2 - source_box[0],
+                target_box[1] * 2 - source_box[1],
+                target_box[2] * 2 - source_box[0],
+                target_box[3] * 2 - source_box[1],
+            ),
+        )
+        region_box = target_box
+        _write_region(data, layout, level, region_box, region)
+
+    return EncodedTexture(bytes(data), target_format, width, height, mip_count)
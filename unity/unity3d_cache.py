@@ -0,0 +1,196 @@
+"""
+Process-wide cache for the game's data.unity3d environment.
+This module keeps a single parsed copy of data.unity3d in memory, so that
+the many previews, extractions and replacements that target it do not have
+to load and decompress the whole file again on every call.
+"""
+
+from contextlib import contextmanager
+from os import stat
+from os.path import join
+from threading import RLock
+from typing import Iterator
+
+from UnityPy import Environment, load as unity_load
+
+from unity.bundle_journal import write_bundle_file
+from unity.bundle_reader import BundleReader
+from unity.bundle_repack import repack_bundle
+from unity.bundle_writer import save_bundle
+from unity.unity3d_index import (
+    changed_unity3d_objects,
+    ensure_unity3d_index,
+    update_unity3d_index,
+)
+from util.constants import APP_CONFIG, FILE
+
+
+def unity3d_path() -> str:
+    """returns the path of the game's data.unity3d file"""
+
+    return join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"])
+
+
+class Unity3DCache:
+    """
+    Holds the loaded data.unity3d environment for the whole application.
+
+    The cached environment is reused as long as the file on disk keeps the
+    same modification time and size, otherwise it is loaded again. Writes done
+    through :meth:`save` update the cache in place, so our own changes never
+    count as an external modification.
+
+    Attributes:
+        hits: Number of times the cached environment was reused
+        misses: Number of times data.unity3d had to be loaded from disk
+        partial_reads: Number of times data.unity3d was read block by block instead
+    """
+
+    def __init__(self) -> None:
+        self._env: Environment | None = None
+        self._path: str | None = None
+        self._fingerprint: tuple[int, int] | None = None
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.partial_reads = 0
+
+    @staticmethod
+    def _get_fingerprint(path: str) -> tuple[int, int]:
+        file_stat = stat(path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def get(self) -> Environment:
+        """
+        Returns the data.unity3d environment, loading it only when needed.
+
+        :returns: The UnityPy environment of data.unity3d.
+        :rtype: Environment
+        """
+
+        with self._lock:
+            path = unity3d_path()
+            fingerprint = self._get_fingerprint(path)
+
+            if self._current_env(path, fingerprint) is not None:
+                self.hits += 1
+                return self._env
+
+            self.misses += 1
+            self._env = unity_load(path)
+            self._path = path
+            self._fingerprint = fingerprint
+            ensure_unity3d_index(self._env, fingerprint)
+
+            return self._env
+
+    def _current_env(
+        self, path: str, fingerprint: tuple[int, int]
+    ) -> Environment | None:
+        if (
+            self._env is not None
+            and self._path == path
+            and self._fingerprint == fingerprint
+        ):
+            return self._env
+
+    @contextmanager
+    def reader(self) -> Iterator[Environment]:
+        """
+        Gives read access to data.unity3d without loading it whole when not cached.
+
+        Yields the cached environment if it is current, otherwise a
+        random-access view of the file that only decompresses the blocks of the
+        objects that are read. Objects must be read inside the ``with`` block.
+
+        :returns: A context manager over an environment of data.unity3d.
+        :rtype: Iterator[Environment]
+        """
+
+        with self._lock:
+            path = unity3d_path()
+            fingerprint = self._get_fingerprint(path)
+            env = self._current_env(path, fingerprint)
+
+            if env is not None:
+                self.hits += 1
+            else:
+                self.partial_reads += 1
+
+        if env is not None:
+            yield env
+            return
+
+        with BundleReader(path) as bundle:
+            ensure_unity3d_index(bundle.environment, fingerprint)
+            yield bundle.environment
+
+    def save(
+        self, env: Environment, packer: str | None = None, incremental: bool = True
+    ) -> None:
+        """
+        Writes the given environment to data.unity3d and refreshes the cache.
+
+        By default only the storage blocks holding edited objects are rewritten
+        and the cached environment is kept as it is. Otherwise, or when the file
+        can't be repacked incrementally, the whole bundle is saved with its blocks
+        compressed in parallel and the cache is re-parsed from the written bytes, as UnityPy keeps
+        serving the original data for edited objects until the file is loaded
+        again. The object index is updated for the edited objects only.
+
+        :param env: The environment to save, usually the one returned by :meth:`get`.
+        :type env: Environment
+        :param packer: The UnityPy packer to save the bundle with.
+        :type packer: str | None, optional
+        :param incremental: Whether to reuse the unchanged blocks of the file.
+        :type incremental: bool, optional
+        """
+
+        with self._lock:
+            path = unity3d_path()
+            previous = self._fingerprint if self._path == path else None
+            changed = changed_unity3d_objects(env)
+
+            # Block reuse only holds if the environment is the one loaded from the file
+            incremental = (
+                incremental
+                and env is self._env
+                and previous == self._get_fingerprint(path)
+            )
+
+            try:
+                repacked = incremental and repack_bundle(env.file, path, packer)
+            except NotImplementedError:
+                repacked = None
+
+            if repacked:
+                self._env = env
+            else:
+                data = save_bundle(env.file, packer)
+                write_bundle_file(path, data)
+
+                self._env = unity_load(data)
+
+            self._path = path
+            self._fingerprint = self._get_fingerprint(path)
+            update_unity3d_index(self._env, changed, previous, self._fingerprint)
+
+    def invalidate(self) -> None:
+        """Drops the cached environment, forcing the next access to load it again"""
+
+        with self._lock:
+            self._env = None
+            self._fingerprint = None
+
+    def stats(self) -> dict[str, int]:
+        """returns the hit, miss and partial read counters of the cache"""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "partial_reads": self.partial_reads,
+        }
+
+
+# Global data.unity3d cache instance
+UNITY3D_CACHE: Unity3DCache = Unity3DCache()
@@ -0,0 +1,184 @@
+"""
+Persistent object index for the game's data.unity3d file.
+This module maps the path IDs and texture names found in data.unity3d to
+their serialized file, type, size and dimensions, so that lookups can jump
+straight to an object instead of decoding every Texture2D in the file.
+"""
+
+from sqlalchemy import insert
+from UnityPy import Environment
+from UnityPy.files import ObjectReader
+
+from database.models import Unity3DIndexModel, Unity3DObjectModel
+from database.objects import session
+
+
+def _object_entry(file_name: str, obj: ObjectReader) -> dict:
+    entry = {
+        "file": file_name,
+        "path_id": obj.path_id,
+        "type": obj.type.name,
+        "size": obj.byte_size,
+        "name": None,
+        "width": None,
+        "height": None,
+    }
+
+    if obj.type.name == "Texture2D":
+        data = obj.read()
+        entry["name"] = data.m_Name
+        entry["width"] = data.m_Width
+        entry["height"] = data.m_Height
+
+    return entry
+
+
+def _serialized_files(env: Environment):
+    for file_name, file in env.file.files.items():
+        if getattr(file, "objects", None):
+            yield file_name, file
+
+
+def _set_fingerprint(fingerprint: tuple[int, int]) -> None:
+    session.query(Unity3DIndexModel).delete()
+    session.add(Unity3DIndexModel(mtime=fingerprint[0], size=fingerprint[1]))
+
+
+def rebuild_unity3d_index(env: Environment, fingerprint: tuple[int, int]) -> None:
+    """
+    Rebuilds the whole object index from the given data.unity3d environment.
+
+    :param env: The loaded data.unity3d environment.
+    :type env: Environment
+    :param fingerprint: The (mtime, size) of the file the environment was loaded from.
+    :type fingerprint: tuple[int, int]
+    """
+
+    session.query(Unity3DObjectModel).delete()
+    session.execute(
+        insert(Unity3DObjectModel),
+        [
+            _object_entry(file_name, obj)
+            for file_name, file in _serialized_files(env)
+            for obj in file.objects.values()
+        ],
+    )
+    _set_fingerprint(fingerprint)
+    session.commit()
+
+
+def ensure_unity3d_index(env: Environment, fingerprint: tuple[int, int]) -> None:
+    """Rebuilds the object index only if it was built from a different data.unity3d"""
+
+    state = session.query(Unity3DIndexModel).first()
+
+    if not state or (state.mtime, state.size) != tuple(fingerprint):
+        rebuild_unity3d_index(env, fingerprint)
+
+
+def update_unity3d_index(
+    env: Environment,
+    changed: list[tuple[str, int]],
+    previous: tuple[int, int] | None,
+    fingerprint: tuple[int, int],
+) -> None:
+    """
+    Updates the index entries of objects changed by our own data.unity3d writes.
+
+    Falls back to a full rebuild if the index was not built from the file the
+    changes were applied to.
+
+    :param env: The data.unity3d environment after the write.
+    :type env: Environment
+    :param changed: The (file, path_id) of every object that was changed.
+    :type changed: list[tuple[str, int]]
+    :param previous: The fingerprint of the file before the write.
+    :type previous: tuple[int, int] | None
+    :param fingerprint: The fingerprint of the file after the write.
+    :type fingerprint: tuple[int, int]
+    """
+
+    state = session.query(Unity3DIndexModel).first()
+
+    if not state or not previous or (state.mtime, state.size) != tuple(previous):
+        rebuild_unity3d_index(env, fingerprint)
+        return
+
+    for file_name, path_id in changed:
+        obj = env.file.files[file_name].objects[path_id]
+        session.query(Unity3DObjectModel).filter(
+            Unity3DObjectModel.file == file_name,
+            Unity3DObjectModel.path_id == path_id,
+        ).update(_object_entry(file_name, obj))
+
+    _set_fingerprint(fingerprint)
+    session.commit()
+
+
+def changed_unity3d_objects(env: Environment) -> list[tuple[str, int]]:
+    """returns the (file, path_id) of every object edited in the given environment"""
+
+    return [
+        (file_name, path_id)
+        for file_name, file in _serialized_files(env)
+        for path_id, obj in file.objects.items()
+        if obj.data
+    ]
+
+
+def find_unity3d_object(env: Environment, asset: int | str) -> ObjectReader | None:
+    """
+    Finds a Texture2D object in data.unity3d through the object index.
+
+    :param env: The loaded data.unity3d environment.
+    :type env: Environment
+    :param asset: The path ID (int) or texture name (str) of the object.
+    :type asset: int | str
+    :returns: The object reader, or None if the texture is not indexed.
+    :rtype: ObjectReader | None
+    """
+
+    entry = (
+        session.query(Unity3DObjectModel)
+        .filter(
+            Unity3DObjectModel.type == "Texture2D",
+            (
+                Unity3DObjectModel.path_id == asset
+                if isinstance(asset, int)
+                else Unity3DObjectModel.name == asset
+            ),
+        )
+        .first()
+    )
+
+    if entry:
+        return env.file.files[entry.file].objects.get(entry.path_id)
+
+
+def find_unity3d_objects(
+    env: Environment, path_ids: list[int]
+) -> dict[int, ObjectReader]:
+    """
+    Finds several Texture2D objects in data.unity3d through the object index.
+
+    :param env: The loaded data.unity3d environment.
+    :type env: Environment
+    :param path_ids: The path IDs of the objects.
+    :type path_ids: list[int]
+    :returns: The object readers found, keyed by path ID.
+    :rtype: dict[int, ObjectReader]
+    """
+
+    entries = (
+        session.query(Unity3DObjectModel)
+        .filter(
+            Unity3DObjectModel.type == "Texture2D",
+            Unity3DObjectModel.path_id.in_(path_ids),
+        )
+        .all()
+    )
+
+    return {
+        entry.path_id: env.file.files[entry.file].objects[entry.path_id]
+        for entry in entries
+    }
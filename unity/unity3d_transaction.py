@@ -0,0 +1,114 @@
+"""
+Batched texture replacements for the game's data.unity3d file.
+This module lets several Texture2D replacements be queued and then applied
+with a single load and a single save of data.unity3d.
+"""
+
+from PIL import Image
+from UnityPy.enums import TextureFormat
+
+from unity.bundle_payload import EncodedTexture, encode_texture, texture_digest
+from unity.unity3d_cache import UNITY3D_CACHE
+from unity.unity3d_index import find_unity3d_object
+
+
+class Unity3DTransaction:
+    """
+    Queues Texture2D replacements and writes them to data.unity3d at once.
+
+    Can be used as a context manager, in which case the queued replacements
+    are committed when the block exits without errors.
+
+    Attributes:
+        replacements: The queued images or texture data, keyed by path ID (int) or
+            texture name (str)
+        formats: The texture format each queued image is encoded to
+        skipped: The textures left as they were because they already held their image
+    """
+
+    def __init__(self) -> None:
+        self.replacements: dict[int | str, Image.Image | EncodedTexture] = {}
+        self.formats: dict[int | str, TextureFormat] = {}
+        self.skipped: list[int | str] = []
+
+    def __enter__(self) -> "Unity3DTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def replace(
+        self,
+        asset: int | str,
+        img: Image.Image,
+        target_format: TextureFormat = TextureFormat.RGBA32,
+    ) -> None:
+        """
+        Queues the replacement of a texture.
+
+        :param asset: The path ID (int) or texture name (str) of the texture.
+        :type asset: int | str
+        :param img: The new image of the texture.
+        :type img: Image.Image
+        :param target_format: The texture format to encode the image to.
+        :type target_format: TextureFormat, optional
+        """
+
+        self.replacements[asset] = img
+        self.formats[asset] = target_format
+
+    def restore(self, asset: int | str, encoded: EncodedTexture) -> None:
+        """
+        Queues texture data to be stored as it is, such as a backed up original.
+
+        :param asset: The path ID (int) or texture name (str) of the texture.
+        :type asset: int | str
+        :param encoded: The texture data.
+        :type encoded: EncodedTexture
+        """
+
+        self.replacements[asset] = encoded
+
+    def commit(self) -> int:
+        """
+        Applies all queued replacements with one load and one save of data.unity3d.
+
+        Textures that already hold their new data are added to :attr:`skipped`, and
+        data.unity3d is not saved at all if every texture was unchanged.
+
+        :returns: The number of textures replaced.
+        :rtype: int
+        """
+
+        if not self.replacements:
+            return 0
+
+        env = UNITY3D_CACHE.get()
+        count = 0
+
+        for asset, img in self.replacements.items():
+            obj = find_unity3d_object(env, asset)
+
+            if obj:
+                data = obj.read()
+                encoded = (
+                    img
+                    if isinstance(img, EncodedTexture)
+                    else encode_texture(img, self.formats[asset])
+                )
+
+                if texture_digest(data) == encoded.digest:
+                    self.skipped.append(asset)
+                    continue
+
+                encoded.apply(data)
+                data.save()
+                count += 1
+
+        if count:
+            UNITY3D_CACHE.save(env)
+        self.replacements.clear()
+        self.formats.clear()
+
+        return count
@@ -1,19 +1,32 @@
-from os import remove
 from os.path import join
-from shutil import copyfile
 
 from PIL.ImageQt import ImageQt
 from PySide6 import QtGui
 from UnityPy import load as unity_load
 
 from PIL import Image
-from UnityPy.enums import TextureFormat
 from sqlalchemy.orm import Mapped
 
 from database.models import FieldModel
+from unity.backup_store import BACKUP_STORE
+from unity.bundle_catalog import BUNDLE_CATALOG, TextureInfo, read_bundle_textures
+from unity.mipmaps import texture_thumbnail
+from unity.unity3d_cache import UNITY3D_CACHE, unity3d_path
+from unity.unity3d_index import find_unity3d_object, find_unity3d_objects
+from unity.unity3d_transaction import Unity3DTransaction
 from util.constants import FILE, APP_CONFIG
 from util.enums import FieldCoordinates
 from util.image_utils import slugify, convert_to_png
+from util.thumbnail_cache import THUMBNAIL_CACHE
+
+
+def _image_icon(img: Image.Image) -> QtGui.QIcon:
+    """returns a QIcon holding the given image"""
+
+    icon = QtGui.QIcon()
+    icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+
+    return icon
 
 
 def prepare_environment(miss: bool, bundle: str) -> str:
@@ -47,19 +60,16 @@ def fetch_unity3d_image(path_id: int, aspect: tuple) -> QtGui.QIcon | None:
     :return: The resized and converted RGB image from Unity3D resources.
     :rtype: Image.Image
     """
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"]))
 
-    for obj in env.objects:
-        if obj.type.name == "Texture2D" and obj.path_id == path_id:
-            data = obj.read()
-            img = data.image.resize(aspect)
-            img.convert("RGB")
-            img.name = "image.jpg"
+    def generate() -> Image.Image | None:
+        with UNITY3D_CACHE.reader() as env:
+            obj = find_unity3d_object(env, path_id)
+            return obj.read().image.resize(aspect) if obj else None
 
-            icon = QtGui.QIcon()
-            icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+    img = THUMBNAIL_CACHE.fetch(unity3d_path(), str(path_id), aspect, generate)
 
-            return icon
+    if img:
+        return _image_icon(img)
 
 
 def batch_fetch_unity3d_images(path_ids: list[int], aspect: tuple) -> dict[QtGui.QIcon]:
@@ -76,20 +86,34 @@ def batch_fetch_unity3d_images(path_ids: list[int], aspect: tuple) -> dict[QtGui
     :return: The resized and converted RGB images from Unity3D resources.
     :rtype: QtGui.QIcon
     """
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"]))
-
     images: dict[QtGui.QIcon] = {}
+    source = unity3d_path()
+    missing = []
+
+    for path_id in path_ids:
+        key = THUMBNAIL_CACHE.key(source, str(path_id), aspect)
+        img = THUMBNAIL_CACHE.get(key) if key else None
+
+        if img:
+            THUMBNAIL_CACHE.hits += 1
+            images[path_id] = _image_icon(img)
+        else:
+            missing.append((path_id, key))
+
+    if missing:
+        objects = find_unity3d_objects(
+            UNITY3D_CACHE.get(), [path_id for path_id, _ in missing]
+        )
 
-    for obj in env.objects:
-        if obj.type.name == "Texture2D" and obj.path_id in path_ids:
-            data = obj.read()
-            img = data.image.resize(aspect)
-            img.name = "image.jpg"
+        for path_id, key in missing:
+            if path_id in objects:
+                THUMBNAIL_CACHE.misses += 1
+                img = objects[path_id].read().image.resize(aspect)
 
-            icon = QtGui.QIcon()
-            icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+                if key:
+                    THUMBNAIL_CACHE.put(key, img)
 
-            images[obj.path_id] = icon
+                images[path_id] = _image_icon(img)
 
     return images
 
@@ -99,7 +123,8 @@ def replace_unity3d_asset(asset: str, img: Image.Image, by_path_id=False) -> Non
     Replaces a Unity3D asset with a new image.
 
     This function locates a texture object within Unity3D game data file
-    and then saves it as a PNG file.
+    and then replaces it with the given image. Use :class:`Unity3DTransaction`
+    directly to replace several textures with a single save.
 
     :param asset: The path ID or name of the texture to replace.
     :type asset: str
@@ -109,26 +134,8 @@ def replace_unity3d_asset(asset: str, img: Image.Image, by_path_id=False) -> Non
     :type by_path_id: bool, optional
     """
 
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"]))
-
-    for obj in env.objects:
-        if obj.type.name == "Texture2D":
-            data = obj.read()
-            if by_path_id and str(obj.path_id) == asset or asset == data.m_Name:
-                data.m_Width, data.m_Height = img.size
-
-                data.set_image(
-                    img=convert_to_png(img),
-                    target_format=TextureFormat.RGBA32,
-                )
-
-                data.save()
-                break
-
-    with open(
-        join(APP_CONFIG.game_path[:-18], "masterduel_Data", "data.unity3d"), "wb"
-    ) as f:
-        f.write(env.file.save())
+    with Unity3DTransaction() as transaction:
+        transaction.replace(int(asset) if by_path_id else asset, convert_to_png(img))
 
 
 def extract_unity3d_image(asset: str, by_id=False, backup=False) -> None:
@@ -161,27 +168,41 @@ def extract_unity3d_image(asset: str, by_id=False, backup=False) -> None:
     in the current working directory or else this function will raise an IOError.
 
     """
-    for obj in unity_load(
-        join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"])
-    ).objects:
-        if obj.type.name == "Texture2D":
+    with UNITY3D_CACHE.reader() as env:
+        obj = find_unity3d_object(env, int(asset) if by_id else asset)
+
+        if obj:
             data = obj.read()
-            if by_id:
-                if str(obj.path_id) == asset:
-                    dest = join(
-                        "backups" if backup else "images", slugify(data.m_Name) + ".png"
-                    )
-                    img = data.image
-                    img.save(dest)
-                    break
-            else:
-                if asset == data.m_Name:
-                    dest = join(
-                        "backups" if backup else "images", slugify(data.m_Name) + ".png"
-                    )
-                    img = data.image
-                    img.save(dest)
-                    break
+            dest = join(
+                "backups" if backup else "images", slugify(data.m_Name) + ".png"
+            )
+            img = data.image
+            img.save(dest)
+
+
+def backup_unity3d_asset(asset: int | str, subfolder: str, name: str) -> bool:
+    """
+    Backs up a texture of the Unity3D game data into the backup store.
+
+    :param asset: The path ID (int) or name (str) of the texture.
+    :type asset: int | str
+    :param subfolder: The asset type the backup belongs to.
+    :type subfolder: str
+    :param name: The name the backup is stored under.
+    :type name: str
+    :returns: Whether the texture was found and backed up.
+    :rtype: bool
+    """
+
+    with UNITY3D_CACHE.reader() as env:
+        obj = find_unity3d_object(env, asset)
+
+        if not obj:
+            return False
+
+        BACKUP_STORE.put(subfolder, name, obj.read())
+
+    return True
 
 
 def fetch_home_bg():
@@ -195,33 +216,23 @@ def fetch_home_bg():
     :rtype: QtGui.QIcon
     """
 
-    env = unity_load(join(APP_CONFIG.game_path[:-18], "masterduel_Data", FILE["UNITY"]))
-    for obj in env.objects:
-        if obj.type.name == "Texture2D":
-            data = obj.read()
-            if FILE["BACKGROUND"] == data.m_Name:
-                img = data.image.resize((1120, 630))
-                img.convert("RGB")
-                img.name = FILE["IMAGE_NAME"]
-
-                icon = QtGui.QIcon()
-                icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
-
-                return icon
+    def generate() -> Image.Image | None:
+        with UNITY3D_CACHE.reader() as env:
+            obj = find_unity3d_object(env, FILE["BACKGROUND"])
+            return obj.read().image.resize((1120, 630)) if obj else None
 
+    img = THUMBNAIL_CACHE.fetch(
+        unity3d_path(), FILE["BACKGROUND"], (1120, 630), generate
+    )
 
-def swap_bundles(bundles: list) -> None:
-    """Swaps the content of two given bundles"""
-    asset_1 = join(APP_CONFIG.game_path, "0000", bundles[0][:2], bundles[0])
-    asset_2 = join(APP_CONFIG.game_path, "0000", bundles[1][:2], bundles[1])
-    copyfile(asset_1, join(APP_CONFIG.game_path, bundles[0]))
-    copyfile(asset_2, asset_1)
-    copyfile(join(APP_CONFIG.game_path, bundles[0]), asset_2)
-    remove(join(APP_CONFIG.game_path, bundles[0]))
+    if img:
+        return _image_icon(img)
 
 
 def fetch_bundle_thumb(
-    bundle: str | Mapped[str], ratio: tuple[int, int] | None, unity_file=False
+    bundle: str | Mapped[str],
+    ratio: tuple[int, int] | None,
+    unity_file: bool | None = None,
 ) -> QtGui.QIcon | None:
     """
     Fetches a thumbnail image from a Unity3D bundle.
@@ -233,26 +244,59 @@ def fetch_bundle_thumb(
     :type bundle: str | Mapped[str]
     :param ratio: The dimensions to resize the image to.
     :type ratio: tuple[int, int] | None
-    :param unity_file: Whether to use the Unity3D file.
-    :type unity_file: bool, optional
+    :param unity_file: Whether to use the StreamingAssets bundle, None to resolve it
+        through the bundle catalog.
+    :type unity_file: bool | None, optional
     :returns: A QIcon object representing the thumbnail image.
     :rtype: QtGui.QIcon | None
     """
 
-    env = unity_load(prepare_environment(unity_file, bundle))
+    path = (
+        BUNDLE_CATALOG.resolve(bundle)
+        if unity_file is None
+        else prepare_environment(unity_file, bundle)
+    )
+
+    def generate() -> Image.Image | None:
+        env = unity_load(path)
 
-    for obj in env.objects:
-        if obj.type.name == "Texture2D":
-            data = obj.read()
+        for obj in env.objects:
+            if obj.type.name == "Texture2D":
+                img = texture_thumbnail(obj.read(), ratio)
+                return img.resize(ratio) if ratio else img
+
+    img = THUMBNAIL_CACHE.fetch(path, bundle, ratio, generate)
 
-            img = data.image.resize(ratio) if ratio else data.image
+    if img:
+        return _image_icon(img)
 
-            img.name = FILE["IMAGE_NAME"]
 
-            icon = QtGui.QIcon()
-            icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+def fetch_texture_info(
+    bundle: str | Mapped[str], unity_file: bool | None = None
+) -> TextureInfo | None:
+    """
+    Reads the dimensions, format and mip count of the first texture in a bundle.
 
-            return icon
+    The header is taken from the bundle catalog, or read from the file when the
+    bundle changed since it was cataloged, so no pixels are decoded. Use it
+    instead of decoding a texture when only its size or aspect ratio is needed.
+
+    :param bundle: The bundle to read the texture from.
+    :type bundle: str | Mapped[str]
+    :param unity_file: Whether to use the StreamingAssets bundle, None to resolve it
+        through the bundle catalog.
+    :type unity_file: bool | None, optional
+    :returns: The texture metadata, or None if the bundle has no readable texture.
+    :rtype: TextureInfo | None
+    """
+
+    textures = (
+        BUNDLE_CATALOG.textures(bundle)
+        if unity_file is None
+        else read_bundle_textures(prepare_environment(unity_file, bundle))
+    )
+
+    return next(iter(textures), None)
 
 
 def fetch_field_thumb(field: FieldModel) -> QtGui.QIcon | None:
@@ -268,39 +312,50 @@ def fetch_field_thumb(field: FieldModel) -> QtGui.QIcon | None:
     :rtype: QtGui.QIcon | None
     """
 
-    env = unity_load(prepare_environment(False, field.bundle))
+    path = BUNDLE_CATALOG.resolve(field.bundle)
 
-    for obj in env.objects:
-        if obj.type.name == "Texture2D":
-            data = obj.read()
+    def generate() -> Image.Image | None:
+        env = unity_load(path)
 
-            if (
-                "01_BaseColor_far" in data.m_Name
-                if False
-                else "01_BaseColor_near" in data.m_Name
-            ):
+        for obj in env.objects:
+            if obj.type.name == "Texture2D":
+                data = obj.read()
 
-                img: Image.Image = data.image
+                if "01_BaseColor_near" in data.m_Name:
 
-                if not field.bottom:
-                    if field.flipped:
-                        img_field = img.crop(FieldCoordinates.FLIPPED.value).rotate(180)
-                    else:
-                        img_field = img.crop(FieldCoordinates.TOP.value)
-                else:
-                    if field.flipped:
-                        img_field = img.crop(
-                            FieldCoordinates.BOTTOM_FLIPPED.value
-                        ).rotate(180)
-                    else:
-                        img_field = img.crop(FieldCoordinates.BOTTOM.value)
+                    img: Image.Image = texture_thumbnail(data, (900, 1))
+                    scale = img.width / data.m_Width
 
-                img_field.thumbnail((900, img_field.size[1]), Image.Resampling.LANCZOS)
-                img = img_field
+                    def crop(coordinates: FieldCoordinates) -> Image.Image:
+                        return img.crop(
+                            tuple(round(value * scale) for value in coordinates.value)
+                        )
 
-                img.name = FILE["IMAGE_NAME"]
+                    if not field.bottom:
+                        if field.flipped:
+                            img_field = crop(FieldCoordinates.FLIPPED).rotate(180)
+                        else:
+                            img_field = crop(FieldCoordinates.TOP)
+                    else:
+                        if field.flipped:
+                            img_field = crop(FieldCoordinates.BOTTOM_FLIPPED).rotate(
+                                180
+                            )
+                        else:
+                            img_field = crop(FieldCoordinates.BOTTOM)
+
+                    img_field.thumbnail(
+                        (900, img_field.size[1]), Image.Resampling.LANCZOS
+                    )
 
-                icon = QtGui.QIcon()
-                icon.addPixmap(QtGui.QPixmap(ImageQt(img)))
+                    return img_field
+
+    img = THUMBNAIL_CACHE.fetch(
+        path,
+        field.bundle,
+        f"field-{bool(field.bottom)}-{bool(field.flipped)}",
+        generate,
+    )
 
-                return icon
+    if img:
+        return _image_icon(img)
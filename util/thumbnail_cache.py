@@ -0,0 +1,178 @@
+"""
+Persistent cache for asset thumbnails.
+This module stores the thumbnails generated from the game bundles as PNG files,
+keyed by the source file, its modification time and size and the requested
+size, so that the list models do not have to decode Unity textures again on
+every refresh or application start.
+"""
+
+from hashlib import sha1
+from os import makedirs, remove, replace, scandir, stat, utime
+from os.path import join
+from threading import Lock, get_ident
+from typing import Callable
+
+from PIL import Image
+
+# Default directory and size cap of the thumbnail cache
+THUMBNAIL_DIR: str = join("cache", "thumbnails")
+THUMBNAIL_CACHE_SIZE: int = 256 * 1024 * 1024
+
+
+class ThumbnailCache:
+    """
+    Directory of cached thumbnails with a total size cap and LRU eviction.
+
+    Each entry is a PNG file named after the hash of its key. Reading an entry
+    refreshes its modification time, which is used to evict the least recently
+    used entries once the directory grows past the size cap.
+
+    Attributes:
+        directory: The directory where the thumbnails are stored
+        max_size: The maximum total size of the cached files, in bytes
+        hits: Number of thumbnails served from the cache
+        misses: Number of thumbnails that had to be generated
+    """
+
+    def __init__(
+        self, directory: str = THUMBNAIL_DIR, max_size: int = THUMBNAIL_CACHE_SIZE
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size: int | None = None
+        self._lock = Lock()
+
+    @staticmethod
+    def key(source: str, name: str, size: tuple[int, int] | str | None) -> str | None:
+        """
+        Builds the cache key of a thumbnail.
+
+        :param source: The path of the file the thumbnail is generated from.
+        :type source: str
+        :param name: The name of the asset inside the source file.
+        :type name: str
+        :param size: The requested thumbnail size, or a label for other variants.
+        :type size: tuple[int, int] | str | None
+        :returns: The key, or None if the source file does not exist.
+        :rtype: str | None
+        """
+
+        try:
+            source_stat = stat(source)
+        except OSError:
+            return None
+
+        return sha1(
+            f"{name}|{size}|{source_stat.st_mtime_ns}|{source_stat.st_size}".encode()
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return join(self.directory, key + ".png")
+
+    def _entries(self) -> list:
+        try:
+            return [entry for entry in scandir(self.directory) if entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def get(self, key: str) -> Image.Image | None:
+        """returns the cached thumbnail of the given key, or None if it is not cached"""
+
+        path = self._path(key)
+
+        try:
+            with Image.open(path) as img:
+                img.load()
+            utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return img
+
+    def put(self, key: str, img: Image.Image) -> None:
+        """Stores a thumbnail, evicting the least recently used ones if needed"""
+
+        makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{get_ident()}.tmp"
+
+        img.save(temp_path, format="PNG", compress_level=1)
+        replace(temp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._size += stat(path).st_size
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Leave some room so that eviction does not run on every new entry
+        target = self.max_size * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime_ns)
+        self._size = sum(entry.stat().st_size for entry in entries)
+
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def fetch(
+        self,
+        source: str,
+        name: str,
+        size: tuple[int, int] | str | None,
+        generate: Callable[[], Image.Image | None],
+    ) -> Image.Image | None:
+        """
+        Returns a thumbnail from the cache, generating and storing it on a miss.
+
+        :param source: The path of the file the thumbnail is generated from.
+        :type source: str
+        :param name: The name of the asset inside the source file.
+        :type name: str
+        :param size: The requested thumbnail size, or a label for other variants.
+        :type size: tuple[int, int] | str | None
+        :param generate: Generates the thumbnail, returning None if there is none.
+        :type generate: Callable[[], Image.Image | None]
+        :returns: The thumbnail, or None if it could not be generated.
+        :rtype: Image.Image | None
+        """
+
+        key = self.key(source, name, size)
+
+        if key and (img := self.get(key)) is not None:
+            self.hits += 1
+            return img
+
+        self.misses += 1
+        img = generate()
+
+        if key and img is not None:
+            self.put(key, img)
+
+        return img
+
+    def clear(self) -> None:
+        """Deletes every cached thumbnail"""
+
+        with self._lock:
+            for entry in self._entries():
+                try:
+                    remove(entry.path)
+                except OSError:
+                    pass
+            self._size = 0
+
+
+# Global thumbnail cache instance
+THUMBNAIL_CACHE: ThumbnailCache = ThumbnailCache()
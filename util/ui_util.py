@@ -1,11 +1,15 @@
 """
 UI utility functions for the application.
-This module provides functions for UI-related tasks like showing toasts
-and managing the application's color palette.
+This module provides functions for UI-related tasks like showing toasts,
+running long operations behind a progress dialog and managing the
+application's color palette.
 """
 
+from typing import Any, Callable
+
 from PySide6.QtGui import QPalette, QColor
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtWidgets import QProgressDialog
 from pyqttoast import Toast, ToastPreset
 
 
@@ -28,6 +32,81 @@ def show_toast(parent, title: str, text: str, preset: ToastPreset):
     toast.show()
 
 
+class BackgroundTask(QThread):
+    """
+    Runs a long operation off the UI thread, reporting its progress.
+
+    The function is called with a progress callback taking the number of items
+    done and the total, so it can be passed as the progress argument of the
+    service batch operations.
+
+    Attributes:
+        result: The value returned by the function
+        error: The exception raised by the function, if any
+    """
+
+    progressed = Signal(int, int)
+
+    def __init__(self, function: Callable[[Callable[..., None]], Any], parent=None):
+        super().__init__(parent)
+        self.function = function
+        self.result = None
+        self.error: Exception | None = None
+
+    def run(self):
+        try:
+            self.result = self.function(
+                lambda done, total, *_: self.progressed.emit(done, total)
+            )
+        except Exception as error:
+            self.error = error
+
+
+def run_with_progress(
+    parent,
+    title: str,
+    label: str,
+    function: Callable[[Callable[..., None]], Any],
+    on_done: Callable[[Any, Exception | None], None],
+) -> BackgroundTask:
+    """
+    Run a function on a background thread behind a modal progress dialog.
+
+    Args:
+        parent: The widget the progress dialog is shown over
+        title: The title of the progress dialog
+        label: The text of the progress dialog
+        function: The operation, called with a progress callback
+        on_done: Called on the UI thread with the result and error of the function
+
+    Returns:
+        BackgroundTask: The running task, which has to be kept referenced until it finishes
+    """
+    progress = QProgressDialog(label, "Cancel", 0, 0, parent)
+    progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setWindowTitle(title)
+    progress.setCancelButton(None)  # The operations can't be cancelled halfway
+    progress.setMinimumDuration(0)
+    progress.show()
+
+    task = BackgroundTask(function, parent)
+
+    def update(done: int, total: int):
+        progress.setMaximum(total)
+        progress.setValue(done)
+
+    def finish():
+        progress.close()
+        on_done(task.result, task.error)
+        task.deleteLater()
+
+    task.progressed.connect(update)
+    task.finished.connect(finish)
+    task.start()
+
+    return task
+
+
 def get_dark_mode_palette(app=None):
     """
     Create and return a dark mode color palette for the application.